@@ -0,0 +1,191 @@
+# artifacts.py
+"""
+학습 실행마다 남기는 버전별 산출물(모델·피처 스펙·학습 평균·지표·예측) 디렉터리와
+"현재" 포인터를 다루는 모듈. train_offline.py 가 쓰고 streamlit_app.py 가 읽는다.
+
+    data/artifacts/
+        CURRENT                  ← 현재 실행 ID 한 줄 (완전히 기록된 실행만 가리킴)
+        20250101-031500/
+            model.txt            ← LightGBM 텍스트 형식 부스터
+            model.npz            ← 같은 부스터의 NumPy 트리 배열 (tree_eval, LightGBM 없이 예측)
+            meta.json            ← 파라미터, 피처 스펙·컬럼, 학습 구간, 지표
+            feature_means.json   ← 학습 구간 피처 평균 (예측 시 NaN 대체값)
+            forecast.csv         ← 1주일 예측 (예측 구간이 있으면 하한·상한 컬럼 포함)
+            *_model.txt, *.csv, conformal.npz  ← (선택) 분위수·direct 모델, 백테스트 표, conformal 잔차 표
+        targets/<타깃>/          ← (--targets) 기본 타깃 외 타깃별 실행 디렉터리와 CURRENT (구조 동일)
+
+실행 디렉터리는 숨김 임시 디렉터리에 모두 쓴 뒤 이름을 바꾸고, 그 다음에 CURRENT 를 교체한다.
+읽는 쪽은 CURRENT 가 가리키는 디렉터리만 보므로 학습 도중에도 반쯤 쓰인 파일을 읽지 않는다.
+"""
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data_store import DATA_DIR
+
+ARTIFACT_DIR   = DATA_DIR / "artifacts"
+CURRENT_FILE   = "CURRENT"
+MODEL_FILE     = "model.txt"
+META_FILE      = "meta.json"
+MEANS_FILE     = "feature_means.json"
+FORECAST_FILE  = "forecast.csv"
+CONFORMAL_FILE = "conformal.npz"
+TARGETS_DIR    = "targets"
+KEEP_RUNS      = 10                  # 보관할 최근 실행 수 (CURRENT 는 항상 보관)
+
+PRIMARY_TARGET = "Chlorophyll_Kalman"          # 산출물 루트에 기록되는 기본 타깃 (대시보드)
+
+
+def forecast_columns(target_col):
+    """타깃의 (예측, 하한, 상한) 컬럼 이름."""
+    return f"Forecast_{target_col}", f"Lower_{target_col}", f"Upper_{target_col}"
+
+
+FORECAST_COL, LOWER_COL, UPPER_COL = forecast_columns(PRIMARY_TARGET)   # 하한·상한은 예측 구간이 있을 때만
+
+
+def target_artifact_dir(target_col, artifact_dir=None):
+    """타깃별 산출물 루트. 기본 타깃은 루트 그대로, 나머지는 targets/<타깃> 아래."""
+    root = Path(artifact_dir or ARTIFACT_DIR)
+    if target_col == PRIMARY_TARGET:
+        return root
+    return root / TARGETS_DIR / "".join(c if c.isalnum() else "_" for c in target_col)
+
+
+def new_run_id():
+    return time.strftime("%Y%m%d-%H%M%S")
+
+
+def _write_text_atomic(path, text):
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def write_run(booster, meta, feature_means, forecast, artifact_dir=None, run_id=None, extra_boosters=None,
+              tables=None, arrays=None):
+    """
+    한 실행의 산출물을 기록하고 CURRENT 를 새 실행으로 바꾼다. 기록된 실행 디렉터리를 반환.
+    forecast 는 Timestamp 인덱스의 Series 또는 DataFrame (FORECAST_COL 포함).
+    extra_boosters: {이름: 부스터} → "<이름>.txt" 로 함께 저장 (예: direct 전략 모델)
+    tables: {이름: DataFrame} → "<이름>.csv" 로 함께 저장 (예: 백테스트 결과)
+    arrays: {이름: {키: ndarray}} → "<이름>.npz" 로 함께 저장 (예: conformal 잔차 분위수 표)
+    """
+    root = Path(artifact_dir or ARTIFACT_DIR)
+    root.mkdir(parents=True, exist_ok=True)
+    run_id = run_id or new_run_id()
+    while (root / run_id).exists():          # 같은 초에 두 번 실행된 경우
+        run_id += "-1"
+
+    staging = root / f".{run_id}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir()
+
+    booster.save_model(str(staging / MODEL_FILE))
+    for name, extra in (extra_boosters or {}).items():
+        extra.save_model(str(staging / f"{name}.txt"))
+    (staging / META_FILE).write_text(
+        json.dumps({"run_id": run_id, **meta}, ensure_ascii=False, indent=2, default=str),
+        encoding="utf-8",
+    )
+    (staging / MEANS_FILE).write_text(
+        json.dumps({k: float(v) for k, v in feature_means.items()}, ensure_ascii=False, indent=2),
+        encoding="utf-8",
+    )
+    forecast = forecast.to_frame(name=FORECAST_COL) if isinstance(forecast, pd.Series) else forecast
+    forecast.rename_axis("Timestamp").to_csv(staging / FORECAST_FILE, index=True, encoding="utf-8-sig")
+    for name, table in (tables or {}).items():
+        table.to_csv(staging / f"{name}.csv", index=True, encoding="utf-8-sig")
+    for name, arrs in (arrays or {}).items():
+        np.savez(staging / f"{name}.npz", **arrs)
+
+    run_dir = root / run_id
+    os.rename(staging, run_dir)
+    _write_text_atomic(root / CURRENT_FILE, run_id + "\n")
+    prune_runs(root)
+    return run_dir
+
+
+def current_run_id(artifact_dir=None):
+    """CURRENT 가 가리키는 실행 ID. 없으면 None."""
+    path = Path(artifact_dir or ARTIFACT_DIR) / CURRENT_FILE
+    try:
+        run_id = path.read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        return None
+    return run_id or None
+
+
+def current_run_dir(artifact_dir=None):
+    run_id = current_run_id(artifact_dir)
+    if run_id is None:
+        return None
+    run_dir = Path(artifact_dir or ARTIFACT_DIR) / run_id
+    return run_dir if run_dir.is_dir() else None
+
+
+def latest_run_dir(artifact_dir=None):
+    """예측 파일까지 기록된 가장 최근 실행 디렉터리. 없으면 None (CURRENT 가 없거나 정리된 실행을 가리킬 때 대체용)."""
+    root = Path(artifact_dir or ARTIFACT_DIR)
+    if not root.is_dir():
+        return None
+    runs = sorted(p for p in root.iterdir() if p.is_dir() and p.name[:1].isdigit() and (p / FORECAST_FILE).exists())
+    return runs[-1] if runs else None
+
+
+def resolve_run_dir(run_id=None, artifact_dir=None):
+    """
+    run_id 의 실행 디렉터리. run_id 가 없으면 CURRENT, CURRENT 가 없거나 정리된 실행을 가리키면
+    가장 최근의 완료된 실행. 해당 디렉터리가 없으면 None.
+    """
+    root = Path(artifact_dir or ARTIFACT_DIR)
+    if run_id:
+        run_dir = root / run_id
+        return run_dir if run_dir.is_dir() else None
+    return current_run_dir(root) or latest_run_dir(root)
+
+
+def load_meta(run_dir):
+    return json.loads((Path(run_dir) / META_FILE).read_text(encoding="utf-8"))
+
+
+def load_feature_means(run_dir):
+    return pd.Series(json.loads((Path(run_dir) / MEANS_FILE).read_text(encoding="utf-8")), dtype="float64")
+
+
+def load_booster(run_dir, file_name=MODEL_FILE):
+    import lightgbm as lgb
+
+    return lgb.Booster(model_file=str(Path(run_dir) / file_name))
+
+
+def load_packed_model(run_dir):
+    """model.npz 로 만든 tree_eval.PackedForest (LightGBM 불필요). 없으면 None."""
+    import tree_eval
+
+    path = Path(run_dir) / tree_eval.PACKED_FILE
+    return tree_eval.PackedForest.load(path) if path.exists() else None
+
+
+def load_forecast(run_dir):
+    """실행 디렉터리의 예측을 Timestamp 컬럼 DataFrame 으로 반환."""
+    return pd.read_csv(Path(run_dir) / FORECAST_FILE, parse_dates=["Timestamp"], encoding="utf-8-sig")
+
+
+def prune_runs(artifact_dir=None, keep=KEEP_RUNS):
+    """오래된 실행 디렉터리를 정리한다. CURRENT 가 가리키는 실행은 남긴다."""
+    root = Path(artifact_dir or ARTIFACT_DIR)
+    current = current_run_id(root)
+    # 실행 ID(날짜로 시작) 디렉터리만 대상 (targets/ 등은 제외)
+    runs = sorted(p for p in root.iterdir() if p.is_dir() and p.name[:1].isdigit())
+    for p in runs[:-keep] if keep > 0 else runs:
+        if p.name != current:
+            shutil.rmtree(p, ignore_errors=True)
@@ -0,0 +1,182 @@
+# backtest.py
+"""
+7일 재귀 예측(recursive_forecast)을 과거 여러 시작점(origin)에서 실행해
+호라이즌별 MAE 를 구하는 롤링-오리진 백테스트.
+
+- 시작점은 평가 구간 안에서 stride 간격 (기본 6시간)
+- 시작점을 연속 구간으로 나눠 프로세스 풀에서 병렬 실행
+  (구간마다 이력 재생은 한 번, 구간 안의 시작점은 recursive_forecast(origins=...) 로 함께 진행)
+- 결과: 호라이즌별 MAE 곡선 + 리드타임별 요약표
+
+    $ python backtest.py                 # data/artifacts/CURRENT 모델을 학습 구간 이후 시작점에서 평가
+    $ python backtest.py --stride 3h --n-jobs 8 --out data/backtest.csv
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import artifacts
+import regular_grid
+from data_store import load_sensor_data
+from train_offline import (
+    DATA_PATH,
+    DATA_STORE_PATH,
+    EXOG_COLS,
+    TARGET_COL,
+    recursive_forecast,
+)
+
+STRIDE  = pd.Timedelta("6h")          # 시작점 간격
+HORIZON = pd.Timedelta("7D")          # 시작점마다 예측하는 기간
+SUMMARY_LEADS = ["1h", "6h", "12h", "1D", "2D", "3D", "5D", "7D"]
+
+
+def backtest_origins(index, start, end=None, stride=STRIDE):
+    """start 이후 ~ end 의 관측 시각 중 stride 간격 시작점. 뒤에 관측이 하나도 없는 마지막 시각은 제외."""
+    end = index[-2] if end is None else min(pd.Timestamp(end), index[-2])
+    cand = index[(index > pd.Timestamp(start)) & (index <= end)]
+    if len(cand) == 0:
+        return cand
+    return cand[(cand - cand[0]) % pd.Timedelta(stride) == pd.Timedelta(0)]
+
+
+def _run_chunk(df, model, origins, n_steps, freq_td, feature_means, target_col, exog_cols, signed=False,
+               exog_models=None, keep=None):
+    """연속된 시작점 묶음. 이력은 한 번만 재생하고, 묶음 전체를 한 스텝씩 함께 예측 (스텝당 predict 1회)."""
+    fc = recursive_forecast(
+        df.loc[:origins[-1]],
+        model,
+        target_col,
+        n_steps,
+        freq_td,
+        feature_means,
+        exog_cols,
+        origins=origins,
+        exog_models=exog_models,
+        keep=keep,
+    )
+    steps = np.arange(1, n_steps + 1) * freq_td
+    actual = df[target_col]
+    resid = np.empty(fc.shape)
+    for i, origin in enumerate(origins):
+        resid[i] = actual.reindex(origin + steps).to_numpy() - fc.iloc[i].to_numpy()
+    return resid if signed else np.abs(resid)
+
+
+def run_backtest(df, model, feature_means, origins, freq_td, n_steps=None, target_col=TARGET_COL,
+                 exog_cols=EXOG_COLS, n_jobs=None, signed=False, exog_models=None, keep=None):
+    """
+    각 시작점에서 n_steps 스텝 재귀 예측의 절대오차 행렬을 반환한다.
+    (인덱스: 시작점, 컬럼: 호라이즌 1..n_steps, 실제값이 없는 칸은 NaN)
+    signed=True 면 절대값 대신 잔차(실제 - 예측) 를 반환한다 (conformal 보정용).
+    exog_models 를 주면 해당 외생변수도 함께 예측한다 (recursive_forecast 참고).
+    keep 은 모델의 축소 피처 스펙 (산출물 meta 의 feature_spec["keep"]).
+    """
+    n_steps = n_steps or int(HORIZON / freq_td)
+    n_jobs = max(1, min(n_jobs or os.cpu_count() or 1, len(origins)))
+    chunks = [c for c in np.array_split(np.asarray(origins), n_jobs) if len(c)]
+    args = (n_steps, freq_td, feature_means, target_col, exog_cols, signed, exog_models, keep)
+
+    t0 = time.perf_counter()
+    if n_jobs == 1:
+        parts = [_run_chunk(df, model, pd.DatetimeIndex(c), *args) for c in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            futures = [pool.submit(_run_chunk, df, model, pd.DatetimeIndex(c), *args) for c in chunks]
+            parts = [f.result() for f in futures]
+    print(f"백테스트: 시작점 {len(origins)}개 × {n_steps}스텝, 워커 {n_jobs}개 "
+          f"({time.perf_counter() - t0:.1f}초)")
+
+    return pd.DataFrame(
+        np.vstack(parts),
+        index=pd.DatetimeIndex(origins, name="origin"),
+        columns=pd.RangeIndex(1, n_steps + 1, name="horizon"),
+    )
+
+
+def horizon_mae(errors, freq_td):
+    """호라이즌별 MAE 곡선 (lead: 리드타임, n: 실제값이 있는 시작점 수)."""
+    out = pd.DataFrame({
+        "lead": errors.columns.to_numpy() * freq_td,
+        "mae": errors.mean(axis=0).to_numpy(),
+        "n": errors.notna().sum(axis=0).to_numpy(),
+    }, index=errors.columns)
+    return out
+
+
+def summarize_backtest(errors, freq_td, leads=SUMMARY_LEADS):
+    """리드타임별 요약표: 해당 호라이즌의 MAE 와 그 호라이즌까지의 평균 MAE."""
+    curve = horizon_mae(errors, freq_td)
+    rows = []
+    for lead in leads:
+        h = int(pd.Timedelta(lead) / freq_td)
+        if h < 1 or h > len(curve):
+            continue
+        upto = curve.loc[:h]
+        rows.append({
+            "lead": lead,
+            "horizon": h,
+            "mae": curve.loc[h, "mae"],
+            "mae_upto": np.average(upto["mae"].fillna(0), weights=upto["n"]) if upto["n"].sum() else np.nan,
+            "n_origins": int(curve.loc[h, "n"]),
+        })
+    return pd.DataFrame(rows).set_index("lead")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="재귀 7일 예측 롤링-오리진 백테스트")
+    parser.add_argument("--run", default=None, help="평가할 산출물 실행 ID (기본: CURRENT)")
+    parser.add_argument("--stride", default=str(STRIDE), help="시작점 간격 (예: 6h, 1D)")
+    parser.add_argument("--n-jobs", type=int, default=None, help="워커 프로세스 수 (기본: CPU 수)")
+    parser.add_argument("--out", type=Path, default=None, help="호라이즌별 MAE 곡선 CSV 저장 경로")
+    args = parser.parse_args(argv)
+
+    run_dir = artifacts.resolve_run_dir(args.run)
+    if run_dir is None:
+        raise SystemExit(f"실행 {args.run} 이 없습니다." if args.run
+                         else "평가할 학습 산출물이 없습니다. 먼저 train_offline.py 를 실행하세요.")
+    run_id = run_dir.name
+    meta = artifacts.load_meta(run_dir)
+    # 학습 때 외생변수 모델(--forecast-exog)을 함께 저장했으면 학습 백테스트와 같이 외생변수도 예측한다
+    exog_models = {
+        col: artifacts.load_booster(run_dir, file_name)
+        for col, file_name in (meta.get("exog_forecast") or {}).items()
+    }
+
+    df, _ = load_sensor_data(DATA_PATH, DATA_STORE_PATH)
+    df = df.astype({c: np.float64 for c in df.select_dtypes("number").columns})
+    df, freq_td = regular_grid.regrid_like(df, meta.get("grid"))
+
+    # 모델이 보지 않은 구간(학습 종료 이후)만 시작점으로 사용
+    origins = backtest_origins(df.index, meta["trained_until"], stride=args.stride)
+    if len(origins) == 0:
+        raise SystemExit(f"{meta['trained_until']} 이후 시작점이 없습니다.")
+
+    errors = run_backtest(
+        df,
+        artifacts.load_booster(run_dir),
+        artifacts.load_feature_means(run_dir),
+        origins,
+        freq_td,
+        exog_cols=meta["feature_spec"]["exog_cols"],
+        n_jobs=args.n_jobs,
+        exog_models=exog_models,
+        keep=meta["feature_spec"].get("keep"),
+    )
+
+    print(f"\n=== 롤링-오리진 백테스트 [{run_id}] ({origins[0]} ~ {origins[-1]}, 간격 {args.stride}, "
+          f"외생변수: {'예측' if exog_models else '마지막 관측값 유지'}) ===")
+    print(summarize_backtest(errors, freq_td).to_string(float_format=lambda v: f"{v:.4f}"))
+
+    if args.out is not None:
+        horizon_mae(errors, freq_td).to_csv(args.out, index=True, encoding="utf-8-sig")
+        print(f"\n호라이즌별 MAE 곡선을 저장했습니다: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
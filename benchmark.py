@@ -0,0 +1,445 @@
+# benchmark.py
+"""
+합성 10분 간격 센서 이력으로 학습·예측·대시보드 경로의 시간, 처리량, 최대 메모리를 재는 벤치마크.
+
+측정 항목 (이력 길이마다):
+- load                 : Parquet 저장소 → 대시보드 DataFrame (dashboard_data.load_water_data)
+- dashboard.aggregate  : 앱이 매 rerun 마다 하는 정렬·날짜 목록·선택일·기간 필터·주간 예보 집계
+- dashboard.csv_export : 전체 데이터 CSV 다운로드 버튼용 인코딩 (역시 매 rerun)
+- grid                 : 10분 격자 맞춤 + 짧은 결측 채우기 (regular_grid.to_regular_grid, 학습 전처리)
+- features             : make_features_with_diff
+- fold_datasets        : CV 폴드 lgb.Dataset 구성 (trial 사이에 재사용되는 준비 비용)
+- optuna_trial         : 고정 파라미터 Optuna trial 1회 (TimeSeriesSplit 전 폴드, early stopping)
+- recursive_forecast.Nd: N일(N × 144 스텝) 재귀 예측
+
+합성 데이터·trial 파라미터·예측 모델 트리 수·LightGBM 스레드 수를 고정하므로 같은 장비에서는 커밋 간
+결과를 그대로 비교할 수 있다. 결과는 data/benchmarks/<시각>-<커밋>.json 에 저장되고
+data/benchmarks/history.jsonl 에 한 줄씩 쌓인다.
+
+    $ python benchmark.py                                    # 30일, 1년 이력
+    $ python benchmark.py --lengths 1M 1y 10y --repeat 5
+    $ python benchmark.py --compare data/benchmarks/<이전 결과>.json   # 느려진 항목이 있으면 종료 코드 1
+"""
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+import lightgbm as lgb
+import numpy as np
+import optuna
+import pandas as pd
+
+import dashboard_data
+import regular_grid
+from data_store import DATA_DIR, convert_csv_to_store, rss_bytes
+from train_offline import (
+    BIN_PARAMS, CV_SPLITS, EXOG_COLS, RAW_COL, TARGET_COL, TEST_DAYS, FoldDatasets, get_fold_datasets,
+    make_features_with_diff, objective, recursive_forecast,
+)
+
+BENCH_DIR      = DATA_DIR / "benchmarks"
+HISTORY_FILE   = "history.jsonl"
+STEPS_PER_DAY  = 144                       # 10분 간격
+MIN_DAYS       = 28                        # 합성 이력 길이 범위: 1개월 ~ 10년
+MAX_DAYS       = 3660
+DEFAULT_LENGTHS = ["30d", "1y"]
+DEFAULT_REPEAT = 3
+MIN_MEASURE_SECONDS = 1.0                  # 빠른 항목은 누적 시간이 이만큼 될 때까지 반복 (최대 MAX_RUNS 회)
+MAX_RUNS       = 100
+DEFAULT_THREADS = min(4, os.cpu_count() or 1)   # LightGBM 스레드 수 (코어가 많아도 4 로 고정)
+FORECAST_TREES = 300                       # 예측 벤치마크 모델 트리 수
+TOLERANCE      = 0.15                      # --compare: 기준 대비 이만큼 넘게 느리거나 메모리가 크면 회귀
+TIME_SLACK_SECONDS = 0.005                 # --compare: 이보다 작은 시간 차이는 무시
+MEMORY_SLACK_MB = 8.0                      # --compare: 작은 메모리 변동은 무시
+RSS_POLL_SECONDS = 0.002
+SEED           = 42
+
+# 고정 trial 파라미터 (objective 의 탐색 공간 안쪽 값)
+TRIAL_PARAMS = {
+    "learning_rate": 0.05,
+    "num_leaves": 63,
+    "max_depth": -1,
+    "min_child_samples": 50,
+    "min_child_weight": 1e-3,
+    "subsample": 1.0,
+    "colsample_bytree": 0.8,
+    "reg_alpha": 0.0,
+    "reg_lambda": 1.0,
+}
+
+_UNIT_DAYS = {"d": 1, "w": 7, "M": 30, "y": 365}
+
+
+def parse_length(text):
+    """'30d', '2w', '6M', '1y', '10y' 또는 일수 → 일수."""
+    text = str(text).strip()
+    if text[-1:] in _UNIT_DAYS:
+        days = int(float(text[:-1]) * _UNIT_DAYS[text[-1]])
+    else:
+        days = int(text)
+    if not MIN_DAYS <= days <= MAX_DAYS:
+        raise argparse.ArgumentTypeError(f"이력 길이는 {MIN_DAYS}~{MAX_DAYS}일이어야 합니다: {text}")
+    return days
+
+
+# =====================================================================
+# 합성 센서 이력
+# =====================================================================
+def _smooth_noise(rng, n, scale, span):
+    """지수 가중 이동평균으로 만든 느린 잡음 (AR(1) 근사, span 스텝 기억)."""
+    kernel = np.exp(-np.arange(span * 5) / span)
+    kernel /= np.sqrt((kernel ** 2).sum())
+    noise = rng.standard_normal(n + len(kernel) - 1)
+    return scale * np.convolve(noise, kernel, mode="valid")
+
+
+def synthetic_history(days, seed=SEED, start="2015-01-01", missing_rate=0.002, gaps_per_month=1):
+    """
+    df_final 과 같은 컬럼의 10분 간격 합성 이력 (Timestamp 인덱스, float32).
+    일주기·연주기·조석 주기와 느린 잡음을 섞고, 타깃 외 측정값 일부를 NaN 으로, 한 달에 gaps_per_month 번
+    1~6 스텝 구간을 통째로 비운다. 같은 (days, seed) 면 항상 같은 값.
+    """
+    rng = np.random.default_rng(seed)
+    n = days * STEPS_PER_DAY
+    t = np.arange(n)
+    day = 2 * np.pi * t / STEPS_PER_DAY
+    year = 2 * np.pi * t / (365.25 * STEPS_PER_DAY)
+    tide = 2 * np.pi * t / (12.42 * 6)
+
+    sun = np.clip(np.sin(day - np.pi / 2), 0, None) * (800 + 250 * np.sin(year))
+    air = 22 + 5 * np.sin(year) + 4 * np.sin(day - 2.0) + _smooth_noise(rng, n, 1.5, 2 * STEPS_PER_DAY)
+    water = 23 + 4 * np.sin(year - 0.3) + 0.5 * np.sin(day - 2.5) + _smooth_noise(rng, n, 0.5, 3 * STEPS_PER_DAY)
+    turbidity = np.exp(2.3 + _smooth_noise(rng, n, 0.4, STEPS_PER_DAY) + 0.2 * np.sin(tide))
+    salinity = 28 + 3 * np.sin(tide) + _smooth_noise(rng, n, 2.0, 7 * STEPS_PER_DAY)
+    humidity = np.clip(70 - 15 * np.sin(day - 2.0) + _smooth_noise(rng, n, 8.0, STEPS_PER_DAY), 10, 100)
+    chl = np.clip(
+        3.5 + 0.12 * (water - 23) + 0.0015 * np.convolve(sun, np.ones(72) / 72, mode="same")
+        + 0.8 * np.sin(year) + _smooth_noise(rng, n, 1.2, 2 * STEPS_PER_DAY) + 0.05 * rng.standard_normal(n),
+        0.1, None,
+    )
+    oxygen = 7 + 0.25 * (chl - 3.5) - 0.1 * (water - 23) + 0.3 * np.sin(day - 2.0) + _smooth_noise(rng, n, 0.2, 36)
+    ph = 8 + 0.05 * (chl - 3.5) + _smooth_noise(rng, n, 0.05, STEPS_PER_DAY)
+
+    values = {
+        RAW_COL: chl + 0.4 * rng.standard_normal(n),
+        TARGET_COL: chl,
+        "Dissolved Oxygen_Kalman": oxygen,
+        "Salinity_Kalman": salinity,
+        "Temperature_Kalman": water,
+        "Turbidity_Kalman": turbidity,
+        "pH_Kalman": ph,
+        "W_Relative Humidity": humidity,
+        "W_Shortwave Radiation": sun,
+        "W_Temperature": air,
+    }
+    assert set(EXOG_COLS) <= set(values)
+
+    df = pd.DataFrame(
+        {col: np.asarray(v, dtype=np.float32) for col, v in values.items()},
+        index=pd.date_range(start, periods=n, freq="10min", name="Timestamp"),
+    )
+    for col in df.columns.drop(TARGET_COL):          # 타깃(Kalman 보정값)은 결측 없음
+        df.loc[rng.random(n) < missing_rate, col] = np.nan
+
+    n_gaps = max(1, days * gaps_per_month // 30)
+    starts = rng.choice(np.arange(STEPS_PER_DAY, n - STEPS_PER_DAY), size=n_gaps, replace=False)
+    drop = np.unique(np.concatenate([s + np.arange(rng.integers(1, 7)) for s in starts]))
+    return df.drop(df.index[drop])
+
+
+# =====================================================================
+# 측정
+# =====================================================================
+class _PeakRss:
+    """측정 구간 동안 RSS 를 주기적으로 읽어 시작 대비 최대 증가량을 구한다 (LightGBM 등 C 할당 포함)."""
+
+    def __init__(self, interval=RSS_POLL_SECONDS):
+        self.interval = interval
+        self.base = self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _poll(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, rss_bytes())
+
+    def __enter__(self):
+        self.base = self.peak = rss_bytes()
+        self._thread = threading.Thread(target=self._poll, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss_bytes())
+
+    def delta_mb(self):
+        return (self.peak - self.base) / 2**20
+
+
+def measure(fn, units, repeat=DEFAULT_REPEAT):
+    """
+    fn() 을 repeat 번 (빠른 항목은 누적 MIN_MEASURE_SECONDS 까지) 재서 중앙값·최솟값,
+    초당 처리량(units / 중앙값), 그 동안의 최대 RSS 증가량을 구하고,
+    한 번 더 실행해 tracemalloc 최대 할당량(파이썬·NumPy)을 잰다.
+    tracemalloc 실행은 느리고 자체 메모리를 쓰므로 시간·RSS 에 넣지 않는다.
+    """
+    times = []
+    gc.collect()
+    with _PeakRss() as rss:
+        while len(times) < repeat or (sum(times) < MIN_MEASURE_SECONDS and len(times) < MAX_RUNS):
+            t0 = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - t0)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, traced_peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    median = float(np.median(times))
+    return {
+        "seconds": median,
+        "min_seconds": min(times),
+        "runs": times,
+        "units": units,
+        "throughput": units / median if median > 0 else None,
+        "peak_rss_delta_mb": rss.delta_mb(),
+        "traced_peak_mb": traced_peak / 2**20,
+    }
+
+
+def _optuna_trial(X_train, y_train, threads):
+    study = optuna.create_study(direction="minimize", pruner=optuna.pruners.NopPruner(),
+                                sampler=optuna.samplers.RandomSampler(seed=SEED))
+    study.enqueue_trial(TRIAL_PARAMS)
+    study.optimize(lambda trial: objective(trial, X_train, y_train, lgbm_threads=threads), n_trials=1)
+    return study.trials[0]
+
+
+def _dashboard_rerun(df, forecast_df):
+    """streamlit_app.py 가 rerun 마다 하는 데이터 작업 (get_water_data 이후, 그리기 제외)."""
+    df = df.sort_values("Timestamp")
+    dates = dashboard_data.available_dates(df)
+    sel_df = dashboard_data.day_frame(df, dates[-1])
+    for col in ["Chlorophyll_Kalman", "Temperature_Kalman", "Turbidity_Kalman", "Dissolved Oxygen_Kalman"]:
+        sel_df[col].dropna()
+    df_range = dashboard_data.range_frame(df, max(dates[0], dates[-1] - datetime.timedelta(days=2)), dates[-1])
+    df_range.tail(300)
+    dashboard_data.daily_forecast(forecast_df, "Forecast_Chlorophyll_Kalman")
+
+
+def bench_length(days, cases, forecast_days, repeat, threads, workdir):
+    """이력 길이 하나에 대한 측정 결과 {항목: 결과}."""
+    results = {}
+    raw = synthetic_history(days)
+    rows = len(raw)
+    print(f"\n=== {days}일 이력 ({rows:,}행) ===")
+
+    def run(name, fn, units):
+        results[name] = measure(fn, units, repeat)
+        r = results[name]
+        print(f"  {name:<24} {r['seconds']:9.3f}초 (최소 {r['min_seconds']:.3f})  "
+              f"{r['throughput']:>13,.0f} {'스텝' if name.startswith('recursive') else '행'}/초  "
+              f"RSS +{r['peak_rss_delta_mb']:7.1f} MiB  할당 최대 {r['traced_peak_mb']:7.1f} MiB")
+
+    if "dashboard" in cases:
+        csv_path, store_path = workdir / f"bench_{days}d.csv", workdir / f"bench_{days}d.parquet"
+        raw.reset_index().to_csv(csv_path, index=False, date_format="%Y-%m-%d %H:%M:%S")
+        convert_csv_to_store(csv_path, store_path)
+        run("load", lambda: dashboard_data.load_water_data(csv_path, store_path, verbose=False), rows)
+
+        df_app = dashboard_data.load_water_data(csv_path, store_path, verbose=False)
+        steps_week = 7 * STEPS_PER_DAY
+        forecast_df = pd.DataFrame({
+            "Timestamp": pd.date_range(raw.index[-1], periods=steps_week + 1, freq="10min")[1:],
+            "Forecast_Chlorophyll_Kalman": raw[TARGET_COL].ffill().to_numpy()[-steps_week:],
+        })
+        run("dashboard.aggregate", lambda: _dashboard_rerun(df_app, forecast_df), rows)
+        run("dashboard.csv_export", lambda: df_app.to_csv(index=False).encode("utf-8-sig"), rows)
+        del df_app
+
+    # 학습과 같은 float64 격자 프레임
+    df = raw.astype(np.float64)
+    if not cases & {"features", "trial", "forecast"}:
+        return results
+
+    if "features" in cases:
+        run("grid", lambda: regular_grid.to_regular_grid(df, verbose=False), rows)
+    df, _, _ = regular_grid.to_regular_grid(df, verbose=False)
+
+    if "features" in cases:
+        run("features", lambda: make_features_with_diff(df, TARGET_COL, exog_cols=EXOG_COLS), rows)
+    X_all, y_all = make_features_with_diff(df, TARGET_COL, exog_cols=EXOG_COLS)
+    # 학습과 같이 마지막 TEST_DAYS 를 뺀다 (짧은 이력은 1/4 만)
+    test_days = min(TEST_DAYS, days // 4)
+    X_train = X_all[X_all.index <= X_all.index.max() - pd.Timedelta(days=test_days)]
+    y_train = y_all.loc[X_train.index]
+
+    if "trial" in cases:
+        run("fold_datasets", lambda: FoldDatasets(X_train, y_train, CV_SPLITS, BIN_PARAMS), len(X_train))
+        get_fold_datasets(X_train, y_train)          # trial 측정에는 준비 비용을 넣지 않는다
+        run("optuna_trial", lambda: _optuna_trial(X_train, y_train, threads), len(X_train))
+        trial = _optuna_trial(X_train, y_train, threads)
+        results["optuna_trial"]["fold_best_iterations"] = trial.user_attrs.get("fold_best_iterations")
+
+    if "forecast" in cases:
+        params = {"objective": "regression", "verbose": -1, "seed": SEED, "num_threads": threads, **TRIAL_PARAMS}
+        model = lgb.train(params, get_fold_datasets(X_train, y_train).full, num_boost_round=FORECAST_TREES)
+        feature_means = X_train.mean()
+        freq_td = pd.Timedelta("10min")
+        for d in forecast_days:
+            n_steps = d * STEPS_PER_DAY
+            run(f"recursive_forecast.{d}d",
+                lambda: recursive_forecast(df, model, TARGET_COL, n_steps, freq_td, feature_means, EXOG_COLS),
+                n_steps)
+    return results
+
+
+# =====================================================================
+# 결과 저장·비교
+# =====================================================================
+def _git(*args):
+    try:
+        out = subprocess.run(["git", *args], cwd=Path(__file__).parent, capture_output=True, text=True,
+                             timeout=30)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() if out.returncode == 0 else None
+
+
+def environment(threads):
+    status = _git("status", "--porcelain", "--untracked-files=no")
+    return {
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(status) if status is not None else None,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "lightgbm": lgb.__version__,
+        "optuna": optuna.__version__,
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "lgbm_threads": threads,
+    }
+
+
+def write_results(report, out=None, bench_dir=None):
+    bench_dir = Path(bench_dir or BENCH_DIR)
+    bench_dir.mkdir(parents=True, exist_ok=True)
+    commit = (report["environment"]["commit"] or "nogit")[:8]
+    path = Path(out) if out else bench_dir / f"{time.strftime('%Y%m%d-%H%M%S')}-{commit}.json"
+    path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    summary = {
+        "file": path.name,
+        "created_at": report["created_at"],
+        **{k: report["environment"][k] for k in ("commit", "dirty", "cpu_count", "lgbm_threads")},
+        "seconds": {key: r["seconds"] for key, r in report["results"].items()},
+        "peak_rss_delta_mb": {key: r["peak_rss_delta_mb"] for key, r in report["results"].items()},
+    }
+    with open(bench_dir / HISTORY_FILE, "a", encoding="utf-8") as f:
+        f.write(json.dumps(summary, ensure_ascii=False) + "\n")
+    return path
+
+
+def compare(report, base, tolerance=TOLERANCE):
+    """
+    기준 결과와 항목별 시간·메모리를 비교해 출력하고 회귀 항목 목록을 반환.
+    시간은 잡음이 적은 최솟값끼리 비교한다.
+    """
+    env, base_env = report["environment"], base["environment"]
+    different = [k for k in ("python", "numpy", "pandas", "lightgbm", "optuna", "machine", "cpu_count",
+                             "lgbm_threads") if env.get(k) != base_env.get(k)]
+    print(f"\n=== 기준 {str(base_env.get('commit'))[:8]} 대비 ===")
+    if different:
+        print("  주의: 실행 환경이 다릅니다 → " + ", ".join(
+            f"{k} {base_env.get(k)} → {env.get(k)}" for k in different))
+
+    regressions = []
+    for key, r in report["results"].items():
+        b = base["results"].get(key)
+        if b is None:
+            continue
+        ratio = r["min_seconds"] / b["min_seconds"] if b["min_seconds"] > 0 else float("inf")
+        mem = r["peak_rss_delta_mb"] - b["peak_rss_delta_mb"]
+        slow = r["min_seconds"] > b["min_seconds"] * (1 + tolerance) + TIME_SLACK_SECONDS
+        heavy = r["peak_rss_delta_mb"] > b["peak_rss_delta_mb"] * (1 + tolerance) + MEMORY_SLACK_MB
+        flag = "  ← 회귀" if slow or heavy else ""
+        print(f"  {key:<32} {b['min_seconds']:9.3f}초 → {r['min_seconds']:9.3f}초 ({ratio:5.2f}배)  "
+              f"RSS {mem:+8.1f} MiB{flag}")
+        if flag:
+            regressions.append(key)
+    if not set(report["results"]) & set(base["results"]):
+        print("  공통 항목이 없습니다 (이력 길이·항목 설정이 다름).")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="학습·예측·대시보드 경로 벤치마크 (합성 10분 이력)")
+    parser.add_argument("--lengths", nargs="+", type=parse_length, default=None,
+                        help=f"이력 길이 목록 (예: 30d 6M 1y 10y, 기본: {' '.join(DEFAULT_LENGTHS)})")
+    parser.add_argument("--cases", nargs="+", choices=["dashboard", "features", "trial", "forecast"],
+                        default=["dashboard", "features", "trial", "forecast"])
+    parser.add_argument("--forecast-days", nargs="+", type=int, default=list(range(1, 8)),
+                        help="재귀 예측 길이(일) 목록 (기본: 1~7)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="항목별 시간 측정 반복 수")
+    parser.add_argument("--threads", type=int, default=DEFAULT_THREADS, help="LightGBM 스레드 수")
+    parser.add_argument("--out", type=Path, default=None, help="결과 JSON 경로 (기본: data/benchmarks/)")
+    parser.add_argument("--compare", type=Path, default=None, help="비교할 이전 결과 JSON")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="회귀로 볼 느려짐 비율")
+    args = parser.parse_args(argv)
+    args.lengths = args.lengths or [parse_length(s) for s in DEFAULT_LENGTHS]
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": environment(args.threads),
+        "config": {
+            "lengths_days": args.lengths,
+            "cases": args.cases,
+            "forecast_days": args.forecast_days,
+            "repeat": args.repeat,
+            "forecast_trees": FORECAST_TREES,
+            "trial_params": TRIAL_PARAMS,
+            "seed": SEED,
+        },
+        "results": {},
+    }
+
+    t0 = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp:
+        for days in args.lengths:
+            results = bench_length(days, set(args.cases), args.forecast_days, args.repeat, args.threads, Path(tmp))
+            report["results"].update({f"{name}@{days}d": r for name, r in results.items()})
+    report["total_seconds"] = time.perf_counter() - t0
+
+    path = write_results(report, args.out)
+    print(f"\n결과: {path} ({report['total_seconds']:.0f}초)")
+
+    if args.compare is not None:
+        base = json.loads(args.compare.read_text(encoding="utf-8"))
+        regressions = compare(report, base, args.tolerance)
+        if regressions:
+            print(f"회귀 {len(regressions)}건: {', '.join(regressions)}")
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# conformal.py
+"""
+재귀 7일 예측의 호라이즌별 split-conformal 예측 구간과 임계값 초과 확률.
+
+학습 시 테스트 구간(모델이 보지 않은 구간)의 여러 시작점에서 예측한 잔차(실제 - 예측)를
+호라이즌 버킷(기본 1시간)별로 모아 잔차 분위수 표(버킷 × 분위수 수준)로 한 번 저장한다.
+이후 어떤 예측이든 구간과 초과 확률은 이 표를 조회하는 O(호라이즌) 계산으로 끝나며
+모델을 추가로 평가하지 않는다. train_offline.py 가 만들고 streamlit_app.py 가 읽는다.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+BUCKET   = pd.Timedelta("1h")              # 잔차를 모으는 호라이즌 구간 폭
+LEVELS   = np.linspace(0.0, 1.0, 101)      # 저장하는 잔차 분위수 수준 (1% 간격, 최소·최대 포함)
+COVERAGE = 0.8                             # 기본 구간 포함 확률 (P10~P90 과 같은 폭)
+
+
+def calibrate(residuals, freq_td, bucket=BUCKET, levels=LEVELS):
+    """
+    residuals: (시작점 × 호라이즌 1..n) 잔차(실제 - 예측) DataFrame, 실제값이 없는 칸은 NaN.
+    반환: {"levels", "quantiles"(버킷 × 수준), "counts"(버킷별 잔차 수), "bucket_steps"} 배열 dict
+    """
+    values = residuals.to_numpy(dtype=np.float64)
+    bucket_steps = max(1, int(pd.Timedelta(bucket) / freq_td))
+    n_buckets = math.ceil(values.shape[1] / bucket_steps)
+
+    quantiles = np.full((n_buckets, len(levels)), np.nan)
+    counts = np.zeros(n_buckets, dtype=np.int64)
+    for b in range(n_buckets):
+        r = values[:, b * bucket_steps:(b + 1) * bucket_steps].ravel()
+        r = r[~np.isnan(r)]
+        counts[b] = len(r)
+        if len(r):
+            quantiles[b] = np.quantile(r, levels)
+    return {
+        "levels": np.asarray(levels, dtype=np.float64),
+        "quantiles": quantiles,
+        "counts": counts,
+        "bucket_steps": np.int64(bucket_steps),
+    }
+
+
+def load(path):
+    with np.load(path) as f:
+        return {k: f[k] for k in f.files}
+
+
+def _buckets(n_steps, table):
+    """호라이즌 1..n_steps → 버킷 번호 (보정 범위를 넘는 호라이즌은 마지막 버킷)."""
+    b = np.arange(n_steps) // int(table["bucket_steps"])
+    return np.minimum(b, len(table["counts"]) - 1)
+
+
+def intervals(point, table, coverage=COVERAGE):
+    """
+    점 예측 궤적(호라이즌 1..n 순서) 에 대한 (하한, 상한) 배열.
+    유한 표본 보정: 수준을 (n+1)/n 배로 넓힌 잔차 분위수를 더한다.
+    """
+    point = np.asarray(point, dtype=np.float64)
+    alpha = 1.0 - coverage
+    lower = np.full(len(point), np.nan)
+    upper = np.full(len(point), np.nan)
+
+    buckets = _buckets(len(point), table)
+    for b in np.unique(buckets):
+        n = table["counts"][b]
+        if n == 0:
+            continue
+        hi = min(1.0, (1.0 - alpha / 2) * (n + 1) / n)
+        lo = max(0.0, 1.0 - hi)
+        q = table["quantiles"][b]
+        rows = buckets == b
+        lower[rows] = point[rows] + np.interp(lo, table["levels"], q)
+        upper[rows] = point[rows] + np.interp(hi, table["levels"], q)
+    return lower, upper
+
+
+def exceedance_probability(point, table, threshold):
+    """각 호라이즌에서 실제값이 threshold 를 넘을 확률 P(점 예측 + 잔차 > threshold)."""
+    point = np.asarray(point, dtype=np.float64)
+    prob = np.full(len(point), np.nan)
+
+    buckets = _buckets(len(point), table)
+    for b in np.unique(buckets):
+        if table["counts"][b] == 0:
+            continue
+        rows = buckets == b
+        # 잔차 분위수 표를 뒤집어 경험적 CDF 로 사용
+        cdf = np.interp(threshold - point[rows], table["quantiles"][b], table["levels"], left=0.0, right=1.0)
+        prob[rows] = 1.0 - cdf
+    return prob
@@ -0,0 +1,49 @@
+# dashboard_data.py
+"""
+streamlit_app.py 의 데이터 적재·집계 경로 (Streamlit 없이 호출 가능).
+앱은 화면 구성만 하고 여기 함수로 데이터를 만든다. benchmark.py 도 같은 함수를 측정한다.
+"""
+import pandas as pd
+
+from data_store import load_sensor_data, CSV_PATH, STORE_PATH
+
+
+def load_water_data(csv_path=CSV_PATH, store_path=STORE_PATH, verbose=True):
+    """센서 이력 → Timestamp·date 컬럼을 가진 DataFrame (앱의 get_water_data 캐시 대상)."""
+    df, _ = load_sensor_data(csv_path, store_path, verbose=verbose)
+    df = df.reset_index()
+    df["date"] = df["Timestamp"].dt.date
+    return df
+
+
+def available_dates(df):
+    return sorted(df["date"].unique())
+
+
+def day_frame(df, day):
+    """선택 날짜의 행."""
+    return df[df["date"] == day]
+
+
+def range_frame(df, start_date, end_date):
+    """start_date ~ end_date (양 끝 포함) 날짜의 행."""
+    mask = (df["date"] >= start_date) & (df["date"] <= end_date)
+    return df.loc[mask].copy()
+
+
+def daily_forecast(df_fore, forecast_col, exceed_col=None, days=7):
+    """예측을 날짜별 min/max/mean (+ 하루 최대 초과 확률 exceed) 로 집계한 앞 days 일."""
+    df_fore = df_fore.copy()
+    df_fore["date"] = df_fore["Timestamp"].dt.date
+
+    daily = (
+        df_fore.groupby("date")[forecast_col]
+        .agg(["min", "max", "mean"])
+        .reset_index()
+    )
+    if exceed_col is not None and exceed_col in df_fore.columns:
+        # 하루 중 가장 높은 시점의 초과 확률
+        daily = daily.merge(
+            df_fore.groupby("date")[exceed_col].max().rename("exceed").reset_index(), on="date", how="left"
+        )
+    return daily.sort_values("date").head(days)
@@ -0,0 +1,156 @@
+# data_store.py
+"""
+센서 이력(df_final.csv)을 타입이 지정된 Parquet 저장소로 변환하고 읽어 오는 모듈.
+train_offline.py 와 streamlit_app.py 가 함께 사용한다.
+
+- 측정값은 float32, 시각은 datetime64 인덱스(Timestamp)로 저장
+- 스키마 메타데이터에 내용 해시와 원본 CSV 정보(크기, 수정 시각)를 기록
+- 저장소가 없거나 원본 CSV 보다 오래되었으면 CSV 를 직접 파싱
+
+    $ python data_store.py          # data/df_final.csv → data/df_final.parquet
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+DATA_DIR   = Path(__file__).parent / "data"
+CSV_PATH   = DATA_DIR / "df_final.csv"
+STORE_PATH = DATA_DIR / "df_final.parquet"
+
+TIME_COL    = "Timestamp"
+TIME_FORMAT = "ISO8601"              # "2024-01-01 00:10:00" 형식, 추론 없이 파싱
+_META_KEY   = b"water_quality_store"
+
+
+def rss_bytes():
+    """현재 프로세스 RSS(바이트). /proc 이 없는 환경에서는 0."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+def content_hash(df: pd.DataFrame) -> str:
+    """인덱스·컬럼·dtype·값 기준 sha256. 저장 형식(CSV/Parquet)과 무관하게 같은 값."""
+    h = hashlib.sha256()
+    h.update("|".join(f"{c}:{t}" for c, t in df.dtypes.astype(str).items()).encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def read_sensor_csv(csv_path=CSV_PATH) -> pd.DataFrame:
+    df = pd.read_csv(csv_path)
+    df[TIME_COL] = pd.to_datetime(df[TIME_COL], format=TIME_FORMAT)
+    df = df.sort_values(TIME_COL).set_index(TIME_COL)
+
+    num_cols = df.select_dtypes("number").columns
+    df[num_cols] = df[num_cols].astype(np.float32)
+    return df
+
+
+def _source_info(csv_path):
+    stat = Path(csv_path).stat()
+    return {"source": Path(csv_path).name, "source_size": stat.st_size, "source_mtime_ns": stat.st_mtime_ns}
+
+
+def read_store_meta(store_path=STORE_PATH):
+    import pyarrow.parquet as pq
+
+    metadata = pq.read_schema(store_path).metadata or {}
+    return json.loads(metadata.get(_META_KEY, b"{}"))
+
+
+def convert_csv_to_store(csv_path=CSV_PATH, store_path=STORE_PATH):
+    """CSV 를 파싱해 Parquet 저장소로 기록한다. 임시 파일에 쓴 뒤 교체하므로 읽는 쪽은 항상 완전한 파일을 본다."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    df = read_sensor_csv(csv_path)
+    meta = {
+        "content_hash": content_hash(df),
+        "rows": len(df),
+        **_source_info(csv_path),
+    }
+
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        _META_KEY: json.dumps(meta).encode("utf-8"),
+    })
+
+    store_path = Path(store_path)
+    tmp_path = store_path.with_name(store_path.name + ".tmp")
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, store_path)
+    return meta
+
+
+def store_is_fresh(csv_path=CSV_PATH, store_path=STORE_PATH):
+    """저장소가 있고, 원본 CSV 가 없거나 변환 이후 바뀌지 않았으면 True."""
+    if not Path(store_path).exists():
+        return False
+    if not Path(csv_path).exists():
+        return True
+    try:
+        meta = read_store_meta(store_path)
+    except ImportError:
+        return False
+    info = _source_info(csv_path)
+    return all(meta.get(k) == v for k, v in info.items() if k != "source")
+
+
+def load_sensor_data(csv_path=CSV_PATH, store_path=STORE_PATH, refresh_store=False, verbose=True):
+    """
+    센서 이력을 (DataFrame, 메타데이터) 로 반환한다. 인덱스는 Timestamp, 측정값은 float32.
+    refresh_store=True 면 저장소가 없거나 오래된 경우 CSV 에서 다시 변환한다.
+    """
+    t0 = time.perf_counter()
+    rss0 = rss_bytes()
+
+    if refresh_store and Path(csv_path).exists() and not store_is_fresh(csv_path, store_path):
+        try:
+            convert_csv_to_store(csv_path, store_path)
+        except ImportError:
+            pass   # pyarrow 미설치 → CSV 로 진행
+
+    if store_is_fresh(csv_path, store_path):
+        df = pd.read_parquet(store_path)
+        meta = read_store_meta(store_path)
+        source, path = "parquet", store_path
+    elif Path(csv_path).exists():
+        df = read_sensor_csv(csv_path)
+        meta = {"content_hash": content_hash(df), "rows": len(df), **_source_info(csv_path)}
+        source, path = "csv", csv_path
+    else:
+        raise FileNotFoundError(f"데이터 파일을 찾을 수 없습니다: {csv_path}")
+
+    meta = {
+        **meta,
+        "loaded_from": source,
+        "load_seconds": time.perf_counter() - t0,
+        "frame_bytes": int(df.memory_usage(deep=True).sum()),
+        "rss_delta_bytes": max(0, rss_bytes() - rss0),
+    }
+    if verbose:
+        print(
+            f"[data_store] {source} 로드: {path} ({len(df):,}행, {meta['load_seconds']:.3f}초, "
+            f"프레임 {meta['frame_bytes'] / 2**20:.1f} MiB, RSS +{meta['rss_delta_bytes'] / 2**20:.1f} MiB)"
+        )
+    return df, meta
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="df_final.csv → Parquet 저장소 변환")
+    parser.add_argument("--csv", type=Path, default=CSV_PATH)
+    parser.add_argument("--out", type=Path, default=STORE_PATH)
+    args = parser.parse_args()
+
+    meta = convert_csv_to_store(args.csv, args.out)
+    print(f"{args.csv} → {args.out} ({meta['rows']:,}행, content_hash={meta['content_hash'][:12]})")
@@ -0,0 +1,239 @@
+# profiling.py
+"""
+train_offline.py 실행 계측과 JSON 실행 보고서.
+
+- RunReport.lap(이름): 직전 lap 이후 단계의 시간, RSS 변화, 그때까지의 최대 RSS
+  (trace_memory=True 면 tracemalloc 으로 단계 안 NumPy·파이썬 할당 최대치도 기록)
+- record / timed: 자주 호출되는 함수(make_features_with_diff, recursive_forecast 의 predict 등)의
+  호출 수·누적 시간. 활성 보고서가 없으면 아무것도 하지 않는다
+- Profiler: 선택적 cProfile 또는 SIGPROF 표본 추출 프로파일러 (상위 함수 요약을 보고서에 포함)
+
+보고서는 실행 디렉터리의 run_report.json 에, 요약 한 줄은 산출물 루트의 run_history.jsonl 에 쌓여
+실행 간 추이를 볼 수 있다 (실행 디렉터리는 KEEP_RUNS 개만 남지만 이력은 남는다).
+"""
+import cProfile
+import json
+import os
+import pstats
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from functools import wraps
+from pathlib import Path
+
+from data_store import rss_bytes
+
+REPORT_FILE     = "run_report.json"
+HISTORY_FILE    = "run_history.jsonl"
+PROFILE_FILE    = "profile.prof"          # cProfile 원본 (snakeviz, pstats 로 열람)
+SAMPLE_INTERVAL = 0.005                   # 표본 추출 간격 (CPU 시간 초)
+PROFILE_TOP     = 30                      # 보고서에 남기는 상위 함수 수
+
+_ACTIVE = None
+_LOCK = threading.Lock()
+
+
+def _peak_rss_bytes():
+    """프로세스 시작 이후 최대 RSS. resource 모듈이 없는 환경에서는 현재 RSS."""
+    try:
+        import resource
+    except ImportError:
+        return rss_bytes()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024     # Linux 는 KiB 단위
+
+
+class RunReport:
+    """단계별 시간·메모리와 함수 호출 누적 시간을 모으는 실행 보고서."""
+
+    def __init__(self, trace_memory=False):
+        self.start = self.last = time.perf_counter()
+        self.started_at = time.strftime("%Y-%m-%dT%H:%M:%S")
+        self.stages = {}
+        self.calls = {}
+        self.profile = None
+        self.trace_memory = trace_memory
+        if trace_memory:
+            tracemalloc.start()
+        self._rss_last = rss_bytes()
+
+    def lap(self, name):
+        """직전 lap 이후를 name 단계로 기록 (같은 이름이 다시 오면 누적)."""
+        now = time.perf_counter()
+        rss = rss_bytes()
+        entry = self.stages.setdefault(name, {"seconds": 0.0, "rss_delta_mb": 0.0})
+        entry["seconds"] += now - self.last
+        entry["rss_delta_mb"] += (rss - self._rss_last) / 2**20
+        entry["peak_rss_mb"] = _peak_rss_bytes() / 2**20
+        if self.trace_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            entry["traced_peak_mb"] = max(entry.get("traced_peak_mb", 0.0), peak / 2**20)
+            tracemalloc.reset_peak()
+        self.last = now
+        self._rss_last = rss
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def add_call(self, name, seconds):
+        with _LOCK:
+            entry = self.calls.setdefault(name, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def stage_seconds(self):
+        return {name: entry["seconds"] for name, entry in self.stages.items()}
+
+    def to_dict(self, **extra):
+        return {
+            **extra,
+            "started_at": self.started_at,
+            "total_seconds": self.elapsed(),
+            "peak_rss_mb": _peak_rss_bytes() / 2**20,
+            "stages": self.stages,
+            "calls": {
+                name: {"calls": n, "seconds": sec, "mean_ms": sec / n * 1e3}
+                for name, (n, sec) in sorted(self.calls.items(), key=lambda kv: -kv[1][1])
+            },
+            "profile": self.profile,
+        }
+
+    def print_summary(self, budget_seconds=None):
+        total = self.elapsed()
+        head = f"{total:.1f}초" + (f" / 예산 {budget_seconds:.0f}초" if budget_seconds else "")
+        print(f"\n=== 단계별 실행 보고 ({head}) ===")
+        base = budget_seconds or total
+        for name, entry in self.stages.items():
+            traced = f", 할당 최대 {entry['traced_peak_mb']:.1f} MiB" if "traced_peak_mb" in entry else ""
+            print(f"{name:<12} {entry['seconds']:8.1f}초 ({entry['seconds'] / base:6.1%})  "
+                  f"RSS {entry['rss_delta_mb']:+7.1f} MiB, 최대 {entry['peak_rss_mb']:.0f} MiB{traced}")
+        for name, (n, sec) in sorted(self.calls.items(), key=lambda kv: -kv[1][1]):
+            print(f"  {name:<28} {n:>7,}회 {sec:8.2f}초 (평균 {sec / n * 1e3:.3f} ms)")
+
+    def write(self, run_dir, history_dir=None, **extra):
+        """run_dir/run_report.json 저장 + history_dir/run_history.jsonl 에 요약 한 줄 추가."""
+        data = self.to_dict(**extra)
+        path = Path(run_dir) / REPORT_FILE
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2, default=str), encoding="utf-8")
+        os.replace(tmp, path)
+
+        if history_dir is not None:
+            summary = {k: v for k, v in data.items() if k not in ("stages", "calls", "profile")}
+            summary["stage_seconds"] = self.stage_seconds()
+            summary["call_seconds"] = {name: sec for name, (_, sec) in self.calls.items()}
+            with open(Path(history_dir) / HISTORY_FILE, "a", encoding="utf-8") as f:
+                f.write(json.dumps(summary, ensure_ascii=False, default=str) + "\n")
+        return path
+
+
+def activate(report):
+    """record / timed 가 기록할 보고서를 지정 (None 이면 계측 끔)."""
+    global _ACTIVE
+    _ACTIVE = report
+
+
+def record(name, seconds):
+    if _ACTIVE is not None:
+        _ACTIVE.add_call(name, seconds)
+
+
+def timed(name):
+    """함수 호출 수·누적 시간을 활성 보고서에 기록하는 데코레이터."""
+    def deco(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _ACTIVE is None:
+                return fn(*args, **kwargs)
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _ACTIVE.add_call(name, time.perf_counter() - t0)
+        return wrapper
+    return deco
+
+
+class _Sampler:
+    """SIGPROF 타이머로 메인 스레드 스택을 주기적으로 표본 추출 (Unix 전용, 외부 의존성 없음)."""
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples = 0
+        self.total = Counter()       # 스택에 있던 표본 수 (누적)
+        self.own = Counter()         # 맨 위 프레임이던 표본 수 (자체)
+
+    def _handler(self, signum, frame):
+        self.samples += 1
+        seen = set()
+        top = True
+        while frame is not None:
+            code = frame.f_code
+            key = f"{code.co_filename}:{code.co_firstlineno}({code.co_name})"
+            if top:
+                self.own[key] += 1
+                top = False
+            if key not in seen:
+                self.total[key] += 1
+                seen.add(key)
+            frame = frame.f_back
+
+    def start(self):
+        signal.signal(signal.SIGPROF, self._handler)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self, top=PROFILE_TOP):
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, signal.SIG_DFL)
+        return [
+            {
+                "function": key,
+                "samples": n,
+                "own_samples": self.own[key],
+                "cpu_seconds": n * self.interval,
+                "share": n / max(1, self.samples),
+            }
+            for key, n in self.total.most_common(top)
+        ]
+
+
+class Profiler:
+    """mode="cprofile" 또는 "sample". stop() 은 상위 함수 요약 목록을 반환한다."""
+
+    def __init__(self, mode):
+        if mode == "sample" and not hasattr(signal, "setitimer"):
+            raise SystemExit("표본 추출 프로파일러는 SIGPROF 를 지원하는 Unix 에서만 사용할 수 있습니다.")
+        self.mode = mode
+        self._impl = cProfile.Profile() if mode == "cprofile" else _Sampler()
+
+    def start(self):
+        if self.mode == "cprofile":
+            self._impl.enable()
+        else:
+            self._impl.start()
+
+    def stop(self, top=PROFILE_TOP):
+        if self.mode == "sample":
+            return self._impl.stop(top)
+        self._impl.disable()
+        stats = pstats.Stats(self._impl)
+        rows = sorted(stats.stats.items(), key=lambda kv: -kv[1][3])[:top]
+        return [
+            {
+                "function": f"{file}:{line}({name})",
+                "calls": nc,
+                "own_seconds": tt,
+                "cumulative_seconds": ct,
+            }
+            for (file, line, name), (_, nc, tt, ct, _) in rows
+        ]
+
+    def save(self, path):
+        """cProfile 원본 통계 저장 (표본 추출 모드에서는 아무것도 하지 않음)."""
+        if self.mode == "cprofile":
+            self._impl.dump_stats(str(path))
+            return path
+        return None
@@ -0,0 +1,179 @@
+# regular_grid.py
+"""
+센서 이력을 정확한 10분 격자로 맞추는 전처리 단계 (train_offline.py, backtest.py, scenarios.py 공용).
+
+피처 계산은 "행 k 개 전 = k × 10분 전" 을 가정한다 (shift(lag), rolling(win)). 센서가 끊긴 구간이 행 없이
+빠져 있으면 lag·rolling 이 실제보다 먼 과거를 보게 되므로, 학습·예측 전에 다음을 한 번에 처리한다.
+
+- 격자 맞춤: 각 시각을 가장 가까운 격자 시각으로 반올림 (같은 칸에 여러 행이면 격자에 가장 가까운 행),
+             처음~마지막 격자 시각 전체로 reindex → 빠진 시각은 NaN 행
+- 짧은 결측: 양쪽에 관측이 있는 max_gap 이하 NaN 구간만 fill 정책으로 채움
+             ("linear": 양 끝 값 사이 선형 보간, "ffill": 직전 값 유지, "none": 채우지 않음)
+- 긴 결측  : 그보다 긴 구간과 처음·끝의 NaN 구간은 NaN 으로 남겨(마스킹) 해당 행의 피처가 dropna 로 빠진다
+- 결측 보고: 열별로 채운 칸·남긴 칸 수 요약 + 남긴 구간 목록 (열, 시작, 끝, 스텝 수, 종류)
+
+모든 계산은 열 단위 NumPy 배열 연산이다.
+
+    $ python regular_grid.py                       # data/df_final 의 결측 보고
+    $ python regular_grid.py --fill ffill --max-gap 1h --out data/gap_report.csv
+"""
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+GRID_FREQ    = pd.Timedelta("10min")
+FILL_POLICIES = ("linear", "ffill", "none")
+DEFAULT_FILL = "linear"
+DEFAULT_MAX_GAP = pd.Timedelta("30min")      # 이 길이 이하의 내부 결측만 채운다 (3스텝)
+
+
+def snap_to_grid(df, freq=GRID_FREQ):
+    """
+    인덱스를 freq 격자로 반올림하고 처음~마지막 격자 전체로 reindex 한다.
+    반환: (격자 DataFrame, 격자를 벗어난 행 수, 같은 칸과 겹쳐 버린 행 수)
+    """
+    step = pd.Timedelta(freq).value                       # ns
+    ts = pd.DatetimeIndex(df.index).as_unit("ns").asi8
+    snapped = (ts + step // 2) // step * step
+    offset = np.abs(ts - snapped)
+
+    # 같은 격자 칸에서는 격자에 가장 가까운 행 (동률이면 먼저 기록된 행)
+    order = np.lexsort((offset, snapped))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = snapped[order][1:] != snapped[order][:-1]
+    rows = order[first]
+
+    snapped_df = df.iloc[rows]
+    snapped_df.index = pd.DatetimeIndex(snapped[rows].astype("datetime64[ns]"), name=df.index.name)
+    grid = pd.date_range(snapped_df.index[0], snapped_df.index[-1], freq=freq, name=df.index.name)
+    return snapped_df.reindex(grid), int((offset != 0).sum()), int(len(df) - len(rows))
+
+
+def nan_runs(missing):
+    """1차원 bool 배열의 True 구간 (시작 위치, 길이)."""
+    edges = np.diff(np.concatenate([[0], missing.view(np.int8), [0]]))
+    starts = np.flatnonzero(edges == 1)
+    return starts, np.flatnonzero(edges == -1) - starts
+
+
+def fill_gaps(values, max_steps, fill=DEFAULT_FILL):
+    """
+    (n, k) float 배열의 열별 NaN 구간 중 양쪽에 관측이 있고 max_steps 이하인 구간을 fill 정책으로 채운다.
+    반환: (채운 배열, 채운 칸 bool 배열, 남긴 구간 [(열 번호, 시작, 길이, 종류)])
+    종류: "long" (max_steps 초과 내부 구간), "edge" (처음·끝 구간), "short" (fill="none" 으로 남긴 짧은 구간)
+    """
+    if fill not in FILL_POLICIES:
+        raise ValueError(f"알 수 없는 fill 정책: {fill} (가능: {', '.join(FILL_POLICIES)})")
+    n, k = values.shape
+    missing = np.isnan(values)
+    filled = np.zeros_like(missing)
+    kept = []
+    for j in range(k):
+        starts, lengths = nan_runs(missing[:, j])
+        ends = starts + lengths
+        interior = (starts > 0) & (ends < n)
+        short = interior & (lengths <= max_steps) if fill != "none" else np.zeros_like(interior)
+        # 짧은 구간 [start, end) 표시: 시작에서 +1, 끝에서 -1 을 누적
+        marks = np.zeros(n + 1, dtype=np.int32)
+        np.add.at(marks, starts[short], 1)
+        np.add.at(marks, ends[short], -1)
+        filled[:, j] = np.cumsum(marks[:n]) > 0
+        kept += [(j, int(s), int(l), "edge" if not i else "long" if l > max_steps else "short")
+                 for s, l, i in zip(starts[~short], lengths[~short], interior[~short])]
+
+    out = values.copy()
+    if filled.any():
+        # 칸마다 직전·다음 관측 위치 (채우는 칸은 내부 구간이라 둘 다 존재)
+        pos = np.arange(n)[:, None]
+        prev = np.maximum.accumulate(np.where(missing, -1, pos), axis=0)
+        nxt = np.minimum.accumulate(np.where(missing, n, pos)[::-1], axis=0)[::-1]
+        rows, cols = np.nonzero(filled)
+        p, q = prev[rows, cols], nxt[rows, cols]
+        if fill == "ffill":
+            out[rows, cols] = values[p, cols]
+        else:
+            w = (rows - p) / (q - p)
+            out[rows, cols] = values[p, cols] + (values[q, cols] - values[p, cols]) * w
+    return out, filled, kept
+
+
+def to_regular_grid(df, freq=GRID_FREQ, fill=DEFAULT_FILL, max_gap=DEFAULT_MAX_GAP, verbose=True):
+    """
+    df 를 freq 격자로 맞추고 짧은 결측을 채운다 (숫자 열만 채우고 dtype 은 유지).
+    반환: (격자 DataFrame, 요약 dict (meta.json 용), 남긴 결측 구간 DataFrame)
+    """
+    freq, max_gap = pd.Timedelta(freq), pd.Timedelta(max_gap)
+    max_steps = int(max_gap // freq)
+    grid, off_grid, duplicates = snap_to_grid(df, freq)
+    missing_rows = len(grid) - (len(df) - duplicates)
+
+    num_cols = list(grid.select_dtypes("number").columns)
+    values, filled, kept = fill_gaps(grid[num_cols].to_numpy(dtype=np.float64), max_steps, fill)
+    out = grid.copy()
+    out[num_cols] = pd.DataFrame(values, index=grid.index, columns=num_cols).astype(grid[num_cols].dtypes)
+
+    gaps = pd.DataFrame(
+        [(num_cols[j], grid.index[s], grid.index[s + length - 1], length, kind) for j, s, length, kind in kept],
+        columns=["column", "start", "end", "steps", "kind"],
+    )
+    masked = np.isnan(values).sum(axis=0)
+    report = {
+        "freq": str(freq),
+        "fill": fill,
+        "max_gap": str(max_gap),
+        "rows_in": int(len(df)),
+        "rows_out": int(len(out)),
+        "off_grid": off_grid,
+        "duplicates": duplicates,
+        "missing_rows": int(missing_rows),
+        "filled": {c: int(v) for c, v in zip(num_cols, filled.sum(axis=0)) if v},
+        "masked": {c: int(v) for c, v in zip(num_cols, masked) if v},
+        "long_gaps": int((gaps["kind"] == "long").sum()),
+        "longest_gap": str(freq * int(gaps["steps"].max())) if len(gaps) else None,
+    }
+    if verbose:
+        print_report(report)
+    return out, report, gaps
+
+
+def regrid_like(df, report):
+    """
+    학습 산출물과 같은 격자 전처리 (backtest.py, scenarios.py). report 는 meta.json 의 "grid" 요약이고,
+    없으면(--no-grid 또는 이전 산출물) 원본 시각을 그대로 두고 간격을 최빈값으로 추정한다. 반환: (df, 간격)
+    """
+    if not report:
+        return df, df.index.to_series().diff().dropna().mode()[0]
+    freq = pd.Timedelta(report["freq"])
+    df, _, _ = to_regular_grid(df, freq, report["fill"], pd.Timedelta(report["max_gap"]), verbose=False)
+    return df, freq
+
+
+def print_report(report):
+    print(f"[격자 {report['freq']}] {report['rows_in']:,}행 → {report['rows_out']:,}행 "
+          f"(빈 시각 {report['missing_rows']:,}, 격자 밖 {report['off_grid']:,}, 중복 {report['duplicates']:,}), "
+          f"fill={report['fill']} ≤ {report['max_gap']}: 채움 {sum(report['filled'].values()):,}칸, "
+          f"남김 {sum(report['masked'].values()):,}칸 (긴 구간 {report['long_gaps']}개, 최장 {report['longest_gap']})")
+
+
+def main(argv=None):
+    from data_store import CSV_PATH, STORE_PATH, load_sensor_data
+
+    parser = argparse.ArgumentParser(description="센서 이력의 10분 격자 결측 보고")
+    parser.add_argument("--fill", choices=FILL_POLICIES, default=DEFAULT_FILL, help="짧은 결측 채우기 정책")
+    parser.add_argument("--max-gap", type=pd.Timedelta, default=DEFAULT_MAX_GAP, help="채우는 최대 결측 길이")
+    parser.add_argument("--out", type=Path, default=None, help="남긴 결측 구간 CSV 저장 경로")
+    args = parser.parse_args(argv)
+
+    df, _ = load_sensor_data(CSV_PATH, STORE_PATH)
+    _, report, gaps = to_regular_grid(df, fill=args.fill, max_gap=args.max_gap)
+    for col in dict.fromkeys([*report["filled"], *report["masked"]]):
+        print(f"  {col:<28} 채움 {report['filled'].get(col, 0):>7,}칸  남김 {report['masked'].get(col, 0):>7,}칸")
+    if args.out is not None:
+        gaps.to_csv(args.out, index=False, encoding="utf-8-sig")
+        print(f"결측 구간 {len(gaps):,}개를 저장했습니다: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# scenarios.py
+"""
+날씨 등 외생변수 what-if 시나리오 앙상블 예측.
+
+현재 학습 산출물(data/artifacts/CURRENT)의 모델로 K개 섭동 프로파일을 한 번에 예측한다.
+모든 시나리오 궤적을 한 피처 행렬로 함께 진행하므로 (scenario_forecast) 50개 시나리오도
+스텝당 predict 호출 수는 시나리오 1개와 같다. 결과는 (시각 × 시나리오) 한 파일로 저장한다.
+
+    $ python scenarios.py                          # 기본 프로파일 (더움/추움/흐림/맑음 등)
+    $ python scenarios.py --grid                   # 기온 ±3°C × 일사량 60~140% 격자 49개
+    $ python scenarios.py --profiles my.json       # [{"name": "...", "W_Temperature": {"delta": 3}}, ...]
+
+외생변수 예측 모드(--forecast-exog)로 학습한 산출물이면 기준 경로가 예측된 외생변수이고,
+아니면 마지막 관측값이다. 섭동은 기준 경로에 scale 을 곱하고 delta 를 더한다.
+"""
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import artifacts
+import regular_grid
+from data_store import DATA_DIR, load_sensor_data
+from train_offline import DATA_PATH, DATA_STORE_PATH, TARGET_COL, scenario_forecast
+
+OUT_PATH = DATA_DIR / "scenario_forecast.csv"
+
+DEFAULT_PROFILES = [
+    {"name": "hot+3C", "W_Temperature": {"delta": 3.0}},
+    {"name": "cold-3C", "W_Temperature": {"delta": -3.0}},
+    {"name": "cloudy", "W_Shortwave Radiation": {"scale": 0.6}},
+    {"name": "sunny", "W_Shortwave Radiation": {"scale": 1.3}},
+    {"name": "hot+3C_sunny", "W_Temperature": {"delta": 3.0}, "W_Shortwave Radiation": {"scale": 1.3}},
+    {"name": "humid+10", "W_Relative Humidity": {"delta": 10.0}},
+]
+
+
+def grid_profiles(temp_deltas=np.arange(-3.0, 3.01, 1.0), radiation_scales=np.arange(0.6, 1.41, 0.4 / 3)):
+    """기온 delta × 일사량 scale 격자 프로파일."""
+    return [
+        {
+            "name": f"T{dt:+.0f}_SW{sc:.0%}",
+            "W_Temperature": {"delta": float(dt)},
+            "W_Shortwave Radiation": {"scale": float(sc)},
+        }
+        for dt in temp_deltas
+        for sc in radiation_scales
+    ]
+
+
+def summarize_scenarios(fc, threshold=8.0):
+    """시나리오별 주간 평균·최대와 threshold 이상인 시간(시간 단위)."""
+    step_hours = (fc.index[1] - fc.index[0]) / pd.Timedelta("1h") if len(fc) > 1 else 0.0
+    return pd.DataFrame({
+        "mean": fc.mean(),
+        "max": fc.max(),
+        f"hours_over_{threshold:g}": (fc >= threshold).sum() * step_hours,
+        "delta_mean": fc.mean() - fc["baseline"].mean(),
+    })
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="외생변수 what-if 시나리오 앙상블 예측")
+    parser.add_argument("--profiles", type=Path, default=None, help="프로파일 목록 JSON 파일")
+    parser.add_argument("--grid", action="store_true", help="기온 × 일사량 격자 프로파일 사용")
+    parser.add_argument("--run", default=None, help="사용할 산출물 실행 ID (기본: CURRENT)")
+    parser.add_argument("--days", type=float, default=7, help="예측 기간 (일)")
+    parser.add_argument("--out", type=Path, default=OUT_PATH, help="시나리오 예측 저장 경로 (CSV)")
+    args = parser.parse_args(argv)
+
+    if args.profiles is not None:
+        profiles = json.loads(args.profiles.read_text(encoding="utf-8"))
+    elif args.grid:
+        profiles = grid_profiles()
+    else:
+        profiles = DEFAULT_PROFILES
+
+    run_dir = artifacts.resolve_run_dir(args.run)
+    if run_dir is None:
+        raise SystemExit(f"실행 {args.run} 이 없습니다." if args.run
+                         else "학습 산출물이 없습니다. 먼저 train_offline.py 를 실행하세요.")
+    run_id = run_dir.name
+    meta = artifacts.load_meta(run_dir)
+    exog_models = {
+        col: artifacts.load_booster(run_dir, file_name)
+        for col, file_name in (meta.get("exog_forecast") or {}).items()
+    }
+
+    df, _ = load_sensor_data(DATA_PATH, DATA_STORE_PATH)
+    df = df.astype({c: np.float64 for c in df.select_dtypes("number").columns})
+    df, freq_td = regular_grid.regrid_like(df, meta.get("grid"))
+
+    t0 = time.perf_counter()
+    fc = scenario_forecast(
+        df,
+        artifacts.load_booster(run_dir),
+        profiles,
+        TARGET_COL,
+        int(pd.Timedelta(days=args.days) / freq_td),
+        freq_td,
+        artifacts.load_feature_means(run_dir),
+        meta["feature_spec"]["exog_cols"],
+        exog_models=exog_models,
+        keep=meta["feature_spec"].get("keep"),
+    )
+    print(f"시나리오 {len(profiles)}개 + 기준 예측 [{run_id}] ({time.perf_counter() - t0:.1f}초, "
+          f"외생변수 기준 경로: {'예측' if exog_models else '마지막 관측값 유지'})")
+    print(summarize_scenarios(fc).to_string(float_format=lambda v: f"{v:.2f}"))
+
+    tmp_path = args.out.with_name(args.out.name + ".tmp")
+    fc.to_csv(tmp_path, index=True, float_format="%.4f", encoding="utf-8-sig")
+    os.replace(tmp_path, args.out)
+    print(f"\n시나리오 예측을 저장했습니다: {args.out} ({fc.shape[1]}열 × {len(fc):,}행)")
+
+
+if __name__ == "__main__":
+    main()
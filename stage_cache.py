@@ -0,0 +1,238 @@
+# stage_cache.py
+"""
+train_offline.py 파이프라인 단계 출력의 내용 주소(content-addressed) 캐시.
+
+단계 표의 각 단계는 (이름, 설정, 상위 단계 목록, 모드) 이고, 단계 키는
+sha1(이름, 설정, 상위 단계 출력 해시) 이다. 출력은 data/pipeline_cache/<단계>/<키>/ 에 파일로 남고,
+출력 해시(모델 텍스트·예측 값 등 저장 파일 내용의 해시)가 다시 하위 단계 키에 들어간다.
+따라서 설정이 바뀐 단계부터 아래만 다시 실행되고, 상위 단계를 다시 돌려도 결과가 같으면
+하위 단계는 그대로 재사용된다.
+
+모드
+- "cached"  : 키가 같은 기록이 있으면 읽어 오고, 없으면 계산해 저장
+- "keyed"   : 항상 실행하지만 결과가 입력만으로 정해지므로 출력 해시 = 키 (피처, 평가, 기록)
+- "volatile": 항상 실행하고 결과로 출력 해시를 만든다 (--refresh, --time-budget 처럼 재현되지 않는 단계)
+
+    data/pipeline_cache/
+        tune/3f2a9c0e1b7d4a55/
+            record.json      ← 단계·키·설정·상위 출력 해시·출력 해시·소요 시간
+            ...              ← 단계별 출력 파일
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data_store import DATA_DIR
+
+CACHE_DIR    = DATA_DIR / "pipeline_cache"
+RECORD_FILE  = "record.json"
+KEEP_ENTRIES = 5                     # 단계마다 최근에 쓴 기록 수
+
+MODES = ("cached", "keyed", "volatile")
+
+
+def digest(obj):
+    """
+    JSON 직렬화 가능한 값의 16자리 sha1. 직렬화할 수 없는 값(부스터 등)이면 TypeError:
+    str() 표현에는 객체 주소처럼 실행마다 바뀌는 값이 섞여 해시가 의미를 잃는다 (run 의 fingerprint 를 줄 것).
+    """
+    text = json.dumps(obj, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def files_digest(directory):
+    """디렉터리 안 출력 파일(기록 파일 제외) 이름·내용의 16자리 sha1."""
+    h = hashlib.sha1()
+    for path in sorted(Path(directory).iterdir()):
+        if path.name == RECORD_FILE or not path.is_file():
+            continue
+        h.update(path.name.encode("utf-8"))
+        h.update(path.read_bytes())
+    return h.hexdigest()[:16]
+
+
+def save_json(path, obj):
+    Path(path).write_text(json.dumps(obj, sort_keys=True, ensure_ascii=False, indent=2, default=str),
+                          encoding="utf-8")
+
+
+def load_json(path):
+    return json.loads(Path(path).read_text(encoding="utf-8"))
+
+
+def save_frame(path, frame):
+    """Series/DataFrame → npz (인덱스·컬럼·값을 그대로, 재현 가능한 바이트)."""
+    is_series = isinstance(frame, pd.Series)
+    df = frame.to_frame() if is_series else frame
+    np.savez(
+        path,
+        values=df.to_numpy(dtype=np.float64),
+        index=df.index.to_numpy(),
+        columns=np.asarray(df.columns) if df.columns.dtype.kind in "iuf" else np.asarray(df.columns, dtype=str),
+        names=np.array([str(df.index.name or ""), str(df.columns.name or ""), "series" if is_series else ""]),
+    )
+
+
+def load_frame(path):
+    with np.load(path, allow_pickle=False) as f:
+        index_name, columns_name, kind = (str(s) for s in f["names"])
+        df = pd.DataFrame(
+            f["values"],
+            index=pd.Index(f["index"], name=index_name or None),
+            columns=pd.Index(f["columns"], name=columns_name or None),
+        )
+    if kind == "series":
+        return df.iloc[:, 0].rename(None)
+    return df
+
+
+class StageCache:
+    """
+    stages: [(이름, 설정 dict, [상위 단계 이름], 모드)] (실행 순서).
+    run() 으로 단계를 실행하면 출력 해시가 self.outputs 에 쌓이고, 하위 단계 키 계산에 쓰인다.
+    enabled=False 면 기록을 읽지도 쓰지도 않는다 (키·출력 해시는 그대로 계산).
+    """
+
+    def __init__(self, stages, root=None, enabled=True):
+        self.root = Path(root or CACHE_DIR)
+        self.enabled = enabled
+        self.order = []
+        self.stages = {}
+        for name, config, deps, mode in stages:
+            if mode not in MODES:
+                raise ValueError(f"알 수 없는 단계 모드: {mode}")
+            self.order.append(name)
+            self.stages[name] = (config, list(deps), mode)
+        self.outputs = {}
+        self.info = {}
+
+    def __contains__(self, name):
+        return name in self.stages
+
+    def key(self, name, outputs=None):
+        config, deps, _ = self.stages[name]
+        outputs = self.outputs if outputs is None else outputs
+        return digest({"stage": name, "config": config, "inputs": {d: outputs[d] for d in deps}})
+
+    def _entry_dir(self, name, key):
+        return self.root / name / key
+
+    def _record(self, name, key):
+        path = self._entry_dir(name, key) / RECORD_FILE
+        if not self.enabled or not path.exists():
+            return None
+        return json.loads(path.read_text(encoding="utf-8"))
+
+    def run(self, name, compute, save=None, load=None, fingerprint=None):
+        """
+        단계 name 을 실행(또는 재사용)하고 결과를 반환한다.
+        compute()             : 결과 계산
+        save(결과, 디렉터리)  : "cached" 단계의 출력 파일 기록, load(디렉터리) 는 결과 복원
+        fingerprint(결과)     : "volatile" 단계의 출력 해시 (없으면 digest(결과))
+        """
+        config, deps, mode = self.stages[name]
+        key = self.key(name)
+        t0 = time.perf_counter()
+
+        if mode == "cached":
+            record = self._record(name, key)
+            if record is not None:
+                entry = self._entry_dir(name, key)
+                result = load(entry)
+                os.utime(entry / RECORD_FILE)           # 최근 사용 표시 (정리 순서)
+                self.outputs[name] = record["output"]
+                self.info[name] = {"key": key, "output": record["output"], "reused": True,
+                                   "seconds": record["seconds"]}
+                print(f"[단계 {name}] 재사용 {key} ({record['seconds']:.1f}초 절약)")
+                return result
+
+        result = compute()
+        seconds = time.perf_counter() - t0
+
+        if mode == "keyed":
+            output = key
+        elif mode == "volatile":
+            output = fingerprint(result) if fingerprint is not None else digest(result)
+        elif self.enabled:
+            output = self._store(name, key, config, deps, result, save, seconds)
+        else:
+            with tempfile.TemporaryDirectory(prefix="stage-") as tmp:
+                save(result, Path(tmp))
+                output = files_digest(tmp)
+
+        self.outputs[name] = output
+        self.info[name] = {"key": key, "output": output, "reused": False, "seconds": seconds}
+        return result
+
+    def _store(self, name, key, config, deps, result, save, seconds):
+        entry = self._entry_dir(name, key)
+        staging = entry.with_name(f".{key}.tmp")
+        shutil.rmtree(staging, ignore_errors=True)
+        staging.mkdir(parents=True)
+        save(result, staging)
+        output = files_digest(staging)
+        record = {
+            "stage": name,
+            "key": key,
+            "config": config,
+            "inputs": {d: self.outputs[d] for d in deps},
+            "output": output,
+            "seconds": seconds,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        (staging / RECORD_FILE).write_text(json.dumps(record, ensure_ascii=False, indent=2, default=str),
+                                           encoding="utf-8")
+        shutil.rmtree(entry, ignore_errors=True)
+        os.rename(staging, entry)
+        self._prune(name)
+        return output
+
+    def _prune(self, name, keep=KEEP_ENTRIES):
+        stage_dir = self.root / name
+        entries = [p for p in stage_dir.iterdir() if (p / RECORD_FILE).exists()]
+        entries.sort(key=lambda p: (p / RECORD_FILE).stat().st_mtime, reverse=True)
+        for p in entries[keep:]:
+            shutil.rmtree(p, ignore_errors=True)
+
+    def plan(self):
+        """
+        실제로 실행하지 않고 단계별 (이름, 키, 상태) 목록을 만든다 (--dry-run).
+        상태: "재사용" / "실행" / "실행 (매번)" / "미정" (상위 단계가 실행되므로 출력 해시를 아직 모름,
+        결과가 이전과 같으면 재사용)
+        """
+        outputs, rows = dict(self.outputs), []
+        for name in self.order:
+            config, deps, mode = self.stages[name]
+            if any(d not in outputs for d in deps):
+                status = {"cached": "미정 (상위 단계 결과가 같으면 재사용)", "keyed": "실행", "volatile": "실행 (매번)"}
+                rows.append((name, None, status[mode]))
+                continue
+            key = self.key(name, outputs)
+            if mode == "keyed":
+                outputs[name] = key
+                rows.append((name, key, "실행"))
+            elif mode == "volatile":
+                rows.append((name, key, "실행 (매번)"))
+            else:
+                record = self._record(name, key)
+                if record is not None:
+                    outputs[name] = record["output"]
+                    rows.append((name, key, f"재사용 ({record['seconds']:.1f}초 절약)"))
+                else:
+                    rows.append((name, key, "실행"))
+        return rows
+
+    def print_plan(self, always=()):
+        print("\n=== 파이프라인 단계 (dry-run) ===")
+        for name, key, status in self.plan():
+            print(f"  {name:<12} {key or '-':<16}  {status}")
+        if always:
+            print(f"  (캐시하지 않고 항상 실행: {', '.join(always)})")
+
@@ -9,6 +9,11 @@ import mimetypes
 import plotly.express as px
 import plotly.graph_objects as go
 
+import artifacts
+import conformal
+import dashboard_data
+from data_store import CSV_PATH
+
 # ============================================================
 # 기본 설정
 # ============================================================
@@ -18,38 +23,58 @@ st.set_page_config(
     layout="wide",
 )
 
+EXCEED_LEVEL = 8.0        # 초과 확률을 보여 줄 기준 (위험 등급 경계, µg/L)
+EXCEED_COL = "Exceed_Prob"
+
 # ============================================================
 # 데이터 로드
 # ============================================================
 @st.cache_data
 def get_water_data():
-    DATA_FILENAME = Path(__file__).parent / "data" / "df_final.csv"
-    if not DATA_FILENAME.exists():
-        st.error(f"데이터 파일을 찾을 수 없습니다: {DATA_FILENAME}")
+    # Parquet 저장소(data/df_final.parquet) 우선, 없거나 오래되었으면 CSV
+    try:
+        return dashboard_data.load_water_data()
+    except FileNotFoundError:
+        st.error(f"데이터 파일을 찾을 수 없습니다: {CSV_PATH}")
         return pd.DataFrame()
-    df = pd.read_csv(DATA_FILENAME)
-    if "Timestamp" in df.columns:
-        df["Timestamp"] = pd.to_datetime(df["Timestamp"])
-        df["date"] = df["Timestamp"].dt.date
-    elif "date" in df.columns:
-        df["date"] = pd.to_datetime(df["date"]).dt.date
-    return df
 
 
 @st.cache_data
-def load_future_forecast():
-    path = Path(__file__).parent / "data" / "future_week_forecast.csv"
-    if not path.exists():
-        return None
-    df_fore = pd.read_csv(path, parse_dates=["Timestamp"])
+def load_future_forecast(run_id=None):
+    # 학습 산출물(data/artifacts/CURRENT 가 가리키는 실행) 우선, 없으면 기존 future_week_forecast.csv.
+    # run_id 가 캐시 키이므로 새 학습이 끝나 CURRENT 가 바뀌면 다시 읽는다.
+    table = None
+    if run_id is not None:
+        run_dir = artifacts.ARTIFACT_DIR / run_id
+        if not (run_dir / artifacts.FORECAST_FILE).exists():    # 읽기 전에 정리된 실행
+            return None
+        df_fore = artifacts.load_forecast(run_dir)
+        if (run_dir / artifacts.CONFORMAL_FILE).exists():
+            table = conformal.load(run_dir / artifacts.CONFORMAL_FILE)
+    else:
+        path = Path(__file__).parent / "data" / "future_week_forecast.csv"
+        if not path.exists():
+            return None
+        df_fore = pd.read_csv(path, parse_dates=["Timestamp"])
     if "Forecast_Chlorophyll_Kalman" not in df_fore.columns:
         return None
     df_fore = df_fore.sort_values("Timestamp").reset_index(drop=True)
+    if table is not None:
+        # 호라이즌별 잔차 분위수 표 조회만으로 기준값 초과 확률 계산 (모델 평가 없음)
+        df_fore[EXCEED_COL] = conformal.exceedance_probability(
+            df_fore["Forecast_Chlorophyll_Kalman"], table, EXCEED_LEVEL
+        )
     return df_fore
 
 
+def forecast_run_id():
+    # CURRENT 가 없거나 정리된 실행을 가리키면 가장 최근의 완료된 실행, 그것도 없으면 None (기존 CSV)
+    run_dir = artifacts.resolve_run_dir()
+    return None if run_dir is None else run_dir.name
+
+
 df = get_water_data()
-forecast_df = load_future_forecast()
+forecast_df = load_future_forecast(forecast_run_id())
 
 # ============================================================
 # 도메인 헬퍼
@@ -160,7 +185,7 @@ else:
 
 # 지표 조회 날짜 기본값/선택값
 if not df.empty and "date" in df.columns:
-    available_dates = sorted(df["date"].unique())
+    available_dates = dashboard_data.available_dates(df)
     default_date = today_date or available_dates[-1]
 
     if "metric_date" in st.session_state:
@@ -180,7 +205,7 @@ else:
 
 # 선택 날짜 기준 데이터프레임
 if not df.empty and "date" in df.columns and selected_date is not None:
-    sel_df = df[df["date"] == selected_date]
+    sel_df = dashboard_data.day_frame(df, selected_date)
 else:
     sel_df = df.copy()
 
@@ -482,6 +507,7 @@ div[data-testid="stPlotlyChart"] {
 }
 .week-emoji { font-size: 1.0rem; }
 .week-status-text { font-size: 0.78rem; opacity: 0.9; }
+.week-exceed { font-size: 0.68rem; opacity: 0.75; margin-left: 0.2rem; }
 .week-mean, .week-min, .week-max {
     font-variant-numeric: tabular-nums;
     opacity: 0.9;
@@ -750,17 +776,13 @@ st.markdown(
 )
 
 if forecast_df is None or forecast_df.empty:
-    st.info("예측 파일(future_week_forecast.csv)을 찾을 수 없어, 주간 예보를 표시할 수 없습니다.")
+    st.info("학습 산출물이나 예측 파일(future_week_forecast.csv)을 찾을 수 없어, 주간 예보를 표시할 수 없습니다. "
+            "train_offline.py 로 모델을 학습하면 예보가 표시됩니다.")
 else:
     df_fore = forecast_df.copy()
     df_fore["date"] = df_fore["Timestamp"].dt.date
 
-    daily = (
-        df_fore.groupby("date")["Forecast_Chlorophyll_Kalman"]
-        .agg(["min", "max", "mean"])
-        .reset_index()
-    )
-    daily = daily.sort_values("date").head(7)
+    daily = dashboard_data.daily_forecast(forecast_df, "Forecast_Chlorophyll_Kalman", EXCEED_COL)
 
     if daily.empty:
         st.warning("주간 예보 데이터가 없습니다.")
@@ -826,7 +848,10 @@ else:
 
         # 시간별 예측 라인 그래프
         if not line_df.empty:
+            has_band = {artifacts.LOWER_COL, artifacts.UPPER_COL} <= set(line_df.columns)
             y_max = max(line_df["Forecast_Chlorophyll_Kalman"].max(), 10)
+            if has_band:
+                y_max = max(y_max, line_df[artifacts.UPPER_COL].max())
 
             x = line_df["Timestamp"]
             y = line_df["Forecast_Chlorophyll_Kalman"]
@@ -838,6 +863,21 @@ else:
             fig = go.Figure()
             add_risk_bands_plotly(fig, y_max)
 
+            # 예측 구간 (하한~상한 음영)
+            if has_band:
+                fig.add_trace(go.Scatter(
+                    x=x, y=line_df[artifacts.UPPER_COL], mode="lines",
+                    line=dict(width=0), hoverinfo="skip", showlegend=False,
+                ))
+                fig.add_trace(go.Scatter(
+                    x=x, y=line_df[artifacts.LOWER_COL], mode="lines",
+                    name="예측 구간",
+                    line=dict(width=0),
+                    fill="tonexty", fillcolor="rgba(96,165,250,0.22)",
+                    customdata=line_df[artifacts.UPPER_COL],
+                    hovertemplate="%{x}<br>예측 구간: %{y:.2f} ~ %{customdata:.2f} µg/L<extra></extra>",
+                ))
+
             fig.add_trace(go.Scatter(
                 x=x, y=y_good, mode="lines",
                 name="좋음 구간",
@@ -917,6 +957,14 @@ else:
             mean_txt = "–" if pd.isna(d_mean) else f"{d_mean:.1f}"
             label, emoji, color, _ = classify_chl(d_mean)
 
+            d_exceed = row.get("exceed", np.nan)
+            exceed_html = (
+                ""
+                if pd.isna(d_exceed)
+                else f'<span class="week-exceed" title="하루 중 {EXCEED_LEVEL:g} µg/L 를 넘을 확률 (가장 높은 시점)">'
+                     f'{EXCEED_LEVEL:g}↑ {d_exceed:.0%}</span>'
+            )
+
             if denom is None or denom <= 0:
                 left_pct = 0
                 width_pct = 100
@@ -937,7 +985,7 @@ else:
     <div class="week-day">{day_label}</div>
     <div class="week-status">
       <span class="week-emoji">{emoji}</span>
-      <span class="week-status-text">{label}</span>
+      <span class="week-status-text">{label}</span>{exceed_html}
     </div>
     <div class="week-mean">{mean_txt}</div>
     <div class="week-min">{d_min:.1f}</div>
@@ -1032,8 +1080,7 @@ with st.expander("📊 전체 수집 데이터 보기", expanded=False):
                 format="YYYY-MM-DD",
             )
 
-            mask_range = (df["date"] >= start_date) & (df["date"] <= end_date)
-            df_range = df.loc[mask_range].copy()
+            df_range = dashboard_data.range_frame(df, start_date, end_date)
         else:
             df_range = df.copy()
 
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# 저장소 루트의 평평한 모듈(train_offline, regular_grid, ...)을 import 할 수 있도록
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,45 @@
+import artifacts
+
+
+def _run(root, run_id, complete=True):
+    run_dir = root / run_id
+    run_dir.mkdir()
+    if complete:
+        (run_dir / artifacts.FORECAST_FILE).write_text("Timestamp,Forecast_Chlorophyll_Kalman\n", encoding="utf-8")
+    return run_dir
+
+
+def test_current_and_latest_run_dir(tmp_path):
+    assert artifacts.current_run_dir(tmp_path) is None
+    assert artifacts.latest_run_dir(tmp_path) is None
+    assert artifacts.latest_run_dir(tmp_path / "missing") is None
+
+    _run(tmp_path, "20240101-000000")
+    newest = _run(tmp_path, "20240102-000000")
+    _run(tmp_path, "20240103-000000", complete=False)        # 기록 중이거나 깨진 실행
+    (tmp_path / ".20240104-000000.tmp").mkdir()
+    (tmp_path / artifacts.TARGETS_DIR).mkdir()
+
+    # CURRENT 없음 / 정리된 실행을 가리킴 → 최근 완료 실행으로 대체
+    assert artifacts.latest_run_dir(tmp_path) == newest
+    (tmp_path / artifacts.CURRENT_FILE).write_text("20231231-000000\n", encoding="utf-8")
+    assert artifacts.current_run_dir(tmp_path) is None
+    assert artifacts.latest_run_dir(tmp_path) == newest
+
+    (tmp_path / artifacts.CURRENT_FILE).write_text("20240101-000000\n", encoding="utf-8")
+    assert artifacts.current_run_dir(tmp_path) == tmp_path / "20240101-000000"
+
+
+def test_resolve_run_dir(tmp_path):
+    assert artifacts.resolve_run_dir(artifact_dir=tmp_path) is None
+    older = _run(tmp_path, "20240101-000000")
+    newest = _run(tmp_path, "20240102-000000")
+
+    assert artifacts.resolve_run_dir(artifact_dir=tmp_path) == newest           # CURRENT 없음
+    (tmp_path / artifacts.CURRENT_FILE).write_text("20240101-000000\n", encoding="utf-8")
+    assert artifacts.resolve_run_dir(artifact_dir=tmp_path) == older
+    (tmp_path / artifacts.CURRENT_FILE).write_text("20231231-000000\n", encoding="utf-8")
+    assert artifacts.resolve_run_dir(artifact_dir=tmp_path) == newest           # 정리된 실행
+
+    assert artifacts.resolve_run_dir("20240101-000000", tmp_path) == older
+    assert artifacts.resolve_run_dir("20231231-000000", tmp_path) is None
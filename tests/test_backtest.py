@@ -0,0 +1,60 @@
+import lightgbm as lgb
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest import backtest_origins, run_backtest
+from benchmark import synthetic_history
+from train_offline import EXOG_COLS, TARGET_COL, make_features_with_diff, recursive_forecast
+
+FREQ = pd.Timedelta("10min")
+N_STEPS = 36
+
+
+def _fit(X, y, **params):
+    return lgb.train({"objective": "regression", "num_leaves": 15, "verbose": -1, "num_threads": 1, **params},
+                     lgb.Dataset(X, y), num_boost_round=30)
+
+
+@pytest.fixture(scope="module")
+def trained():
+    df = synthetic_history(12, seed=7, missing_rate=0.0, gaps_per_month=0).astype(np.float64)
+    exog = [c for c in EXOG_COLS if c in df.columns]
+    X, y = make_features_with_diff(df, TARGET_COL, exog_cols=exog)
+    model = _fit(X, y)
+    bands = {name: _fit(X, y, objective="quantile", alpha=a) for name, a in [("lower", 0.1), ("upper", 0.9)]}
+    # 외생변수 1스텝 모델: 같은 피처 행으로 다음 시각 값을 예측
+    nxt = df[exog[0]].shift(-1).reindex(X.index)
+    ok = nxt.notna().to_numpy()
+    exog_models = {exog[0]: _fit(X[ok], nxt[ok])}
+    return df, exog, model, bands, exog_models, X.mean()
+
+
+def test_batched_origins_match_single_origin(trained):
+    df, exog, model, bands, exog_models, means = trained
+    origins = backtest_origins(df.index, df.index[-400], stride="6h")
+    assert len(origins) >= 2
+
+    batched = recursive_forecast(df, model, TARGET_COL, N_STEPS, FREQ, means, exog, origins=origins,
+                                 band_models=bands, exog_models=exog_models)
+    for origin in origins:
+        single = recursive_forecast(df.loc[:origin], model, TARGET_COL, N_STEPS, FREQ, means, exog,
+                                    band_models=bands, exog_models=exog_models)
+        for name in ("point", "lower", "upper"):
+            np.testing.assert_allclose(batched[name].loc[origin].to_numpy(), single[name].to_numpy(),
+                                       rtol=1e-12, atol=1e-12)
+
+
+def test_run_backtest_errors_match_single_origin(trained):
+    df, exog, model, _, _, means = trained
+    origins = backtest_origins(df.index, df.index[-400], stride="6h")
+    signed = run_backtest(df, model, means, origins, FREQ, n_steps=N_STEPS, exog_cols=exog, n_jobs=1, signed=True)
+
+    assert list(signed.columns) == list(range(1, N_STEPS + 1))
+    for origin in origins:
+        single = recursive_forecast(df.loc[:origin], model, TARGET_COL, N_STEPS, FREQ, means, exog)
+        actual = df[TARGET_COL].reindex(single.index).to_numpy()
+        np.testing.assert_allclose(signed.loc[origin].to_numpy(), actual - single.to_numpy(),
+                                   rtol=1e-12, atol=1e-12, equal_nan=True)
+    # 끝 가까운 시작점은 실제값이 없는 호라이즌이 NaN
+    assert signed.iloc[-1].isna().any()
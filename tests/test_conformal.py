@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import conformal
+
+FREQ = pd.Timedelta("10min")                 # 1시간 버킷 = 6스텝
+
+
+def residual_frame(n_origins=3, n_steps=12, seed=0):
+    """버킷 b 의 잔차가 (0..n-1) × (b+1) 을 섞은 값이 되도록 만든 (시작점 × 호라이즌) 표."""
+    rng = np.random.default_rng(seed)
+    values = np.empty((n_origins, n_steps))
+    for b in range(n_steps // 6):
+        r = rng.permutation(n_origins * 6).astype(float) * (b + 1)
+        values[:, b * 6:(b + 1) * 6] = r.reshape(n_origins, 6)
+    return pd.DataFrame(values, columns=range(1, n_steps + 1))
+
+
+def test_calibrate_buckets_by_horizon():
+    table = conformal.calibrate(residual_frame(), FREQ)
+    assert int(table["bucket_steps"]) == 6
+    assert table["counts"].tolist() == [18, 18]
+    np.testing.assert_allclose(table["quantiles"][:, 0], [0.0, 0.0])
+    np.testing.assert_allclose(table["quantiles"][:, -1], [17.0, 34.0])
+
+
+def test_intervals_use_finite_sample_level():
+    table = conformal.calibrate(residual_frame(), FREQ)
+    lower, upper = conformal.intervals(np.zeros(12), table, coverage=0.8)
+    # n=18: 상한 수준 0.9 × 19/18 = 0.95 → 잔차 분위수 0.95 × 17 (버킷 2 는 두 배)
+    np.testing.assert_allclose(upper[:6], 0.95 * 17)
+    np.testing.assert_allclose(lower[:6], 0.05 * 17)
+    np.testing.assert_allclose(upper[6:], 0.95 * 34)
+    np.testing.assert_allclose(lower[6:], 0.05 * 34)
+
+
+def test_intervals_clip_level_for_tiny_buckets():
+    table = conformal.calibrate(residual_frame(n_origins=1, n_steps=6).iloc[:, :2], FREQ)
+    assert table["counts"].tolist() == [2]
+    lower, upper = conformal.intervals(np.full(3, 5.0), table)
+    # n=2: 0.9 × 3/2 > 1 → 최소·최대 잔차
+    r = table["quantiles"][0]
+    np.testing.assert_allclose(upper, 5.0 + r[-1])
+    np.testing.assert_allclose(lower, 5.0 + r[0])
+
+
+def test_horizon_past_calibration_uses_last_bucket():
+    table = conformal.calibrate(residual_frame(), FREQ)
+    point = np.arange(20, dtype=float)
+    lower, upper = conformal.intervals(point, table)
+    np.testing.assert_allclose(upper[12:] - point[12:], upper[6] - point[6])
+    np.testing.assert_allclose(lower[12:] - point[12:], lower[6] - point[6])
+
+    prob = conformal.exceedance_probability(np.zeros(20), table, threshold=10.0)
+    np.testing.assert_allclose(prob[12:], prob[6])
+
+
+def test_empty_bucket_gives_nan():
+    residuals = residual_frame()
+    residuals.iloc[:, 6:] = np.nan
+    table = conformal.calibrate(residuals, FREQ)
+    assert table["counts"].tolist() == [18, 0]
+    lower, upper = conformal.intervals(np.zeros(12), table)
+    assert np.isfinite(lower[:6]).all() and np.isnan(upper[6:]).all()
+    assert np.isnan(conformal.exceedance_probability(np.zeros(12), table, 1.0)[6:]).all()
+
+
+def test_exceedance_probability_is_monotonic():
+    table = conformal.calibrate(residual_frame(), FREQ)
+    point = np.zeros(12)
+    thresholds = np.linspace(-10, 50, 121)
+    probs = np.array([conformal.exceedance_probability(point, table, t) for t in thresholds])
+
+    assert ((probs >= 0) & (probs <= 1)).all()
+    assert (np.diff(probs, axis=0) <= 1e-12).all()             # 임계값이 오르면 확률은 내려간다
+    np.testing.assert_allclose(probs[0], 1.0)
+    np.testing.assert_allclose(probs[-1], 0.0)
+
+    by_point = np.array([conformal.exceedance_probability(np.full(12, p), table, 10.0) for p in range(-5, 20)])
+    assert (np.diff(by_point, axis=0) >= -1e-12).all()         # 점 예측이 오르면 확률도 오른다
+    # 중앙 잔차만큼 위의 임계값은 초과 확률 0.5
+    assert conformal.exceedance_probability(point, table, 8.5)[0] == pytest.approx(0.5)
@@ -0,0 +1,68 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_store
+from benchmark import synthetic_history
+
+
+def write_csv(path, days=3, seed=0):
+    df = synthetic_history(days, seed=seed).astype(np.float64)
+    df.rename_axis(data_store.TIME_COL).to_csv(path)
+    return df
+
+
+def test_parquet_round_trip_is_float32_and_same_content(tmp_path):
+    csv, store = tmp_path / "df.csv", tmp_path / "df.parquet"
+    write_csv(csv)
+
+    from_csv, meta_csv = data_store.load_sensor_data(csv, store, verbose=False)
+    assert meta_csv["loaded_from"] == "csv"
+    from_store, meta_store = data_store.load_sensor_data(csv, store, refresh_store=True, verbose=False)
+    assert meta_store["loaded_from"] == "parquet"
+
+    assert (from_store.dtypes == np.float32).all()
+    assert from_store.index.name == data_store.TIME_COL
+    assert isinstance(from_store.index, pd.DatetimeIndex)
+    pd.testing.assert_frame_equal(from_store, from_csv)
+    assert meta_store["content_hash"] == meta_csv["content_hash"] == data_store.content_hash(from_store)
+
+
+def test_store_goes_stale_when_csv_changes(tmp_path):
+    csv, store = tmp_path / "df.csv", tmp_path / "df.parquet"
+    write_csv(csv, days=3)
+    data_store.convert_csv_to_store(csv, store)
+    assert data_store.store_is_fresh(csv, store)
+
+    n = len(write_csv(csv, days=4))                           # 원본 갱신 (크기·수정 시각 변경)
+    assert not data_store.store_is_fresh(csv, store)
+    df, meta = data_store.load_sensor_data(csv, store, verbose=False)
+    assert meta["loaded_from"] == "csv" and len(df) == n
+
+    df, meta = data_store.load_sensor_data(csv, store, refresh_store=True, verbose=False)
+    assert meta["loaded_from"] == "parquet" and len(df) == n
+    assert data_store.read_store_meta(store)["rows"] == n
+
+
+def test_same_size_rewrite_is_detected_by_mtime(tmp_path):
+    csv, store = tmp_path / "df.csv", tmp_path / "df.parquet"
+    write_csv(csv)
+    data_store.convert_csv_to_store(csv, store)
+    stat = csv.stat()
+    os.utime(csv, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert not data_store.store_is_fresh(csv, store)
+
+
+def test_store_without_csv_and_missing_data(tmp_path):
+    csv, store = tmp_path / "df.csv", tmp_path / "df.parquet"
+    write_csv(csv)
+    data_store.convert_csv_to_store(csv, store)
+    csv.unlink()
+    _, meta = data_store.load_sensor_data(csv, store, verbose=False)
+    assert meta["loaded_from"] == "parquet"
+
+    store.unlink()
+    with pytest.raises(FileNotFoundError):
+        data_store.load_sensor_data(csv, store, verbose=False)
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+
+from benchmark import synthetic_history
+from train_offline import (
+    EXOG_COLS, TARGET_COL, TIME_FEATURES, direct_forecast, make_direct_dataset, make_features_with_diff,
+)
+
+FREQ = pd.Timedelta("10min")
+
+
+def history():
+    df = synthetic_history(4, seed=2, missing_rate=0.0, gaps_per_month=0).astype(np.float64)
+    return df, [c for c in EXOG_COLS if c in df.columns]
+
+
+class Recorder:
+    """predict 입력을 기록하고 horizon 열을 예측값으로 돌려주는 가짜 모델."""
+
+    def __init__(self, offset=0.0):
+        self.offset = offset
+        self.X = None
+
+    def predict(self, X):
+        self.X = X
+        return X["horizon"].to_numpy() + self.offset
+
+
+def test_make_direct_dataset_shifts_target_and_time_features():
+    df, exog = history()
+    X, y = make_features_with_diff(df, TARGET_COL, exog_cols=exog)
+    horizons = [1, 6, 144]
+    X_dir, y_dir = make_direct_dataset(X, df[TARGET_COL], FREQ, horizons, origin_stride=12)
+
+    base = X.drop(columns=TIME_FEATURES).iloc[::12]
+    assert list(X_dir.columns) == list(base.columns) + ["horizon", "hour", "dayofweek"]
+    # 호라이즌마다 실제값이 있는 시작점만 남는다 (뒤쪽 시작점은 먼 호라이즌이 범위 밖)
+    counts = X_dir["horizon"].value_counts()
+    assert counts[1] == len(base)
+    assert counts[144] == int((base.index + 143 * FREQ <= df.index[-1]).sum())
+
+    for h in horizons:
+        rows = X_dir["horizon"] == h
+        origin_pos = 3
+        origin = base.index[origin_pos]
+        target_time = origin + (h - 1) * FREQ
+        row = X_dir[rows].iloc[origin_pos]
+        np.testing.assert_array_equal(row[base.columns].to_numpy(), base.iloc[origin_pos].to_numpy())
+        assert row["hour"] == target_time.hour and row["dayofweek"] == target_time.dayofweek
+        assert y_dir[rows.to_numpy()].iloc[origin_pos] == df.loc[target_time, TARGET_COL]
+
+
+def test_direct_forecast_builds_training_layout_from_last_row():
+    df, exog = history()
+    X, _ = make_features_with_diff(df, TARGET_COL, exog_cols=exog)
+    X_dir, _ = make_direct_dataset(X, df[TARGET_COL], FREQ, [1, 2])
+    model = Recorder()
+    n_steps = 48
+    fc = direct_forecast(df, model, TARGET_COL, n_steps, FREQ, X.mean(), exog)
+
+    idxs = pd.date_range(df.index[-1] + FREQ, periods=n_steps, freq=FREQ)
+    assert fc.index.equals(idxs)
+    np.testing.assert_array_equal(fc.to_numpy(), np.arange(1, n_steps + 1))
+
+    X_future = model.X
+    assert list(X_future.columns) == list(X_dir.columns)        # 학습과 같은 컬럼 순서
+    np.testing.assert_array_equal(X_future["hour"], idxs.hour)
+    np.testing.assert_array_equal(X_future["dayofweek"], idxs.dayofweek)
+
+    # 모든 호라이즌이 같은 1스텝 피처 행: 마지막 관측 다음 시각의 피처
+    ext = pd.concat([df, pd.DataFrame(np.nan, index=idxs[:1], columns=df.columns)])
+    x_next = make_features_with_diff(ext, TARGET_COL, exog_cols=exog, dropna=False)[0].iloc[-1]
+    x_next = x_next.drop(TIME_FEATURES).fillna(X.mean())
+    feature_cols = list(x_next.index)
+    for i in (0, n_steps - 1):
+        np.testing.assert_allclose(X_future[feature_cols].iloc[i].to_numpy(), x_next.to_numpy(), rtol=1e-9, atol=1e-9)
+
+
+def test_direct_forecast_bands():
+    df, exog = history()
+    X, _ = make_features_with_diff(df, TARGET_COL, exog_cols=exog)
+    fc = direct_forecast(df, Recorder(), TARGET_COL, 6, FREQ, X.mean(), exog,
+                         band_models={"lower": Recorder(-1.0), "upper": Recorder(1.0)})
+    assert list(fc.columns) == ["point", "lower", "upper"]
+    np.testing.assert_array_equal(fc["upper"] - fc["lower"], 2.0)
@@ -0,0 +1,65 @@
+import lightgbm as lgb
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmark import synthetic_history
+from train_offline import (
+    EXOG_COLS, TARGET_COL, IncrementalFeatureState, get_fold_datasets, make_features_with_diff,
+    recursive_forecast, train_exog_models,
+)
+
+FREQ = pd.Timedelta("10min")
+PARAMS = {"objective": "regression", "num_leaves": 15, "learning_rate": 0.1, "verbose": -1,
+          "n_estimators": 999, "n_jobs": 4}
+
+
+@pytest.fixture(scope="module")
+def fitted():
+    df = synthetic_history(12, seed=4, missing_rate=0.0, gaps_per_month=0).astype(np.float64)
+    exog = [c for c in EXOG_COLS if c in df.columns]
+    X, y = make_features_with_diff(df, TARGET_COL, exog_cols=exog)
+    train_set = get_fold_datasets(X, y).full
+    model = lgb.train({k: v for k, v in PARAMS.items() if k not in ("n_estimators", "n_jobs")}, train_set,
+                      num_boost_round=50)
+
+    cols = ["W_Temperature", "Temperature_Kalman"]
+    labels = df.loc[X.index, cols].copy()
+    labels.iloc[::7, 0] = np.nan                              # 라벨 결측 행은 학습에서 빠진다
+    exog_models = train_exog_models(train_set, labels, PARAMS, n_threads=1)
+    return df, exog, X, labels, model, exog_models
+
+
+def test_exog_models_learn_next_step(fitted):
+    _, _, X, labels, _, exog_models = fitted
+    assert list(exog_models) == list(labels.columns)
+    for col, booster in exog_models.items():
+        pred = booster.predict(X)
+        assert np.isfinite(pred).all()
+        ok = labels[col].notna()
+        mae = np.abs(pred[ok] - labels.loc[ok, col]).mean()
+        assert mae < 0.5 * labels[col].std()                  # 1스텝 예측은 분산보다 훨씬 작은 오차
+
+
+def test_forecast_feeds_back_exog_predictions(fitted):
+    df, exog, X, _, model, exog_models = fitted
+    n_steps = 72
+    fc = recursive_forecast(df, model, TARGET_COL, n_steps, FREQ, X.mean(), exog, exog_models=exog_models)
+    held = recursive_forecast(df, model, TARGET_COL, n_steps, FREQ, X.mean(), exog)
+    assert not np.allclose(fc.to_numpy(), held.to_numpy())
+
+    # 기준 구현: 스텝마다 같은 피처 행으로 타깃·외생변수를 예측하고, 예측한 열만 바꿔 되먹인다
+    state = IncrementalFeatureState.from_history(df, TARGET_COL, exog_cols=exog)
+    means = X.mean().reindex(state.feature_names).to_numpy()
+    idx, expected = df.index[-1], []
+    for _ in range(n_steps):
+        idx = idx + FREQ
+        x = np.asarray(state.advance(idx), dtype=np.float64)
+        x = np.where(np.isnan(x), means, x)[None, :]
+        y_next = model.predict(x)[0]
+        exog_next = state.last_exog
+        for col, booster in exog_models.items():
+            exog_next[exog.index(col)] = booster.predict(x)[0]
+        state.update(y_next, exog_next)
+        expected.append(y_next)
+    np.testing.assert_allclose(fc.to_numpy(), expected, rtol=1e-12, atol=1e-12)
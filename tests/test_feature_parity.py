@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmark import synthetic_history
+from train_offline import (
+    EXOG_COLS, TARGET_COL, IncrementalFeatureState, build_selected_features, cached_features, feature_spec,
+    feature_warmup, make_features_with_diff,
+)
+
+# numpy 누적합 경로는 pandas rolling 과 합산 순서가 달라 반올림 오차만큼 다르다 (관측 최대 차이 max(1, |값|) 기준 ~3e-12)
+NUMPY_RTOL = 1e-9
+NUMPY_ATOL = 1e-9
+
+
+def nan_history():
+    """ROLLING_BLOCK 경계를 넘는 길이에 여러 결측 패턴을 넣은 이력."""
+    df = synthetic_history(32, seed=5).astype(np.float64)     # 4,608행
+    exog = [c for c in EXOG_COLS if c in df.columns]
+    t = df.columns.get_loc(TARGET_COL)
+    df.iloc[:3, t] = np.nan                                   # 처음 결측
+    df.iloc[500, t] = np.nan                                  # 한 칸
+    df.iloc[1000:1010, t] = np.nan                            # 짧은 구간 (rolling 6 윈도우보다 김)
+    df.iloc[2000:2200, t] = np.nan                            # rolling 144 윈도우보다 긴 구간
+    df.iloc[3000:3300, t] = 5.0                               # 상수 구간 (std 0)
+    df.iloc[4090:4100, t] = np.nan                            # 블록 경계 (4096) 에 걸친 구간
+    df.iloc[700:900, df.columns.get_loc(exog[0])] = np.nan    # 외생변수 긴 결측
+    df.iloc[-5:, df.columns.get_loc(exog[1])] = np.nan        # 외생변수 끝 결측
+    return df, exog
+
+
+def incremental_features(df, exog, keep=None):
+    state = IncrementalFeatureState(TARGET_COL, exog, keep=keep)
+    target = df[TARGET_COL].to_numpy()
+    exog_values = df[exog].to_numpy()
+    rows = []
+    for i, idx in enumerate(df.index):
+        rows.append(state.advance(idx))
+        state.update(target[i], exog_values[i])
+    return pd.DataFrame(rows, index=df.index, columns=state.feature_names)
+
+
+@pytest.mark.parametrize("keep", [None, "subset"])
+def test_numpy_pandas_incremental_parity(keep):
+    df, exog = nan_history()
+    if keep == "subset":
+        full, _ = make_features_with_diff(df, TARGET_COL, exog_cols=exog, rolling="pandas", dropna=False)
+        keep = list(full.columns[::3])
+
+    X_pd, y_pd = make_features_with_diff(df, TARGET_COL, exog_cols=exog, rolling="pandas", dropna=False, keep=keep)
+    X_np, y_np = make_features_with_diff(df, TARGET_COL, exog_cols=exog, dropna=False, keep=keep)
+    X_inc = incremental_features(df, exog, keep)
+
+    assert list(X_np.columns) == list(X_pd.columns) == list(X_inc.columns)
+    assert X_pd.isna().any().any()
+
+    # numpy ↔ pandas: 결측 위치는 같고 값은 허용오차 이내
+    np.testing.assert_array_equal(X_np.isna().to_numpy(), X_pd.isna().to_numpy())
+    np.testing.assert_allclose(X_np.to_numpy(), X_pd.to_numpy(), rtol=NUMPY_RTOL, atol=NUMPY_ATOL)
+    pd.testing.assert_series_equal(y_np, y_pd)
+
+    # pandas ↔ 증분: 누산 순서가 같아 비트 단위로 동일
+    np.testing.assert_array_equal(X_inc.to_numpy(), X_pd.to_numpy())
+
+
+def test_dropna_keeps_the_same_rows():
+    df, exog = nan_history()
+    X_np, y_np = make_features_with_diff(df, TARGET_COL, exog_cols=exog)
+    X_pd, y_pd = make_features_with_diff(df, TARGET_COL, exog_cols=exog, rolling="pandas")
+    assert X_np.index.equals(X_pd.index)
+    assert not X_np.isna().any().any()
+    assert not y_np.isna().any()
+    np.testing.assert_allclose(X_np.to_numpy(), X_pd.to_numpy(), rtol=NUMPY_RTOL, atol=NUMPY_ATOL)
+
+
+def test_reduced_spec_uses_full_spec_rows():
+    df, exog = nan_history()
+    X_full, y_full = make_features_with_diff(df, TARGET_COL, exog_cols=exog)
+    keep = [c for c in X_full.columns if not c.startswith(exog[0])]
+    X_keep, _ = make_features_with_diff(df, TARGET_COL, exog_cols=exog, keep=keep)
+    assert len(X_keep) > len(X_full)        # 외생변수 긴 결측 열을 빼면 남는 행이 늘어난다
+
+    X_sel, y_sel = build_selected_features(df, TARGET_COL, exog, keep)
+    assert X_sel.index.equals(X_full.index)
+    assert list(X_sel.columns) == keep
+    pd.testing.assert_series_equal(y_sel, y_full)
+
+
+def assert_same_features(cached, cold):
+    (X_c, y_c), (X_f, y_f) = cached, cold
+    assert X_c.index.equals(X_f.index)
+    assert list(X_c.columns) == list(X_f.columns)
+    assert X_c.dtypes.equals(X_f.dtypes)              # 정수 열(hour 등)은 float 캐시에서 다시 정수로
+    np.testing.assert_allclose(X_c.to_numpy(), X_f.to_numpy(), rtol=NUMPY_RTOL, atol=NUMPY_ATOL)
+    pd.testing.assert_series_equal(y_c, y_f)
+
+
+def test_cached_features_tail_recompute(tmp_path, capsys):
+    df, exog = nan_history()
+    warmup = feature_warmup(feature_spec(df, TARGET_COL, exog))
+
+    def both(frame):
+        return (cached_features(frame, TARGET_COL, exog_cols=exog, cache_dir=tmp_path),
+                make_features_with_diff(frame, TARGET_COL, exog_cols=exog))
+
+    base = df.iloc[:3000]
+    assert_same_features(*both(base))                          # 빈 캐시
+
+    assert_same_features(*both(df))                            # 행 추가: 꼬리만 다시 계산
+    assert f"재사용 3,000행 / 새로 계산 {len(df) - 3000:,}행" in capsys.readouterr().out
+
+    edited = df.copy()
+    row = len(df) - warmup // 2                                # 직전 꼬리 계산의 warm-up 구간 안
+    edited.iloc[row, edited.columns.get_loc(TARGET_COL)] += 0.5
+    edited.iloc[row + 1, edited.columns.get_loc(exog[2])] -= 1.0
+    assert_same_features(*both(edited))
+    assert f"재사용 {row:,}행" in capsys.readouterr().out
+
+    truncated = edited.iloc[:2500]                             # 잘린 입력: 앞부분만 재사용
+    assert_same_features(*both(truncated))
+    assert "재사용 2,500행 / 새로 계산 0행" in capsys.readouterr().out
+
+    assert_same_features(*both(edited))                        # 잘린 뒤 다시 늘어난 입력
@@ -0,0 +1,63 @@
+import time
+
+import lightgbm as lgb
+import numpy as np
+import pandas as pd
+
+import train_offline
+from train_offline import QUANTILES, forecast_frame, model_cost, train_final_models
+
+
+def _train_set(n=500, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.standard_normal((n, 4))
+    y = X[:, 0] + 0.5 * X[:, 1] + 0.1 * rng.standard_normal(n)
+    return X, y, lgb.Dataset(X, y, params={"verbose": -1}, free_raw_data=False)
+
+
+def test_point_fit_seconds_exclude_quantile_models(monkeypatch):
+    boost = train_offline._boost
+
+    def slow_quantiles(params, train_set, n_rounds):
+        booster = boost(params, train_set, n_rounds)
+        if params["objective"] == "quantile":
+            time.sleep(0.5)
+        return booster
+
+    monkeypatch.setattr(train_offline, "_boost", slow_quantiles)
+    X, _, train_set = _train_set()
+    timings = {}
+    models = train_final_models(train_set, {"objective": "regression", "verbose": -1, "n_estimators": 20},
+                                quantiles=QUANTILES, n_threads=2, timings=timings)
+
+    assert set(models) == set(timings) == {"point", *QUANTILES}
+    assert all(timings[name] >= 0.5 for name in QUANTILES)
+    assert timings["point"] < 0.5
+    final_cost = model_cost(models["point"], X[0], timings["point"], repeat=5)
+    assert final_cost["fit_seconds"] == timings["point"]
+    assert final_cost["num_trees"] == 20
+
+
+def test_forecast_frame_clips_band_around_point():
+    index = pd.date_range("2024-01-01", periods=4, freq="10min")
+    future = pd.DataFrame({
+        "point": [1.0, 2.0, 3.0, 4.0],
+        "lower": [0.5, 2.5, 3.0, np.nan],           # 2번째: 하한이 점 예측 위로 교차
+        "upper": [1.5, 3.0, 2.0, 5.0],              # 3번째: 상한이 점 예측 아래로 교차
+    }, index=index)
+    out = forecast_frame(future, "Chlorophyll_Kalman")
+
+    assert list(out.columns) == ["Forecast_Chlorophyll_Kalman", "Lower_Chlorophyll_Kalman", "Upper_Chlorophyll_Kalman"]
+    assert out.index.name == "Timestamp" and out.index.equals(index)
+    np.testing.assert_array_equal(out["Lower_Chlorophyll_Kalman"], [0.5, 2.0, 3.0, np.nan])
+    np.testing.assert_array_equal(out["Upper_Chlorophyll_Kalman"], [1.5, 3.0, 3.0, 5.0])
+    valid = out.dropna()
+    assert (valid["Lower_Chlorophyll_Kalman"] <= valid["Forecast_Chlorophyll_Kalman"]).all()
+    assert (valid["Forecast_Chlorophyll_Kalman"] <= valid["Upper_Chlorophyll_Kalman"]).all()
+
+
+def test_forecast_frame_point_only():
+    future = pd.Series([1.0, 2.0], index=pd.date_range("2024-01-01", periods=2, freq="10min"))
+    out = forecast_frame(future, "Temperature")
+    assert list(out.columns) == ["Forecast_Temperature"]
+    assert out.index.name == "Timestamp"
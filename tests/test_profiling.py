@@ -0,0 +1,87 @@
+import json
+import time
+
+import pytest
+
+import profiling
+
+
+@pytest.fixture(autouse=True)
+def no_active_report():
+    yield
+    profiling.activate(None)
+
+
+@profiling.timed("test.sleep")
+def nap(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def test_laps_accumulate_per_stage():
+    report = profiling.RunReport()
+    time.sleep(0.02)
+    report.lap("load")
+    time.sleep(0.01)
+    report.lap("fit")
+    time.sleep(0.01)
+    report.lap("load")                                        # 같은 이름은 누적
+
+    seconds = report.stage_seconds()
+    assert list(seconds) == ["load", "fit"]
+    assert seconds["load"] >= 0.03 and seconds["fit"] >= 0.01
+    assert sum(seconds.values()) <= report.elapsed()
+    assert {"rss_delta_mb", "peak_rss_mb"} <= set(report.stages["fit"])
+
+
+def test_timed_records_only_while_active():
+    assert nap(0.0) == 0.0                                    # 활성 보고서 없음 → 기록 없음
+    report = profiling.RunReport()
+    profiling.activate(report)
+    nap(0.01)
+    nap(0.01)
+    profiling.record("test.manual", 0.5)
+    profiling.activate(None)
+    nap(0.0)
+
+    n, sec = report.calls["test.sleep"]
+    assert n == 2 and sec >= 0.02
+    assert report.calls["test.manual"] == [1, 0.5]
+
+
+def test_timed_records_failing_calls():
+    report = profiling.RunReport()
+    profiling.activate(report)
+
+    @profiling.timed("test.fail")
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        fail()
+    assert report.calls["test.fail"][0] == 1
+
+
+def test_write_report_and_history(tmp_path):
+    run_dir = tmp_path / "20240101-000000"
+    run_dir.mkdir()
+    report = profiling.RunReport()
+    profiling.activate(report)
+    nap(0.0)
+    report.lap("fit")
+
+    path = report.write(run_dir, history_dir=tmp_path, run_id=run_dir.name, test_mae=0.25)
+    report.write(run_dir, history_dir=tmp_path, run_id=run_dir.name, test_mae=0.2)
+
+    assert path == run_dir / profiling.REPORT_FILE
+    data = json.loads(path.read_text(encoding="utf-8"))
+    assert data["run_id"] == run_dir.name and data["test_mae"] == 0.2
+    assert set(data["stages"]) == {"fit"}
+    assert data["calls"]["test.sleep"]["calls"] == 1
+
+    lines = (tmp_path / profiling.HISTORY_FILE).read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 2                                    # 이력은 실행마다 한 줄씩 쌓인다
+    summary = json.loads(lines[0])
+    assert summary["test_mae"] == 0.25
+    assert set(summary["stage_seconds"]) == {"fit"} and "test.sleep" in summary["call_seconds"]
+    assert "stages" not in summary and "calls" not in summary
@@ -0,0 +1,50 @@
+import lightgbm as lgb
+import numpy as np
+import pandas as pd
+from sklearn.metrics import mean_absolute_error
+
+import regular_grid
+from benchmark import synthetic_history
+from train_offline import (
+    BIN_PARAMS, CV_SPLITS, EXOG_COLS, TARGET_COL, FoldDatasets, cached_features, make_features_with_diff,
+)
+
+
+def gappy_history():
+    """짧은 결측(채워짐) 과 긴 결측(남김) 이 타깃에도 있는 45일 이력."""
+    df = synthetic_history(45, seed=3)
+    df = df.drop(df.index[3000:3002])                    # 2스텝: 채워짐
+    df = df.drop(df.index[4000:4030])                    # 30스텝 (5시간): NaN 으로 남김
+    df.iloc[5000:5020, df.columns.get_loc(TARGET_COL)] = np.nan   # 타깃만 긴 결측
+    return df.astype(np.float64)
+
+
+def test_fill_and_mask():
+    grid, report, gaps = regular_grid.to_regular_grid(gappy_history(), verbose=False)
+    assert (np.diff(grid.index.asi8) == regular_grid.GRID_FREQ.value).all()
+    assert report["long_gaps"] >= 2
+    target_gaps = gaps[gaps["column"] == TARGET_COL]
+    assert sorted(target_gaps["steps"]) == [20, 30]
+    assert grid[TARGET_COL].isna().sum() == 50
+
+
+def test_grid_features_cv_fold(tmp_path):
+    grid, _, _ = regular_grid.to_regular_grid(gappy_history(), verbose=False)
+    nan_target = grid.index[grid[TARGET_COL].isna()]
+
+    for X, y in [
+        make_features_with_diff(grid, TARGET_COL, exog_cols=EXOG_COLS),
+        make_features_with_diff(grid, TARGET_COL, exog_cols=EXOG_COLS, rolling="pandas"),
+        cached_features(grid, TARGET_COL, exog_cols=EXOG_COLS, cache_dir=tmp_path),
+    ]:
+        assert not y.isna().any()
+        assert not X.isna().any().any()
+        assert X.index.intersection(nan_target).empty
+
+    X, y = cached_features(grid, TARGET_COL, exog_cols=EXOG_COLS, cache_dir=tmp_path)
+    datasets = FoldDatasets(X, y, CV_SPLITS, BIN_PARAMS)
+    train_set, valid_set, val_idx = datasets.folds[-1]
+    booster = lgb.train({"objective": "regression", "verbose": -1, "num_threads": 1}, train_set,
+                        num_boost_round=20, valid_sets=[valid_set])
+    mae = mean_absolute_error(datasets.y_values[val_idx], booster.predict(datasets.X_values[val_idx]))
+    assert np.isfinite(mae)
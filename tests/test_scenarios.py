@@ -0,0 +1,44 @@
+import lightgbm as lgb
+import numpy as np
+import pandas as pd
+
+from benchmark import synthetic_history
+from train_offline import EXOG_COLS, TARGET_COL, build_selected_features, make_features_with_diff, scenario_forecast
+
+FREQ = pd.Timedelta("10min")
+
+
+def _fit(X, y):
+    return lgb.train({"objective": "regression", "num_leaves": 15, "verbose": -1, "num_threads": 1},
+                     lgb.Dataset(X, y), num_boost_round=30)
+
+
+def test_profile_on_dropped_exog_column_warns(capsys):
+    df = synthetic_history(12, seed=11, missing_rate=0.0, gaps_per_month=0).astype(np.float64)
+    exog = [c for c in EXOG_COLS if c in df.columns]
+    X_full, _ = make_features_with_diff(df, TARGET_COL, exog_cols=exog)
+    dropped = exog[0]
+    keep = [c for c in X_full.columns if not c.startswith(dropped)]
+    X, y = build_selected_features(df, TARGET_COL, exog, keep, make_features_with_diff)
+    model = _fit(X, y)
+
+    profiles = [
+        {"name": "dropped", dropped: {"delta": 5.0}},
+        {"name": "kept", **{col: {"scale": 1.5} for col in exog[1:]}},
+    ]
+    fc = scenario_forecast(df, model, profiles, TARGET_COL, 144, FREQ, X.mean(), exog, keep=keep)
+
+    out = capsys.readouterr().out
+    assert f"경고: 모델 피처에 {dropped!r} 이 없어" in out and "시나리오 dropped" in out
+    assert out.count("경고") == 1
+    np.testing.assert_array_equal(fc["dropped"], fc["baseline"])
+    assert not np.array_equal(fc["kept"], fc["baseline"])
+
+
+def test_full_spec_profiles_do_not_warn(capsys):
+    df = synthetic_history(12, seed=11, missing_rate=0.0, gaps_per_month=0).astype(np.float64)
+    exog = [c for c in EXOG_COLS if c in df.columns]
+    X, y = make_features_with_diff(df, TARGET_COL, exog_cols=exog)
+    scenario_forecast(df, _fit(X, y), [{"name": "hot", exog[0]: {"delta": 3.0}}], TARGET_COL, 6, FREQ,
+                      X.mean(), exog)
+    assert "경고" not in capsys.readouterr().out
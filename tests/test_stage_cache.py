@@ -0,0 +1,49 @@
+import pytest
+
+import stage_cache
+
+
+def test_digest_is_stable_and_rejects_unserializable():
+    assert stage_cache.digest({"b": [1, 2.5], "a": None}) == stage_cache.digest({"a": None, "b": [1, 2.5]})
+    with pytest.raises(TypeError):
+        stage_cache.digest({"model": object()})
+
+
+def test_volatile_stage_uses_fingerprint(tmp_path):
+    stages = stage_cache.StageCache([("fit", {"rounds": 10}, [], "volatile")], root=tmp_path)
+    model = object()
+    with pytest.raises(TypeError):
+        stages.run("fit", lambda: {"point": model})
+    stages.run("fit", lambda: {"point": model}, fingerprint=lambda result: "fixed")
+    assert stages.outputs["fit"] == "fixed"
+
+
+def test_cached_stage_reuses_saved_output(tmp_path):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"params": {"num_leaves": 31}}
+
+    for _ in range(2):
+        stages = stage_cache.StageCache([("tune", {"n_trials": 3}, [], "cached")], root=tmp_path)
+        result = stages.run(
+            "tune", compute,
+            save=lambda r, d: stage_cache.save_json(d / "tune.json", r),
+            load=lambda d: stage_cache.load_json(d / "tune.json"),
+        )
+        assert result == {"params": {"num_leaves": 31}}
+    assert len(calls) == 1
+    assert stages.info["tune"]["reused"]
+
+
+def test_tune_stage_config_includes_parallel_workers():
+    from train_offline import parse_args, pipeline_stages
+
+    def tune_key(argv):
+        stages = stage_cache.StageCache(pipeline_stages(parse_args(argv), "data", {"spec": 1}, 1008), enabled=False)
+        stages.outputs.update({"load": "l", "features": "f"})
+        return stages.key("tune")
+
+    assert tune_key(["--n-jobs", "1"]) != tune_key(["--n-jobs", "4"])
+    assert tune_key(["--n-jobs", "4"]) == tune_key(["--n-jobs", "4"])
@@ -0,0 +1,91 @@
+import time
+
+import numpy as np
+import optuna
+import pandas as pd
+import pytest
+from optuna.distributions import FloatDistribution
+from optuna.trial import TrialState
+
+from train_offline import (
+    BUDGET_MIN_RESERVE, DEFAULT_TRIAL_PARAMS, _journal_storage, _StopAfterTrials, _StopBeforeDeadline, _warm_start_from_history,
+    best_or_fallback, data_fingerprint, final_params, plan_budget,
+)
+
+DIST = {"learning_rate": FloatDistribution(0.01, 0.2)}
+
+
+def _previous_trial(lr, value):
+    return optuna.trial.create_trial(
+        params={"learning_rate": lr}, distributions=DIST, value=value,
+        intermediate_values={100: value + 1.0}, user_attrs={"fold_best_iterations": [120]},
+    )
+
+
+def test_warm_start_copies_final_values_only(tmp_path):
+    storage = _journal_storage(tmp_path / "study.log")
+    prev = optuna.create_study(study_name="old", storage=storage)
+    prev.set_user_attr("target", "y")
+    prev.add_trials([_previous_trial(0.05, 1.0), _previous_trial(0.1, 0.5)])
+
+    study = optuna.create_study(study_name="new", storage=storage)
+    assert _warm_start_from_history(study, storage, "y") == 2
+    warm = study.get_trials()
+    assert all(t.intermediate_values == {} for t in warm)
+    assert all(t.user_attrs["warm_start"] for t in warm)
+
+
+def test_best_falls_back_to_warm_start_then_defaults():
+    study = optuna.create_study()
+    assert best_or_fallback(study).params == DEFAULT_TRIAL_PARAMS
+    assert final_params(best_or_fallback(study))["learning_rate"] == DEFAULT_TRIAL_PARAMS["learning_rate"]
+
+    study.add_trial(optuna.trial.create_trial(
+        params={"learning_rate": 0.1}, distributions=DIST, value=0.5, user_attrs={"warm_start": True}))
+    study.add_trial(optuna.trial.create_trial(
+        params={"learning_rate": 0.02}, distributions=DIST, state=TrialState.PRUNED))
+    assert best_or_fallback(study).params == {"learning_rate": 0.1}
+
+    study.add_trial(optuna.trial.create_trial(params={"learning_rate": 0.03}, distributions=DIST, value=0.9))
+    assert best_or_fallback(study).params == {"learning_rate": 0.03}
+
+
+def test_deadline_waits_for_a_completed_trial():
+    def pruned(trial):
+        trial.suggest_float("learning_rate", 0.01, 0.2)
+        raise optuna.TrialPruned()
+
+    past = time.time() - 1.0
+    study = optuna.create_study()
+    study.optimize(pruned, callbacks=[_StopAfterTrials(3), _StopBeforeDeadline(past)])
+    assert len(study.trials) == 3
+
+    study.optimize(lambda trial: trial.suggest_float("learning_rate", 0.01, 0.2),
+                   callbacks=[_StopAfterTrials(10), _StopBeforeDeadline(past)])
+    assert len(study.trials) == 4
+    assert study.trials[-1].state == TrialState.COMPLETE
+
+
+def test_data_fingerprint_covers_feature_values():
+    idx = pd.date_range("2024-01-01", periods=50, freq="10min")
+    X = pd.DataFrame({"a": np.arange(50.0), "hour": idx.hour}, index=idx)
+    y = pd.Series(np.linspace(0, 1, 50), index=idx, name="y")
+    changed = X.copy()
+    changed.iloc[10, 0] += 1e-9
+    assert data_fingerprint(X, y) == data_fingerprint(X.copy(), y.copy())
+    assert data_fingerprint(X, y) != data_fingerprint(changed, y)
+
+
+def test_short_budget_scales_the_reserve(capsys):
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.standard_normal((3000, 4)), columns=list("abcd"))
+    y = pd.Series(X["a"] + 0.1 * rng.standard_normal(3000), name="y")
+
+    plan = plan_budget(X, y, seconds_left=30.0)
+    assert "경고: 시간 예산 30초가 짧아" in capsys.readouterr().out
+    assert plan["reserve_seconds"] == pytest.approx(max(0.2 * 30.0, 3 * plan["probe_seconds"] * 1.2), rel=0.05)
+    assert plan["tuning_seconds"] > 0
+
+    plan = plan_budget(X, y, seconds_left=600.0)
+    assert "경고" not in capsys.readouterr().out
+    assert plan["reserve_seconds"] >= BUDGET_MIN_RESERVE
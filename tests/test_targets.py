@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+import artifacts
+import profiling
+import tree_eval
+from benchmark import synthetic_history
+from train_offline import EXOG_COLS, SharedExogFeatures, parse_args, train_target
+
+
+@pytest.mark.parametrize("flags", [
+    ["--strategy", "direct"],
+    ["--refresh"],
+    ["--backtest"],
+    ["--conformal"],
+    ["--forecast-exog"],
+    ["--select-features"],
+    ["--time-budget", "10min"],
+    ["--dry-run"],
+])
+def test_targets_reject_single_target_flags(flags, capsys):
+    with pytest.raises(SystemExit) as exc:
+        parse_args(["--targets", "Chlorophyll_Kalman", "Temperature", *flags])
+    assert exc.value.code == 2
+    assert flags[0] in capsys.readouterr().err
+
+
+def test_targets_accept_shared_flags():
+    args = parse_args(["--targets", "Chlorophyll_Kalman", "--quantiles", "--n-trials", "3"])
+    assert args.targets == ["Chlorophyll_Kalman"] and args.quantiles
+
+
+def test_default_target_writes_full_run(tmp_path):
+    df = synthetic_history(40, seed=3).astype("float64")
+    args = parse_args([
+        "--targets", artifacts.PRIMARY_TARGET, "--n-trials", "1",
+        "--study-path", str(tmp_path / "study.log"), "--artifact-dir", str(tmp_path / "artifacts"),
+    ])
+    shared = SharedExogFeatures.build(df, EXOG_COLS, cache_dir=tmp_path / "features")
+    result = train_target(artifacts.PRIMARY_TARGET, df, shared, {"content_hash": "test"}, args, lgbm_threads=1)
+
+    run_dir = tmp_path / "artifacts" / artifacts.current_run_id(tmp_path / "artifacts")
+    assert str(run_dir) == result["run_dir"]
+    for name in (artifacts.MODEL_FILE, tree_eval.PACKED_FILE, artifacts.META_FILE, artifacts.MEANS_FILE,
+                 artifacts.FORECAST_FILE, profiling.REPORT_FILE):
+        assert (run_dir / name).exists(), name
+    report = json.loads((run_dir / profiling.REPORT_FILE).read_text(encoding="utf-8"))
+    assert report["target_col"] == artifacts.PRIMARY_TARGET
+    assert {"features", "tuning", "final_fit", "forecast", "write"} <= set(report["stages"])
@@ -0,0 +1,35 @@
+import lightgbm as lgb
+import numpy as np
+import pytest
+
+import tree_eval
+
+
+def _data(n, seed):
+    rng = np.random.default_rng(seed)
+    X = rng.standard_normal((n, 6))
+    X[rng.random(X.shape) < 0.1] = 0.0
+    y = X[:, 0] * 2 + np.sin(X[:, 1] * 3) + (X[:, 2] > 0) + 0.1 * rng.standard_normal(n)
+    X[rng.random(X.shape) < 0.05] = np.nan
+    return X, y
+
+
+@pytest.mark.parametrize("params", [
+    {"use_missing": True},
+    {"zero_as_missing": True},
+    {"use_missing": False},
+    {"objective": "quantile", "alpha": 0.9},
+])
+def test_packed_forest_matches_booster(params, monkeypatch):
+    X, y = _data(3000, 0)
+    booster = lgb.train({"objective": "regression", "num_leaves": 31, "verbose": -1, "seed": 0, **params},
+                        lgb.Dataset(X, y), num_boost_round=60)
+    forest = tree_eval.PackedForest(tree_eval.pack(booster))
+    # 여러 청크로 나뉘도록 위치 예산을 줄인다
+    monkeypatch.setattr(tree_eval, "ELEMENT_BUDGET", 60 * 7)
+
+    X_test, _ = _data(50, 1)
+    X_test[0] = 0.0
+    np.testing.assert_allclose(forest.predict(X_test), booster.predict(X_test), rtol=0, atol=1e-12)
+    for i in range(len(X_test)):
+        assert forest.predict(X_test[i]) == pytest.approx(booster.predict(X_test[i:i + 1])[0], abs=1e-12)
@@ -1,15 +1,35 @@
 import pandas as pd
 import numpy as np
 from pathlib import Path
+from collections import deque
+import argparse
+import copy
+import hashlib
+import json
+import math
+import os
 import random
+import tempfile
+import threading
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
-from lightgbm import LGBMRegressor
 import lightgbm as lgb
 from sklearn.model_selection import TimeSeriesSplit
 from sklearn.metrics import mean_absolute_error, mean_squared_error
 
 import optuna
 from optuna.logging import set_verbosity, ERROR as OPTUNA_ERROR
+from optuna.trial import TrialState
+
+import artifacts
+import conformal
+import profiling
+import regular_grid
+import stage_cache
+import tree_eval
+from data_store import load_sensor_data, rss_bytes, STORE_PATH as DATA_STORE_PATH
 
 # Optuna 로그 최소화
 set_verbosity(OPTUNA_ERROR)
@@ -19,11 +39,18 @@ set_verbosity(OPTUNA_ERROR)
 # =====================================================================
 DATA_PATH = Path(__file__).parent / "data" / "df_final.csv"
 OUT_PATH  = Path(__file__).parent / "data" / "future_week_forecast.csv"
+STUDY_PATH = Path(__file__).parent / "data" / "optuna" / "study.log"   # Optuna 저널 스토리지
+FEATURE_CACHE_DIR = Path(__file__).parent / "data" / "feature_cache"    # 피처 행렬 캐시(.npy)
 
 TARGET_COL  = "Chlorophyll_Kalman"   # 모델 타깃
 RAW_COL     = "Chlorophyll"          # 원본 클로로필 컬럼
 TEST_DAYS   = 30                     # 최근 30일을 테스트로 사용
 N_TRIALS    = 30                     # Optuna 탐색 횟수 (너무 길면 20~30 정도)
+CV_SPLITS   = 5                      # TimeSeriesSplit 폴드 수
+N_ESTIMATORS = 1000                  # 폴드 학습 최대 트리 수 (early stopping 으로 조기 종료)
+FINAL_ROUNDS_SCALE = 1.2             # 최종 트리 수 = 폴드 best_iteration 평균 × 이 배율 (전체 학습셋 ≈ 마지막 폴드의 6/5)
+REPORT_EVERY = 25                    # LightGBM 검증 MAE 를 Optuna 에 보고하는 반복 간격
+BIN_PARAMS  = {"max_bin": 255, "min_data_in_bin": 3}   # Dataset bin 경계 계산 파라미터
 SEED        = 42
 
 random.seed(SEED)
@@ -35,6 +62,68 @@ EXOG_COLS = [
     "W_Shortwave Radiation", "W_Temperature"
 ]
 
+# 피처 스펙 (make_features_with_diff / IncrementalFeatureState 공용)
+DIFF_LAGS         = [1, 2]
+DIFF_ROLL_WINDOWS = [6, 72]
+EXOG_LAGS         = [6, 72, 144]     # 1시간, 12시간, 1일
+EXOG_ROLL_WINDOWS = [72, 144]        # 12시간, 1일
+
+# Direct(호라이즌 피처) 전략 학습용 샘플링 간격 (스텝 단위)
+DIRECT_HORIZON_STRIDE = 6            # 1시간 간격 호라이즌만 학습에 사용
+DIRECT_ORIGIN_STRIDE  = 36           # 6시간 간격 시작점만 학습에 사용
+
+# 예측 구간용 분위수 모델 (--quantiles): 이름 → alpha
+QUANTILES = {"lower": 0.1, "upper": 0.9}
+# 점 예측은 L2(objective="regression") 평균이고 분위수 구간은 각 스텝 피처 행 조건부(1스텝) 분위수
+QUANTILE_BAND = {"method": "quantile", "center": "mean", "conditional": "one_step", **QUANTILES}
+
+# 외생변수 동시 예측 (--forecast-exog): 예측하지 않는 열은 마지막 관측값 유지
+EXOG_N_ESTIMATORS = 300              # 외생변수 1스텝 모델 트리 수
+
+# --time-budget (시간 예산 튜닝) 설정
+BUDGET_MIN_TRIALS   = 10             # 이 수만큼 trial 이 들어가도록 폴드 수를 줄인다
+BUDGET_MIN_FOLDS    = 2              # 폴드를 줄여도 최근 폴드 최소 이 수는 사용
+BUDGET_MIN_ROUNDS   = 200            # trial 트리 수 상한의 하한 (관측 best_iteration × 2 와 비교)
+BUDGET_MIN_RESERVE  = 60.0           # 최종 학습·평가·예측용으로 남겨 두는 최소 시간(초)
+BUDGET_MIN_RESERVE_FRAC = 0.2        # 짧은 예산에서는 최소 시간 대신 예산의 이 비율까지만 남긴다
+BUDGET_RESERVE_FRAC = 0.1            # 예산 중 최종 학습 이후 단계용으로 남겨 두는 최소 비율
+
+# 완료된 trial 이 하나도 없을 때(모두 가지치기·실패) 최종 학습에 쓰는 탐색 파라미터
+DEFAULT_TRIAL_PARAMS = {
+    "learning_rate": 0.05,
+    "num_leaves": 63,
+    "max_depth": -1,
+    "min_child_samples": 50,
+    "min_child_weight": 1e-3,
+    "subsample": 1.0,
+    "colsample_bytree": 1.0,
+    "reg_alpha": 0.0,
+    "reg_lambda": 0.0,
+}
+
+# --refresh (증분 재학습) 설정
+REFRESH_ROUNDS  = 100                # continue 모드에서 새 데이터로 추가하는 트리 수
+REFIT_DECAY     = 0.9                # refit 모드: 새 리프값 = decay * 기존 + (1 - decay) * 새 데이터 기준
+DRIFT_THRESHOLD = 0.2                # 최근 TEST_DAYS MAE 가 기준 MAE 대비 20% 넘게 나빠지면 전체 재튜닝
+
+# --select-features (중요도 기반 피처 축소) 설정
+SELECT_FOLDS       = 3               # 순위 계산에 쓰는 최근 CV 폴드 수
+SELECT_MIN_GAIN    = 0.01            # 폴드 평균 gain 비중이 이 값 이상이면 유지
+SELECT_MIN_PERM    = 0.002           # 열을 섞었을 때 검증 MAE 가 이 비율 이상 나빠지면 유지
+SELECT_MAX_MAE_INCREASE = 0.01       # 축소 스펙의 CV MAE 가 이 비율 넘게 나빠지면 전체 스펙 유지
+SELECT_PERM_ROWS   = 5000            # 폴드마다 permutation 점수를 계산하는 검증 행 수 상한
+SELECT_TIMING_ROWS = 4032            # 증분 피처 재생 시간 비교에 쓰는 최근 행 수 (4주)
+SELECT_PARAMS = {                    # 순위 계산용 고정 파라미터 (튜닝 전이므로)
+    "objective": "regression",
+    "metric": "mae",
+    "boosting_type": "gbdt",
+    "learning_rate": 0.05,
+    "num_leaves": 63,
+    "min_child_samples": 50,
+    "random_state": SEED,
+    "verbose": -1,
+}
+
 
 def mean_abs_percentage_error(y_true, y_pred, eps=1e-6):
     y_true = np.asarray(y_true, dtype=float)
@@ -45,17 +134,289 @@ def mean_abs_percentage_error(y_true, y_pred, eps=1e-6):
     return np.mean(np.abs((y_true[mask] - y_pred[mask]) / y_true[mask])) * 100.0
 
 
+def forecast_mae(actual, forecast):
+    """예측 시각과 겹치는 실측값만 골라 MAE 계산."""
+    pair = pd.concat([actual, forecast], axis=1, join="inner").dropna()
+    if pair.empty:
+        return np.nan
+    return mean_absolute_error(pair.iloc[:, 0], pair.iloc[:, 1])
+
+
+ROLLING_BLOCK = 4096                 # rolling_moments 누적합을 새로 시작하는 행 간격
+
+
+def _row_selector(rows):
+    """정렬된 행 번호 목록을 가능하면 slice 로 (복사 없는 뷰)."""
+    if rows == list(range(rows[0], rows[-1] + 1)):
+        return slice(rows[0], rows[-1] + 1)
+    return np.array(rows)
+
+
+def rolling_moments(values, requests, block_size=ROLLING_BLOCK):
+    """
+    shift 된 2차원 배열 values(n, k)에 대해 요청된 (열, 윈도우) 의 rolling mean / std(ddof=1) 를
+    누적합으로 한 번에 계산해 out 뷰에 바로 기록한다.
+
+    requests: [(열 번호, 윈도우, mean_out 또는 None, std_out 또는 None), ...]
+              out 은 길이 n 의 1차원 뷰 (보통 미리 할당한 피처 블록의 한 열)
+
+    pandas rolling(win).mean()/.std() 와 같이 윈도우 안에 NaN 이 하나라도 있으면 NaN 이다.
+    수치 안정화를 위해 열마다 평균을 빼고, block_size 행마다 누적합을 새로 시작해
+    누적합 크기를 제한한다. 값이 모두 같은 윈도우의 std 는 pandas 처럼 정확히 0 이다
+    (누적합 차이의 반올림 오차가 sqrt 로 커지지 않도록 값이 바뀐 횟수 누적합으로 판정).
+    pandas 결과와의 차이는 max(1, |값|) 기준 1e-9 이내.
+    """
+    n, k = values.shape
+    wmax = max(w for _, w, _, _ in requests)
+
+    # 윈도우별로 mean / std 가 필요한 열
+    plan = {}
+    for col, w, mean_out, std_out in requests:
+        mean_cols, std_cols = plan.setdefault(w, (set(), set()))
+        if mean_out is not None:
+            mean_cols.add(col)
+        if std_out is not None:
+            std_cols.add(col)
+    plan = {
+        w: (sorted(m | sd), sorted(sd), [r for r in requests if r[1] == w])
+        for w, (m, sd) in plan.items()
+    }
+
+    invalid = np.isnan(values)
+    with np.errstate(invalid="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)   # 전부 NaN 인 열
+        center = np.nan_to_num(np.nanmean(values, axis=0))
+    # 열 단위 연산이 많으므로 (k, n) 연속 배열로 전치
+    x = np.ascontiguousarray(np.where(invalid, 0.0, values - center).T)
+    invalid = np.ascontiguousarray(invalid.T)
+    # std 를 계산하는 열의 "직전 행과 값이 다른 칸" (값이 모두 같은 윈도우 판정용)
+    std_cols = sorted({col for col, _, _, std_out in requests if std_out is not None})
+    cpos = {col: i for i, col in enumerate(std_cols)}
+    xs = x[std_cols]
+    changed = np.ones((len(std_cols), n), dtype=bool)
+    np.not_equal(xs[:, 1:], xs[:, :-1], out=changed[:, 1:])
+
+    # 앞쪽 pad 칸은 값 0, "결측" 으로 두어 데이터 시작 전으로 걸친 윈도우는 NaN 이 된다
+    pad = wmax + 1
+    for c0 in range(0, n, block_size):
+        c1 = min(n, c0 + block_size)
+        lo = max(0, c0 - wmax)
+        seg = x[:, lo:c1]
+        width = pad + c1 - lo
+
+        p1 = np.zeros((k, width))
+        p2 = np.zeros((k, width))
+        pm = np.empty((k, width), dtype=np.int64)
+        pm[:, :pad] = np.arange(1 - pad, 1) if lo == 0 else 0
+        np.cumsum(seg, axis=1, out=p1[:, pad:])
+        np.cumsum(seg * seg, axis=1, out=p2[:, pad:])
+        np.cumsum(invalid[:, lo:c1], axis=1, out=pm[:, pad:])
+        pc = np.zeros((len(std_cols), width), dtype=np.int64)
+        np.cumsum(changed[:, lo:c1], axis=1, out=pc[:, pad:])
+
+        a, b = pad + c0 - lo, pad + c1 - lo
+        for w, (rows, std_rows, reqs) in plan.items():
+            sel = _row_selector(rows)
+            bad = pm[sel, a:b] != pm[sel, a - w:b - w]
+            s1 = p1[sel, a:b] - p1[sel, a - w:b - w]
+            pos = {col: i for i, col in enumerate(rows)}
+
+            if std_rows:
+                ssel = _row_selector(std_rows)
+                s2 = p2[ssel, a:b] - p2[ssel, a - w:b - w]
+                s1_std = s1[[pos[c] for c in std_rows]]
+                s1_std *= s1_std
+                s1_std /= w
+                s2 -= s1_std
+                s2 /= (w - 1)
+                np.maximum(s2, 0.0, out=s2)
+                csel = _row_selector([cpos[c] for c in std_rows])
+                s2[pc[csel, a:b] == pc[csel, a - w + 1:b - w + 1]] = 0.0
+                np.sqrt(s2, out=s2)
+                s2[bad[[pos[c] for c in std_rows]]] = np.nan
+                spos = {col: i for i, col in enumerate(std_rows)}
+
+            s1 /= w
+            s1 += center[rows][:, None]
+            s1[bad] = np.nan
+
+            for col, _, mean_out, std_out in reqs:
+                if mean_out is not None:
+                    mean_out[c0:c1] = s1[pos[col]]
+                if std_out is not None:
+                    std_out[c0:c1] = s2[spos[col]]
+
+
+TIME_FEATURES = ["hour", "dayofweek"]
+
+
+def feature_columns(target_col, exog_cols, lag_list=[2], roll_windows=[6, 72, 144], keep=None):
+    """
+    make_features_with_diff 의 컬럼 순서.
+    keep(피처 이름 목록, select_features 결과) 을 주면 그 컬럼만 원래 순서대로 남긴다.
+    """
+    diff_col = f"{target_col}_diff"
+    names = [f"{target_col}_lag{lag}" for lag in lag_list]
+    for win in roll_windows:
+        names += [f"{target_col}_roll_mean_{win}", f"{target_col}_roll_std_{win}"]
+    names += [f"{diff_col}_lag{lag}" for lag in DIFF_LAGS]
+    for win in DIFF_ROLL_WINDOWS:
+        names += [f"{diff_col}_roll_mean_{win}", f"{diff_col}_roll_std_{win}"]
+    names += exog_feature_columns(exog_cols)
+    names += TIME_FEATURES
+    if keep is None:
+        return names
+    unknown = set(keep) - set(names)
+    if unknown:
+        raise ValueError(f"피처 스펙에 없는 컬럼: {', '.join(sorted(unknown))}")
+    keep = set(keep)
+    return [c for c in names if c in keep]
+
+
+def exog_feature_columns(exog_cols):
+    """외생변수 lag/rolling 피처 컬럼 (타깃과 무관하므로 여러 타깃이 공유 가능)."""
+    names = []
+    for col in exog_cols:
+        names += [f"{col}_lag{lag}" for lag in EXOG_LAGS]
+        names += [f"{col}_roll_mean_{win}" for win in EXOG_ROLL_WINDOWS]
+    return names
+
+
+def exog_feature_block(df, exog_cols):
+    """
+    exog_feature_columns 순서의 (n × 열 수) 외생변수 피처 블록.
+    make_features_with_diff 의 외생변수 부분과 같은 계산 (열 배치만 달라 차이는 max(1, |값|) 기준 1e-12 이내).
+    """
+    columns = exog_feature_columns(exog_cols)
+    col_pos = {c: j for j, c in enumerate(columns)}
+    n = len(df)
+
+    raw = df[exog_cols].to_numpy(dtype=np.float64)
+    shifted = np.full_like(raw, np.nan)
+    shifted[1:] = raw[:-1]
+    block = np.full((n, len(columns)), np.nan, order="F")
+
+    requests = []
+    for i, col in enumerate(exog_cols):
+        for lag in EXOG_LAGS:
+            if lag < n:
+                block[lag:, col_pos[f"{col}_lag{lag}"]] = raw[:n - lag, i]
+        for win in EXOG_ROLL_WINDOWS:
+            requests.append((i, win, block[:, col_pos[f"{col}_roll_mean_{win}"]], None))
+    if requests and n:
+        rolling_moments(shifted, requests)
+    return block
+
+
+@profiling.timed("make_features_with_diff")
 def make_features_with_diff(
     df: pd.DataFrame,
     target_col: str,
     exog_cols=None,
     lag_list=[2],
     roll_windows=[6, 72, 144],
-    dropna=True
+    dropna=True,
+    rolling="numpy",
+    shared_exog=None,
+    keep=None,
 ):
+    """
+    rolling="numpy" (기본): 미리 할당한 피처 블록에 lag 를 복사하고 rolling_moments 로 모든
+                            rolling 통계를 한 번에 채운다.
+    rolling="pandas"      : 기존 pandas shift/rolling 구현.
+    shared_exog           : 같은 df 로 미리 계산한 SharedExogFeatures. 주면 외생변수 피처는 다시
+                            계산하지 않고 공유 블록(memmap)에서 복사한다 (--targets 다중 타깃 학습).
+    keep                  : 남길 피처 이름 목록 (select_features). 나머지 컬럼은 계산하지 않고,
+                            dropna 도 남긴 컬럼 기준이다.
+    """
     if exog_cols is None:
         exog_cols = []
+    if rolling == "pandas":
+        return _make_features_pandas(df, target_col, exog_cols, lag_list, roll_windows, dropna, keep)
+
+    exog_cols = [c for c in exog_cols if c in df.columns]
+    columns = feature_columns(target_col, exog_cols, lag_list, roll_windows, keep)
+    numeric = [c for c in columns if c not in TIME_FEATURES]
+    col_pos = {c: j for j, c in enumerate(numeric)}
+    diff_col = f"{target_col}_diff"
+    n = len(df)
+
+    # 원본 열: 0 = 타깃, 1 = diff, 2.. = 외생변수 (공유 블록을 쓰면 외생변수 열은 두지 않음,
+    # 남은 피처가 하나도 없는 외생변수 열도 제외)
+    kept_exog = set(col_pos).intersection(exog_feature_columns(exog_cols))
+    raw_exog = [] if shared_exog is not None else [
+        c for c in exog_cols if kept_exog.intersection(exog_feature_columns([c]))
+    ]
+    raw = np.empty((n, 2 + len(raw_exog)))
+    raw[:, 0] = df[target_col].to_numpy(dtype=np.float64)
+    raw[0, 1] = np.nan
+    raw[1:, 1] = raw[1:, 0] - raw[:-1, 0]
+    if raw_exog:
+        raw[:, 2:] = df[raw_exog].to_numpy(dtype=np.float64)
+
+    shifted = np.full_like(raw, np.nan)
+    shifted[1:] = raw[:-1]
+
+    # 열 단위로 채우므로 column-major 로 할당 (DataFrame 생성 시에도 복사 없이 사용)
+    block = np.full((n, len(numeric)), np.nan, order="F")
+
+    def put_lags(src, name, lags):
+        for lag in lags:
+            j = col_pos.get(f"{name}_lag{lag}")
+            if j is not None and lag < n:
+                block[lag:, j] = raw[:n - lag, src]
+
+    requests = []
+
+    def add_rolls(src, name, windows, with_std):
+        for win in windows:
+            mean_j = col_pos.get(f"{name}_roll_mean_{win}")
+            std_j = col_pos.get(f"{name}_roll_std_{win}") if with_std else None
+            if mean_j is None and std_j is None:
+                continue
+            requests.append((
+                src,
+                win,
+                None if mean_j is None else block[:, mean_j],
+                None if std_j is None else block[:, std_j],
+            ))
+
+    put_lags(0, target_col, lag_list)
+    add_rolls(0, target_col, roll_windows, with_std=True)
+    put_lags(1, diff_col, DIFF_LAGS)
+    add_rolls(1, diff_col, DIFF_ROLL_WINDOWS, with_std=True)
+    if shared_exog is not None:
+        shared = shared_exog.values(n)
+        for name in exog_feature_columns(exog_cols):
+            if name in col_pos:
+                block[:, col_pos[name]] = shared[:, shared_exog.column_index[name]]
+    else:
+        for i, col in enumerate(raw_exog):
+            put_lags(2 + i, col, EXOG_LAGS)
+            add_rolls(2 + i, col, EXOG_ROLL_WINDOWS, with_std=False)
+
+    if requests and n:
+        rolling_moments(shifted, requests)
+
+    feats = pd.DataFrame(block, index=df.index, columns=numeric)
+
+    # 시간 피처 (컬럼 순서상 항상 마지막)
+    if "hour" in columns:
+        feats["hour"] = df.index.hour
+    if "dayofweek" in columns:
+        feats["dayofweek"] = df.index.dayofweek
+
+    target = df[target_col]
+    if dropna:
+        # 타깃 결측 행(격자의 긴 결측 구간 등)도 학습 라벨이 없으므로 함께 뺀다
+        valid = ~np.isnan(block).any(axis=1) & ~np.isnan(raw[:, 0])
+        return feats.loc[valid], target.loc[valid]
+    else:
+        return feats, target
 
+
+def _make_features_pandas(df, target_col, exog_cols, lag_list, roll_windows, dropna, keep=None):
+    """pandas shift/rolling 으로 피처를 만드는 기준 구현 (IncrementalFeatureState 와 비트 단위 동일)."""
     data = df.copy()
     diff_col = f"{target_col}_diff"
     data[diff_col] = data[target_col].diff()
@@ -76,11 +437,11 @@ def make_features_with_diff(
         )
 
     # Diff lag
-    for lag in [1, 2]:
+    for lag in DIFF_LAGS:
         feats[f"{diff_col}_lag{lag}"] = data[diff_col].shift(lag)
 
     # Diff rolling
-    for win in [6, 72]:
+    for win in DIFF_ROLL_WINDOWS:
         feats[f"{diff_col}_roll_mean_{win}"] = (
             data[diff_col].shift(1).rolling(win).mean()
         )
@@ -89,17 +450,14 @@ def make_features_with_diff(
         )
 
     # 외생변수 Lag + Rolling
-    exog_lags = [6, 72, 144]          # 1시간, 12시간, 1일
-    exog_roll_windows = [72, 144]     # 12시간, 1일
-
     for col in exog_cols:
         if col not in data.columns:
             continue
 
-        for lag in exog_lags:
+        for lag in EXOG_LAGS:
             feats[f"{col}_lag{lag}"] = data[col].shift(lag)
 
-        for win in exog_roll_windows:
+        for win in EXOG_ROLL_WINDOWS:
             feats[f"{col}_roll_mean_{win}"] = (
                 data[col].shift(1).rolling(win).mean()
             )
@@ -108,8 +466,12 @@ def make_features_with_diff(
     feats["hour"]      = data.index.hour
     feats["dayofweek"] = data.index.dayofweek
 
+    if keep is not None:
+        feats = feats[feature_columns(target_col, [c for c in exog_cols if c in data.columns],
+                                      lag_list, roll_windows, keep)]
+
     if dropna:
-        valid_idx = feats.dropna().index
+        valid_idx = feats.loc[data[target_col].notna()].dropna().index
         X = feats.loc[valid_idx]
         y = data.loc[valid_idx, target_col]
         return X, y
@@ -117,125 +479,2137 @@ def make_features_with_diff(
         return feats, data[target_col]
 
 
-def recursive_forecast(df, model, target_col, n_steps, freq_td, feature_means, exog_cols):
-    data = df.copy()
-    preds = []
-    idxs = []
+# =====================================================================
+# 2. 증분 피처 엔진 (recursive_forecast 용)
+# =====================================================================
+# pandas roll_var 가 불안정(catastrophic cancellation) 판정에 쓰는 허용치
+_INV_COND_TOL = np.finfo(np.float64).eps * 1e3
+
+
+class _RollingMean:
+    """pandas roll_mean 커널(Kahan 합산)을 한 스텝씩 그대로 재현한다."""
+
+    __slots__ = ("window", "nobs", "neg_ct", "sum_x", "comp_add",
+                 "comp_remove", "same_ct", "prev_value")
+
+    def __init__(self, window):
+        self.window = window
+        self.nobs = 0
+        self.neg_ct = 0
+        self.sum_x = 0.0
+        self.comp_add = 0.0
+        self.comp_remove = 0.0
+        self.same_ct = 0
+        self.prev_value = np.nan     # shift(1) 때문에 첫 값은 항상 NaN
+
+    def add(self, val):
+        if val == val:
+            self.nobs += 1
+            y = val - self.comp_add
+            t = self.sum_x + y
+            self.comp_add = t - self.sum_x - y
+            self.sum_x = t
+            if math.copysign(1.0, val) < 0:
+                self.neg_ct += 1
+            if val == self.prev_value:
+                self.same_ct += 1
+            else:
+                self.same_ct = 1
+            self.prev_value = val
+
+    def remove(self, val):
+        if val == val:
+            self.nobs -= 1
+            y = -val - self.comp_remove
+            t = self.sum_x + y
+            self.comp_remove = t - self.sum_x - y
+            self.sum_x = t
+            if math.copysign(1.0, val) < 0:
+                self.neg_ct -= 1
+
+    def value(self):
+        nobs = self.nobs
+        if nobs < self.window or nobs == 0:
+            return np.nan
+        result = self.sum_x / nobs
+        if self.same_ct >= nobs:
+            return self.prev_value
+        if self.neg_ct == 0 and result < 0:
+            return 0.0
+        if self.neg_ct == nobs and result > 0:
+            return 0.0
+        return result
+
+
+class _RollingStd:
+    """pandas roll_var(ddof=1) + zsqrt 커널(Welford, 불안정 시 재계산)을 재현한다."""
+
+    __slots__ = ("window", "nobs", "mean_x", "ssqdm_x", "comp_add",
+                 "comp_remove", "unstable")
+
+    def __init__(self, window):
+        self.window = window
+        self.nobs = 0.0
+        self.mean_x = 0.0
+        self.ssqdm_x = 0.0
+        self.comp_add = 0.0
+        self.comp_remove = 0.0
+        self.unstable = False
+
+    def add(self, val):
+        if val != val:
+            return
+        prev_m2 = self.ssqdm_x
+        self.nobs += 1
+        prev_mean = self.mean_x - self.comp_add
+        y = val - self.comp_add
+        t = y - self.mean_x
+        self.comp_add = t + self.mean_x - y
+        self.mean_x = self.mean_x + t / self.nobs
+        self.ssqdm_x = self.ssqdm_x + (val - prev_mean) * (val - self.mean_x)
+        if prev_m2 * _INV_COND_TOL > self.ssqdm_x:
+            self.unstable = True
+
+    def remove(self, val):
+        if val != val:
+            return
+        prev_m2 = self.ssqdm_x
+        self.nobs -= 1
+        if self.nobs:
+            prev_mean = self.mean_x - self.comp_remove
+            y = val - self.comp_remove
+            t = y - self.mean_x
+            self.comp_remove = t + self.mean_x - y
+            self.mean_x = self.mean_x - t / self.nobs
+            self.ssqdm_x = self.ssqdm_x - (val - prev_mean) * (val - self.mean_x)
+            if prev_m2 * _INV_COND_TOL > self.ssqdm_x:
+                self.unstable = True
+        else:
+            self.mean_x = 0.0
+            self.ssqdm_x = 0.0
+            self.unstable = False
+
+    def recompute(self, window_values):
+        self.nobs = self.mean_x = self.ssqdm_x = 0.0
+        self.comp_add = self.comp_remove = 0.0
+        for val in window_values:
+            self.add(val)
+        self.unstable = False
+
+    def value(self):
+        nobs = self.nobs
+        if nobs < self.window or nobs <= 1:
+            return np.nan
+        var = self.ssqdm_x / (nobs - 1.0)
+        return math.sqrt(var) if var >= 0 else 0.0
+
+
+class _SeriesState:
+    """한 시계열의 shift(1) 링 버퍼 + lag / rolling 누산기."""
+
+    __slots__ = ("buf", "lags", "means", "stds", "outputs")
+
+    def __init__(self, lags, rolls):
+        """rolls: [(윈도우, mean 계산 여부, std 계산 여부)] (피처 컬럼 순서)."""
+        size = max(list(lags) + [w + 1 for w, _, _ in rolls] + [1])
+        # 버퍼에는 shift(1) 시리즈 s[t] = x[t-1] 의 최근 값이 들어간다.
+        # 범위 밖 값은 NaN 이므로 shift / rolling 의 앞부분 NaN 과 동일하게 동작한다.
+        self.buf = deque([np.nan] * size, maxlen=size)
+        self.lags = list(lags)
+        self.means, self.stds, self.outputs = [], [], []
+        for w, with_mean, with_std in rolls:
+            if with_mean:
+                self.means.append(_RollingMean(w))
+                self.outputs.append(self.means[-1])
+            if with_std:
+                self.stds.append(_RollingStd(w))
+                self.outputs.append(self.stds[-1])
+
+    @classmethod
+    def for_columns(cls, name, lags, roll_windows, with_std, keep=None):
+        """피처 이름 접두어 name 의 lag / rolling 중 keep 에 있는 것만 계산하는 상태 (남는 게 없으면 None)."""
+        def kept(col):
+            return keep is None or col in keep
+
+        lags = [lag for lag in lags if kept(f"{name}_lag{lag}")]
+        rolls = [
+            (w, kept(f"{name}_roll_mean_{w}"), with_std and kept(f"{name}_roll_std_{w}"))
+            for w in roll_windows
+        ]
+        rolls = [r for r in rolls if r[1] or r[2]]
+        if not lags and not rolls:
+            return None
+        return cls(lags, rolls)
+
+    def advance(self, last_value):
+        """다음 행으로 이동: s[t] = x[t-1] 을 넣고 윈도우에서 빠지는 값을 제거."""
+        buf = self.buf
+        buf.append(last_value)
+        for acc in self.means:
+            acc.remove(buf[-(acc.window + 1)])
+            acc.add(last_value)
+        for acc in self.stds:
+            acc.remove(buf[-(acc.window + 1)])
+            acc.add(last_value)
+            if acc.unstable:
+                acc.recompute(list(buf)[-acc.window:])
 
-    for _ in range(n_steps):
-        last_idx = data.index[-1]
-        next_idx = last_idx + freq_td
+    def features(self):
+        out = [self.buf[-lag] for lag in self.lags]
+        out.extend(acc.value() for acc in self.outputs)
+        return out
 
-        base_row = data.iloc[-1].copy()
-        base_row[target_col] = np.nan
-        data.loc[next_idx] = base_row
 
-        X_tmp, _ = make_features_with_diff(
-            data,
+class IncrementalFeatureState:
+    """
+    make_features_with_diff 와 같은 피처를 한 스텝당 O(1) 로 갱신하는 상태 객체.
+    이력 전체를 한 번 재생(replay)해 누산기를 채운 뒤, advance → update 를 반복한다.
+    누산 순서가 pandas rolling 과 같아 같은 이력에 대해
+    make_features_with_diff(rolling="pandas") 와 비트 단위로 동일한 값을 낸다.
+    keep(select_features 결과) 을 주면 그 피처의 누산기만 두고 나머지는 계산하지 않는다.
+    외생변수 마지막 값(last_exog)은 피처가 남지 않은 열도 계속 기록한다 (외생변수 모델 되먹임용).
+    """
+
+    def __init__(self, target_col, exog_cols=None, lag_list=[2], roll_windows=[6, 72, 144], keep=None):
+        self.target_col = target_col
+        self.exog_cols = list(exog_cols or [])
+        self.feature_names = feature_columns(target_col, self.exog_cols, lag_list, roll_windows, keep)
+        kept = None if keep is None else set(self.feature_names)
+
+        self._target = _SeriesState.for_columns(target_col, lag_list, roll_windows, True, kept)
+        self._diff = _SeriesState.for_columns(f"{target_col}_diff", DIFF_LAGS, DIFF_ROLL_WINDOWS, True, kept)
+        self._exog = [
+            (j, series)
+            for j, series in enumerate(
+                _SeriesState.for_columns(col, EXOG_LAGS, EXOG_ROLL_WINDOWS, False, kept) for col in self.exog_cols
+            )
+            if series is not None
+        ]
+        self._hour = "hour" in self.feature_names
+        self._dayofweek = "dayofweek" in self.feature_names
+        # 남은 피처가 하나라도 있는 외생변수 열 (나머지 열의 값은 예측에 영향이 없음)
+        self.feature_exog_cols = [self.exog_cols[j] for j, _ in self._exog]
+
+        # 마지막으로 기록된 행의 값 (아직 아무 행도 없으면 NaN)
+        self._last_target = np.nan
+        self._last_diff = np.nan
+        self._last_exog = [np.nan] * len(self.exog_cols)
+
+    @classmethod
+    def from_history(cls, df, target_col, exog_cols=None, lag_list=[2], roll_windows=[6, 72, 144], keep=None):
+        exog_cols = [c for c in (exog_cols or []) if c in df.columns]
+        state = cls(target_col, exog_cols, lag_list=lag_list, roll_windows=roll_windows, keep=keep)
+
+        target = df[target_col].to_numpy(dtype=np.float64).tolist()
+        exog = [df[c].to_numpy(dtype=np.float64).tolist() for c in exog_cols]
+        for i in range(len(df)):
+            state.observe(target[i], [col[i] for col in exog])
+        return state
+
+    def observe(self, target_value, exog_values=None):
+        """관측된 다음 행 하나를 반영한다 (advance + update, 피처 벡터는 만들지 않음)."""
+        self._advance()
+        self.update(target_value, exog_values)
+
+    def _advance(self):
+        if self._target is not None:
+            self._target.advance(self._last_target)
+        if self._diff is not None:
+            self._diff.advance(self._last_diff)
+        last_exog = self._last_exog
+        for j, series in self._exog:
+            series.advance(last_exog[j])
+
+    def advance(self, next_idx):
+        """next_idx 행으로 이동하고 그 행의 피처 벡터를 반환한다."""
+        self._advance()
+        row = []
+        if self._target is not None:
+            row += self._target.features()
+        if self._diff is not None:
+            row += self._diff.features()
+        for _, series in self._exog:
+            row += series.features()
+        if self._hour:
+            row.append(next_idx.hour)
+        if self._dayofweek:
+            row.append(next_idx.dayofweek)
+        return np.array(row, dtype=np.float64)
+
+    @property
+    def last_exog(self):
+        """마지막으로 기록된 외생변수 값 (exog_cols 순서)."""
+        return list(self._last_exog)
+
+    def update(self, target_value, exog_values=None):
+        """현재 행의 관측(또는 예측)값을 기록한다. exog_values=None 이면 직전 값을 유지."""
+        target_value = float(target_value)
+        self._last_diff = target_value - self._last_target
+        self._last_target = target_value
+        if exog_values is not None:
+            self._last_exog = [float(v) for v in exog_values]
+
+
+def recursive_forecast(df, model, target_col, n_steps, freq_td, feature_means, exog_cols, origins=None,
+                       band_models=None, exog_models=None, keep=None):
+    """
+    df 마지막 시각부터 n_steps 스텝 재귀 예측 (Series).
+    origins 를 주면 df 안의 여러 시작 시각에서 동시에 예측해
+    (시작점 × 호라이즌 1..n_steps) DataFrame 을 반환한다. 이력은 한 번만 재생하고,
+    매 스텝 모든 시작점의 피처를 한 행렬로 모아 model.predict 를 한 번 호출한다.
+    band_models({"lower": 모델, "upper": 모델}) 를 주면 같은 피처 행에서 함께 예측해
+    단일 시작점은 point/lower/upper 컬럼 DataFrame, 여러 시작점은 {이름: DataFrame} 을 반환한다.
+    exog_models({외생변수 열: 모델}) 에 있는 열은 같은 피처 행으로 함께 예측해 되먹이고,
+    나머지 외생변수는 마지막 관측값을 유지한다.
+    모델은 ndarray 로 predict 하는 객체면 된다 (lgb.Booster 또는 tree_eval.PackedForest).
+    keep 은 모델을 학습한 축소 피처 스펙 (select_features, 없으면 전체 피처).
+    """
+    if origins is None:
+        state = IncrementalFeatureState.from_history(
+            df,
             target_col,
             exog_cols=exog_cols,
             lag_list=[2],
-            dropna=False,
+            keep=keep,
         )
+        preds = forecast_from_states([state], model, [df.index[-1]], n_steps, freq_td, feature_means,
+                                     band_models, exog_models)
+        idxs = pd.date_range(df.index[-1] + freq_td, periods=n_steps, freq=freq_td)
+        if band_models is None:
+            return pd.Series(preds["point"][0], index=idxs)
+        return pd.DataFrame({name: p[0] for name, p in preds.items()}, index=idxs)
 
-        x_next = X_tmp.loc[[next_idx]].fillna(feature_means)
-        y_next = model.predict(x_next)[0]
+    origins = pd.DatetimeIndex(origins)
+    states = replay_to_origins(df, origins, target_col, exog_cols, keep=keep)
+    preds = forecast_from_states(states, model, origins, n_steps, freq_td, feature_means,
+                                 band_models, exog_models)
+    frames = {
+        name: pd.DataFrame(
+            p,
+            index=origins.rename("origin"),
+            columns=pd.RangeIndex(1, n_steps + 1, name="horizon"),
+        )
+        for name, p in preds.items()
+    }
+    return frames["point"] if band_models is None else frames
 
-        data.loc[next_idx, target_col] = y_next
-        preds.append(y_next)
-        idxs.append(next_idx)
 
-    return pd.Series(preds, index=idxs)
+def replay_to_origins(df, origins, target_col, exog_cols, keep=None):
+    """
+    df 를 처음부터 한 번 재생하면서 각 시작 시각(그 행까지 관측 반영)의 상태 사본을 만든다.
+    origins 는 오름차순이어야 한다.
+    """
+    exog_cols = [c for c in (exog_cols or []) if c in df.columns]
+    target = df[target_col].to_numpy(dtype=np.float64).tolist()
+    exog = df[exog_cols].to_numpy(dtype=np.float64).tolist()
 
+    state = IncrementalFeatureState(target_col, exog_cols, lag_list=[2], keep=keep)
+    states = []
+    pos = 0
+    for end in df.index.searchsorted(origins, side="right"):
+        for j in range(pos, end):
+            state.observe(target[j], exog[j])
+        pos = end
+        states.append(copy.deepcopy(state))
+    return states
 
-def main():
-    print("데이터 로드:", DATA_PATH)
-    df = pd.read_csv(DATA_PATH, parse_dates=["Timestamp"])
-    df = df.sort_values("Timestamp").set_index("Timestamp")
 
-    freq_td = df.index.to_series().diff().dropna().mode()[0]
-    steps_week = int(pd.Timedelta("7D") / freq_td)
-    print("추정 간격:", freq_td, " / 1주일 스텝 수:", steps_week)
+def forecast_from_states(states, model, last_idxs, n_steps, freq_td, feature_means, band_models=None,
+                         exog_models=None, exog_offsets=None):
+    """
+    여러 상태를 한 스텝씩 함께 진행하며 재귀 예측한다. 스텝마다 (상태 수 × 피처) 행렬 하나를 만들고
+    타깃·밴드·외생변수 모델이 모두 이 행렬로 predict 한다.
+    states[i] 는 last_idxs[i] 행까지 반영되어 있어야 하며, 점 예측값(과 외생변수 값)으로 갱신된다.
+    band_models 는 예측만 하고 되먹임하지 않는다.
+    exog_offsets=(scale, delta) ((상태 수 × 외생변수 수) 배열 2개) 를 주면 모든 상태를 같은 시작점의
+    시나리오로 보고, 0번 상태(기준)의 외생변수 경로에 상태별로 scale 을 곱하고 delta 를 더해 되먹인다.
+    반환: {"point": (상태 수, n_steps) 배열, **{밴드 이름: 배열}}
+    """
+    names = states[0].feature_names
+    means = feature_means.reindex(names).to_numpy(dtype=np.float64)
+    band_models = band_models or {}
+    exog_pos = {states[0].exog_cols.index(col): m for col, m in (exog_models or {}).items()
+                if col in states[0].exog_cols}
+    if exog_offsets is not None:
+        scale, delta = exog_offsets
+        base = np.array(states[0].last_exog, dtype=np.float64)
+
+    preds = {name: np.empty((len(states), n_steps)) for name in ["point", *band_models]}
+    X = np.empty((len(states), len(names)))
+    next_idxs = list(last_idxs)
+
+    for step in range(n_steps):
+        t0 = time.perf_counter()
+        for i, state in enumerate(states):
+            next_idxs[i] = next_idxs[i] + freq_td
+            X[i] = state.advance(next_idxs[i])
+        # predict 에는 ndarray 를 그대로 넘긴다 (DataFrame 변환·검사 비용이 1행 예측보다 큼)
+        X_step = np.where(np.isnan(X), means, X)
+        t1 = time.perf_counter()
+        y_step = model.predict(X_step)
+        for name, band_model in band_models.items():
+            preds[name][:, step] = band_model.predict(X_step)
+        t2 = time.perf_counter()
+        profiling.record("forecast.advance_features", t1 - t0)
+        profiling.record("forecast.predict", t2 - t1)
+
+        if exog_offsets is not None:
+            # 기준 경로는 섭동되지 않은 0번 상태의 피처로만 예측 (섭동이 누적되지 않도록)
+            t3 = time.perf_counter()
+            for j, m in exog_pos.items():
+                base[j] = m.predict(X_step[:1])[0]
+            profiling.record("forecast.predict_exog", time.perf_counter() - t3)
+            exog_next = base * scale + delta
+            for state, y_next, exog_row in zip(states, y_step, exog_next):
+                state.update(y_next, exog_row)
+        elif exog_pos:
+            t3 = time.perf_counter()
+            exog_step = {j: m.predict(X_step) for j, m in exog_pos.items()}
+            profiling.record("forecast.predict_exog", time.perf_counter() - t3)
+            for i, (state, y_next) in enumerate(zip(states, y_step)):
+                exog_next = state.last_exog
+                for j, pred in exog_step.items():
+                    exog_next[j] = pred[i]
+                state.update(y_next, exog_next)
+        else:
+            # 외생변수는 마지막 관측값을 그대로 유지
+            for state, y_next in zip(states, y_step):
+                state.update(y_next)
+        preds["point"][:, step] = y_step
+
+    return preds
 
-    X_all, y_all = make_features_with_diff(
+
+def scenario_forecast(df, model, profiles, target_col, n_steps, freq_td, feature_means, exog_cols,
+                      exog_models=None, keep=None):
+    """
+    외생변수 섭동 프로파일 K개에 대한 what-if 재귀 예측. 반환: (시각 × 시나리오) DataFrame, 첫 열은 "baseline".
+    profiles: [{"name": 이름, 외생변수 열: {"scale": 곱할 값, "delta": 더할 값}, ...}, ...]
+    기준 외생변수 경로(마지막 값 유지, exog_models 가 있으면 그 예측)에 프로파일별 scale·delta 를 적용하고
+    K+1 개 궤적을 한 행렬로 함께 진행하므로 스텝당 predict 호출 수는 시나리오 수와 무관하다.
+    keep 으로 피처가 모두 빠진 외생변수를 섭동하는 프로파일은 경고를 출력한다 (결과가 기준과 같음).
+    """
+    state = IncrementalFeatureState.from_history(
         df,
-        TARGET_COL,
-        exog_cols=EXOG_COLS
+        target_col,
+        exog_cols=exog_cols,
+        lag_list=[2],
+        keep=keep,
     )
-    print("전체 피처 크기:", X_all.shape)
+    cols = state.exog_cols
+    names = ["baseline"] + [prof.get("name", f"scenario_{i}") for i, prof in enumerate(profiles, 1)]
 
-    cutoff_time = X_all.index.max() - pd.Timedelta(days=TEST_DAYS)
-    X_train = X_all[X_all.index <= cutoff_time]
-    y_train = y_all.loc[X_train.index]
+    scale = np.ones((len(names), len(cols)))
+    delta = np.zeros((len(names), len(cols)))
+    for i, prof in enumerate(profiles, 1):
+        for col, change in prof.items():
+            if col == "name":
+                continue
+            if col not in cols:
+                raise KeyError(f"프로파일 {names[i]!r}: 알 수 없는 외생변수 {col!r}")
+            scale[i, cols.index(col)] = change.get("scale", 1.0)
+            delta[i, cols.index(col)] = change.get("delta", 0.0)
 
-    X_test  = X_all[X_all.index > cutoff_time]
-    y_test  = y_all.loc[X_test.index]
+    # 축소 스펙(keep)에서 피처가 모두 빠진 열은 섭동해도 예측이 기준과 같다
+    unused = {}
+    for i, prof in enumerate(profiles, 1):
+        for col in prof:
+            if col != "name" and col not in state.feature_exog_cols:
+                unused.setdefault(col, []).append(names[i])
+    for col, scenario_names in unused.items():
+        print(f"경고: 모델 피처에 {col!r} 이 없어 섭동이 예측에 영향을 주지 않습니다 "
+              f"(시나리오 {', '.join(scenario_names)})")
 
-    print("Train:", X_train.shape, "Test:", X_test.shape)
+    states = [copy.deepcopy(state) for _ in names]
+    preds = forecast_from_states(
+        states,
+        model,
+        [df.index[-1]] * len(names),
+        n_steps,
+        freq_td,
+        feature_means,
+        exog_models=exog_models,
+        exog_offsets=(scale, delta),
+    )
+    idxs = pd.date_range(df.index[-1] + freq_td, periods=n_steps, freq=freq_td, name="Timestamp")
+    return pd.DataFrame(preds["point"].T, index=idxs, columns=names)
 
-    # Optuna 목적함수
-    def objective(trial):
-        params = {
-            "objective": "regression",
-            "metric": "mae",
-            "boosting_type": "gbdt",
-            "random_state": SEED,
-            "verbose": -1,
-            "learning_rate":    trial.suggest_float("learning_rate", 0.01, 0.2),
-            "num_leaves":       trial.suggest_int("num_leaves", 20, 200),
-            "max_depth":        trial.suggest_int("max_depth", -1, 20),
-            "min_child_samples":trial.suggest_int("min_child_samples", 10, 200),
-            "min_child_weight": trial.suggest_float("min_child_weight", 1e-3, 1e1),
-            "subsample":        trial.suggest_float("subsample", 0.6, 1.0),
-            "colsample_bytree": trial.suggest_float("colsample_bytree", 0.6, 1.0),
-            "reg_alpha":        trial.suggest_float("reg_alpha", 0.0, 2.0),
-            "reg_lambda":       trial.suggest_float("reg_lambda", 0.0, 2.0),
-            "n_estimators":     1000,
-        }
 
-        tscv = TimeSeriesSplit(n_splits=5)
-        maes = []
+# =====================================================================
+# 3. Direct 다중 호라이즌 예측
+# =====================================================================
+def make_direct_dataset(X, target, freq_td, horizons, origin_stride=1):
+    """
+    1스텝 피처 X(행 시각 = 첫 예측 시각)를 호라이즌별로 복제해 direct 학습셋을 만든다.
+    hour/dayofweek 는 예측 대상 시각 기준으로 다시 계산하고 horizon 컬럼을 추가한다.
+    """
+    base = X.drop(columns=TIME_FEATURES, errors="ignore").iloc[::origin_stride]
+    base_vals = base.to_numpy(dtype=np.float64)
+
+    blocks, ys = [], []
+    for h in horizons:
+        target_idx = base.index + (h - 1) * freq_td
+        y_h = target.reindex(target_idx).to_numpy(dtype=np.float64)
+        ok = ~np.isnan(y_h)
+        blocks.append(np.column_stack([
+            base_vals[ok],
+            np.full(ok.sum(), h, dtype=np.float64),
+            target_idx.hour[ok],
+            target_idx.dayofweek[ok],
+        ]))
+        ys.append(y_h[ok])
+
+    columns = list(base.columns) + ["horizon", "hour", "dayofweek"]
+    X_dir = pd.DataFrame(np.vstack(blocks), columns=columns)
+    y_dir = pd.Series(np.concatenate(ys), name=target.name)
+    return X_dir, y_dir
+
+
+def direct_forecast(df, model, target_col, n_steps, freq_td, feature_means, exog_cols, band_models=None,
+                    keep=None):
+    """
+    호라이즌 1..n_steps 피처 행렬을 한 번에 만들고 predict 1회로 전체 궤적을 낸다.
+    band_models 를 주면 point/lower/upper 컬럼 DataFrame 을 반환한다.
+    """
+    state = IncrementalFeatureState.from_history(
+        df,
+        target_col,
+        exog_cols=exog_cols,
+        lag_list=[2],
+        keep=keep,
+    )
+    first_idx = df.index[-1] + freq_td
+    x0 = pd.Series(state.advance(first_idx), index=state.feature_names)
+    x0 = x0.fillna(feature_means).drop(TIME_FEATURES, errors="ignore")
+
+    horizons = np.arange(1, n_steps + 1)
+    idxs = pd.date_range(first_idx, periods=n_steps, freq=freq_td)
+    X_future = pd.DataFrame(
+        np.column_stack([
+            np.tile(x0.to_numpy(dtype=np.float64), (n_steps, 1)),
+            horizons,
+            idxs.hour,
+            idxs.dayofweek,
+        ]),
+        columns=list(x0.index) + ["horizon", "hour", "dayofweek"],
+    )
+    preds = model.predict(X_future)
+    if band_models is None:
+        return pd.Series(preds, index=idxs)
+    return pd.DataFrame(
+        {"point": preds, **{name: m.predict(X_future) for name, m in band_models.items()}},
+        index=idxs,
+    )
+
+
+# =====================================================================
+# 4. Optuna 튜닝 (영속 스토리지 + 병렬 워커)
+# =====================================================================
+# 한 폴드가 차지하는 intermediate step 폭: 반복별 MAE(0..N_ESTIMATORS-1) + 폴드 누적 MAE(마지막 칸)
+_FOLD_STEPS = N_ESTIMATORS + 1
+
+
+def make_pruner(name):
+    if name == "median":
+        return optuna.pruners.MedianPruner(n_startup_trials=5, n_warmup_steps=100, n_min_trials=3)
+    if name == "halving":
+        return optuna.pruners.SuccessiveHalvingPruner(min_resource=100, reduction_factor=3)
+    if name == "hyperband":
+        return optuna.pruners.HyperbandPruner(
+            min_resource=100,
+            max_resource=CV_SPLITS * _FOLD_STEPS,
+            reduction_factor=3,
+        )
+    return optuna.pruners.NopPruner()
+
+
+def _lgbm_pruning_callback(trial, step_offset):
+    """REPORT_EVERY 반복마다 검증 MAE 를 보고하고, 가망 없는 trial 은 즉시 중단."""
+    def _callback(env):
+        if (env.iteration + 1) % REPORT_EVERY:
+            return
+        for _, metric, value, _ in env.evaluation_result_list:
+            if metric in ("l1", "mae"):
+                trial.report(value, step_offset + env.iteration)
+                if trial.should_prune():
+                    raise optuna.TrialPruned()
+                return
+
+    _callback.order = 40
+    return _callback
+
+
+class FoldDatasets:
+    """
+    학습 행렬 전체로 bin 경계를 한 번만 계산한 lgb.Dataset 과 폴드별 subset 묶음.
+    subset 은 부모의 bin 매퍼를 공유하므로 trial 마다 다시 binning 하지 않는다.
+    예측용 원본 값(X_values)은 검증 MAE 계산에만 쓰인다.
+    """
+
+    def __init__(self, X_train, y_train, n_splits, bin_params):
+        t0 = time.perf_counter()
+        rss0 = rss_bytes()
+
+        self.X_values = X_train.to_numpy(dtype=np.float64)
+        self.y_values = y_train.to_numpy(dtype=np.float64)
+        self.full = lgb.Dataset(
+            X_train,
+            y_train,
+            params={**bin_params, "verbose": -1, "feature_pre_filter": False},
+            free_raw_data=False,
+        ).construct()
+
+        self.folds = []
+        for tr_idx, val_idx in TimeSeriesSplit(n_splits=n_splits).split(X_train):
+            train_set = self.full.subset(tr_idx).construct()
+            valid_set = self.full.subset(val_idx).construct()
+            self.folds.append((train_set, valid_set, val_idx))
 
-        for tr_idx, val_idx in tscv.split(X_train):
-            X_tr, X_val = X_train.iloc[tr_idx], X_train.iloc[val_idx]
-            y_tr, y_val = y_train.iloc[tr_idx], y_train.iloc[val_idx]
+        self.construct_seconds = time.perf_counter() - t0
+        self.construct_bytes = max(0, rss_bytes() - rss0)
 
-            model = LGBMRegressor(**params)
-            model.fit(
-                X_tr, y_tr,
-                eval_set=[(X_val, y_val)],
-                eval_metric="mae",
+
+# 프로세스별 캐시: (데이터 해시, 폴드 수, bin 파라미터) → FoldDatasets
+_FOLD_DATASETS = {}
+
+
+def get_fold_datasets(X_train, y_train, n_splits=CV_SPLITS, bin_params=BIN_PARAMS):
+    key = (data_fingerprint(X_train, y_train), n_splits, tuple(sorted(bin_params.items())))
+    if key not in _FOLD_DATASETS:
+        _FOLD_DATASETS[key] = FoldDatasets(X_train, y_train, n_splits, bin_params)
+    return _FOLD_DATASETS[key]
+
+
+def objective(trial, X_train, y_train, lgbm_threads=None, budget=None):
+    """
+    TimeSeriesSplit 폴드 평균 MAE.
+    budget(plan_budget 결과) 를 주면 budget["folds"] 폴드만 쓰고, 트리 수 상한을 지금까지 관측한
+    best_iteration 기준으로 줄이며, 마감 시각이 지나면 남은 폴드를 건너뛰고 가지치기로 끝낸다.
+    """
+    params = {
+        "objective": "regression",
+        "metric": "mae",
+        "boosting_type": "gbdt",
+        "random_state": SEED,
+        "verbose": -1,
+        "n_jobs": lgbm_threads,
+        "learning_rate":    trial.suggest_float("learning_rate", 0.01, 0.2),
+        "num_leaves":       trial.suggest_int("num_leaves", 20, 200),
+        "max_depth":        trial.suggest_int("max_depth", -1, 20),
+        "min_child_samples":trial.suggest_int("min_child_samples", 10, 200),
+        "min_child_weight": trial.suggest_float("min_child_weight", 1e-3, 1e1),
+        "subsample":        trial.suggest_float("subsample", 0.6, 1.0),
+        "colsample_bytree": trial.suggest_float("colsample_bytree", 0.6, 1.0),
+        "reg_alpha":        trial.suggest_float("reg_alpha", 0.0, 2.0),
+        "reg_lambda":       trial.suggest_float("reg_lambda", 0.0, 2.0),
+    }
+    if params["n_jobs"] is None:
+        del params["n_jobs"]
+
+    datasets = get_fold_datasets(X_train, y_train)
+    folds = datasets.folds if budget is None else [datasets.folds[i] for i in budget["folds"]]
+    max_rounds = N_ESTIMATORS if budget is None else _budget_rounds(trial.study)
+    maes = []
+    best_iterations = []
+    boost_seconds = 0.0
+
+    for fold, (train_set, valid_set, val_idx) in enumerate(folds):
+        step_offset = fold * _FOLD_STEPS
+        # 마감이 지나면 중단 (이번 데이터로 완료된 trial 이 하나도 없으면 최종 학습 파라미터가 없으므로 끝까지 진행)
+        if budget is not None and time.time() > budget["deadline"] and _n_complete(trial.study):
+            trial.set_user_attr("budget_stopped", True)
+            raise optuna.TrialPruned()
+
+        t0 = time.perf_counter()
+        try:
+            booster = lgb.train(
+                params,
+                train_set,
+                num_boost_round=max_rounds,
+                valid_sets=[valid_set],
                 callbacks=[
                     lgb.early_stopping(50, verbose=False),
                     lgb.log_evaluation(period=0),
+                    _lgbm_pruning_callback(trial, step_offset),
                 ],
             )
+        finally:
+            boost_seconds += time.perf_counter() - t0
+            trial.set_user_attr("boost_seconds", boost_seconds)
+
+        pred = booster.predict(datasets.X_values[val_idx], num_iteration=booster.best_iteration)
+        mae = mean_absolute_error(datasets.y_values[val_idx], pred)
+        maes.append(mae)
+        best_iterations.append(int(booster.best_iteration or max_rounds))
+
+        # 폴드별 MAE·best_iteration 도 스토리지에 남겨 최종 학습 트리 수와 다음 재학습 때 참고
+        trial.set_user_attr("fold_maes", [float(m) for m in maes])
+        trial.set_user_attr("fold_best_iterations", best_iterations)
+
+        # 폴드 단위 누적 MAE 보고 → 첫 폴드부터 나쁘면 나머지 폴드는 건너뜀
+        trial.report(float(np.mean(maes)), step_offset + _FOLD_STEPS - 1)
+        if trial.should_prune():
+            raise optuna.TrialPruned()
+
+    return np.mean(maes)
+
+
+def _journal_storage(path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        from optuna.storages.journal import JournalFileBackend
+    except ImportError:  # optuna < 4.0
+        from optuna.storages import JournalFileStorage as JournalFileBackend
+    return optuna.storages.JournalStorage(JournalFileBackend(str(path)))
+
+
+def data_fingerprint(X, y):
+    """학습 데이터(인덱스·타깃·피처 목록·피처 값) 기준 짧은 해시. 스터디 이름과 폴드 Dataset 캐시 키에 사용."""
+    h = hashlib.sha1()
+    h.update(pd.util.hash_pandas_object(y, index=True).to_numpy().tobytes())
+    h.update("|".join(X.columns).encode("utf-8"))
+    h.update(np.ascontiguousarray(X.to_numpy(dtype=np.float64)))
+    return h.hexdigest()[:12]
+
+
+def _is_current(trial):
+    return not trial.user_attrs.get("warm_start", False)
+
+
+def _n_finished(study):
+    return sum(
+        1 for t in study.get_trials(deepcopy=False, states=(TrialState.COMPLETE, TrialState.PRUNED))
+        if _is_current(t)
+    )
+
+
+def _n_complete(study):
+    """이번 데이터로 완료(COMPLETE)된 trial 수. 시간 예산으로 멈춰도 되는지는 이 값으로 판단한다."""
+    return sum(
+        1 for t in study.get_trials(deepcopy=False, states=(TrialState.COMPLETE,)) if _is_current(t)
+    )
+
+
+class _StopAfterTrials:
+    """이번 데이터로 끝난 trial 수(warm-start 제외)가 n_trials 에 도달하면 멈춘다."""
+
+    def __init__(self, n_trials):
+        self.n_trials = n_trials
+
+    def __call__(self, study, trial):
+        if _n_finished(study) >= self.n_trials:
+            study.stop()
+
+
+class _StopBeforeDeadline:
+    """
+    완료 trial 평균 소요시간으로 보아 다음 trial 이 마감 전에 끝나지 못하면 멈춘다.
+    완료된 trial 이 하나도 없으면(모두 가지치기 등) 마감이 지나도 멈추지 않는다.
+    """
+
+    def __init__(self, deadline):
+        self.deadline = deadline
+
+    def __call__(self, study, trial):
+        durations = [
+            t.duration.total_seconds()
+            for t in study.get_trials(deepcopy=False, states=(TrialState.COMPLETE,))
+            if _is_current(t) and t.duration is not None
+        ]
+        if durations and time.time() + float(np.mean(durations)) > self.deadline:
+            study.stop()
+
+
+def _budget_rounds(study):
+    """예산 모드 trial 트리 수 상한: 완료 trial 들의 최대 폴드 best_iteration × 2 (BUDGET_MIN_ROUNDS ~ N_ESTIMATORS)."""
+    iters = [
+        it
+        for t in study.get_trials(deepcopy=False, states=(TrialState.COMPLETE,))
+        if _is_current(t)
+        for it in t.user_attrs.get("fold_best_iterations", [])
+    ]
+    if not iters:
+        return N_ESTIMATORS
+    return int(min(N_ESTIMATORS, max(BUDGET_MIN_ROUNDS, 2 * max(iters))))
+
+
+def plan_budget(X_train, y_train, seconds_left, n_final_models=1, lgbm_threads=None):
+    """
+    --time-budget: 남은 시간(seconds_left) 을 튜닝과 이후 단계(최종 학습·평가·예측)로 나눈다.
+    중간 파라미터로 가장 큰 폴드를 한 번 학습해 폴드 비용을 재고(학습 행 수에 비례한다고 가정),
+    튜닝 시간 안에 BUDGET_MIN_TRIALS 개 trial 이 들어가도록 사용할 최근 폴드 수를 정한다.
+    반환: {"deadline": 튜닝 마감(time.time 기준), "folds": 사용할 폴드 번호, ...}
+    """
+    datasets = get_fold_datasets(X_train, y_train)
+    train_set, valid_set, _ = datasets.folds[-1]
+    params = {
+        "objective": "regression", "metric": "mae", "verbose": -1, "random_state": SEED,
+        "learning_rate": 0.1, "num_leaves": 110, "min_child_samples": 100,
+    }
+    if lgbm_threads:
+        params["num_threads"] = lgbm_threads
+    t0 = time.perf_counter()
+    lgb.train(params, train_set, num_boost_round=N_ESTIMATORS, valid_sets=[valid_set],
+              callbacks=[lgb.early_stopping(50, verbose=False), lgb.log_evaluation(period=0)])
+    probe = time.perf_counter() - t0
+
+    sizes = np.array([fold[0].num_data() for fold in datasets.folds], dtype=np.float64)
+    fold_costs = probe * sizes / sizes[-1]
+    # 최종 학습은 전체 학습셋(≈ 마지막 폴드의 6/5)으로 모델 수만큼, 나머지 단계는 비율·최소 시간으로 확보
+    # 고정 최소 시간은 예산의 BUDGET_MIN_RESERVE_FRAC 까지만: 1분 남짓한 예산이 전부 예비 시간이 되지 않도록
+    min_reserve = min(BUDGET_MIN_RESERVE, BUDGET_MIN_RESERVE_FRAC * seconds_left)
+    if min_reserve < BUDGET_MIN_RESERVE:
+        print(f"경고: 시간 예산 {seconds_left:.0f}초가 짧아 이후 단계 최소 예비 시간을 "
+              f"{BUDGET_MIN_RESERVE:.0f}초 대신 {min_reserve:.0f}초로 줄입니다")
+    reserve = max(min_reserve, BUDGET_RESERVE_FRAC * seconds_left,
+                  3 * probe * len(X_train) / sizes[-1] * n_final_models)
+    tuning = max(0.0, seconds_left - reserve)
+
+    n_folds = len(datasets.folds)
+    while n_folds > BUDGET_MIN_FOLDS and fold_costs[-n_folds:].sum() * BUDGET_MIN_TRIALS > tuning:
+        n_folds -= 1
+    folds = list(range(len(datasets.folds) - n_folds, len(datasets.folds)))
+    trial_estimate = float(fold_costs[folds].sum())
+    if tuning < trial_estimate:
+        # 최종 학습에는 완료된 trial 이 하나는 있어야 하므로 예산을 넘더라도 한 개는 돌린다
+        print(f"경고: 시간 예산이 부족해 trial 1개만 실행합니다 (예상 {trial_estimate:.1f}초 초과 가능)")
+        tuning = trial_estimate
+
+    plan = {
+        "deadline": time.time() + tuning,
+        "folds": folds,
+        "tuning_seconds": tuning,
+        "reserve_seconds": reserve,
+        "probe_seconds": probe,
+        "trial_seconds_estimate": trial_estimate,
+    }
+    print(f"시간 예산: 남은 {seconds_left:.0f}초 → 튜닝 {tuning:.0f}초 + 이후 단계 {reserve:.0f}초 / "
+          f"폴드 {n_folds}/{len(datasets.folds)}개, trial 예상 {plan['trial_seconds_estimate']:.1f}초 "
+          f"(약 {tuning / max(plan['trial_seconds_estimate'], 1e-9):.0f}개)")
+    return plan
+
+
+def _study_worker(storage_path, study_name, seed, n_trials, X_train, y_train, lgbm_threads,
+                  pruner="none", budget=None):
+    study = optuna.load_study(
+        study_name=study_name,
+        storage=_journal_storage(storage_path),
+        sampler=optuna.samplers.TPESampler(seed=seed),
+        pruner=make_pruner(pruner),
+    )
+    if _n_finished(study) >= n_trials:
+        return None
+    callbacks = [_StopAfterTrials(n_trials)]
+    if budget is not None:
+        # 마감은 optimize(timeout=) 대신 콜백으로 확인한다: 완료 trial 이 생기기 전에는 마감이 지나도 계속 돌린다
+        if time.time() > budget["deadline"] and _n_complete(study):
+            return None
+        callbacks.append(_StopBeforeDeadline(budget["deadline"]))
+    study.optimize(
+        lambda trial: objective(trial, X_train, y_train, lgbm_threads, budget),
+        callbacks=callbacks,
+    )
+    datasets = get_fold_datasets(X_train, y_train)
+    return {
+        "construct_seconds": datasets.construct_seconds,
+        "construct_bytes": datasets.construct_bytes,
+    }
+
+
+def _warm_start_from_history(study, storage, target_col):
+    """같은 스토리지에서 같은 타깃의 직전 스터디 완료 trial 을 가져와 TPE 사전 이력으로 사용 (최종 값·파라미터만)."""
+    previous = [
+        s for s in optuna.get_all_study_summaries(storage)
+        if s.study_name != study.study_name and s.datetime_start is not None
+        and s.user_attrs.get("target", TARGET_COL) == target_col
+    ]
+    if not previous:
+        return 0
+
+    latest = max(previous, key=lambda s: s.datetime_start)
+    prev_study = optuna.load_study(study_name=latest.study_name, storage=storage)
+    trials = [
+        optuna.trial.create_trial(
+            params=t.params,
+            distributions=t.distributions,
+            value=t.value,
+            # 중간 값은 가져오지 않는다: 이전 스터디의 반복별 MAE 가 pruner 기준이 되면 새 trial 이 모두 가지치기된다
+            user_attrs={**t.user_attrs, "warm_start": True, "source_study": latest.study_name},
+        )
+        for t in prev_study.get_trials(deepcopy=False, states=(TrialState.COMPLETE,))
+    ]
+    study.add_trials(trials)
+    return len(trials)
+
+
+def pruning_time_saved(study):
+    """가지치기된 trial 마다 (완주 trial 중앙 소요시간 - 실제 소요시간) 을 더한 추정 절약 시간(초)."""
+    trials = [t for t in study.get_trials(deepcopy=False) if _is_current(t) and t.duration is not None]
+    full = [t.duration.total_seconds() for t in trials if t.state == TrialState.COMPLETE]
+    if not full:
+        return 0.0
+    full_median = float(np.median(full))
+    return sum(
+        max(0.0, full_median - t.duration.total_seconds())
+        for t in trials if t.state == TrialState.PRUNED
+    )
+
+
+def run_study(X_train, y_train, storage_path, study_name=None, n_trials=N_TRIALS, n_jobs=1,
+              pruner="median", lgbm_threads=None, budget=None):
+    """
+    저널 파일에 저장되는 Optuna 스터디를 n_jobs 개 프로세스로 병렬 실행한다.
+    같은 데이터로 다시 실행하면 이미 끝난 trial 은 건너뛰고 남은 수만 돌린다.
+    lgbm_threads: n_jobs=1 일 때 LightGBM 스레드 수 (기본: 전체 코어)
+    budget: plan_budget 결과. 마감 시각까지 n_trials 이하로 돌리고, 폴드 수가 줄면 스터디 이름에 표시한다
+            (폴드 구성이 다른 trial 값끼리 섞이지 않도록).
+    """
+    storage = _journal_storage(storage_path)
+    study_name = study_name or f"{y_train.name}-{data_fingerprint(X_train, y_train)}"
+    if budget is not None and len(budget["folds"]) < CV_SPLITS:
+        study_name += f"-last{len(budget['folds'])}"
+
+    existing = {s.study_name for s in optuna.get_all_study_summaries(storage)}
+    study = optuna.create_study(
+        study_name=study_name,
+        storage=storage,
+        direction="minimize",
+        load_if_exists=True,
+    )
+    if study_name not in existing:
+        study.set_user_attr("target", y_train.name)
+        n_warm = _warm_start_from_history(study, storage, y_train.name)
+        if n_warm:
+            print(f"이전 스터디 trial {n_warm}개로 TPE warm-start")
+
+    # 중단된 실행에서 RUNNING 으로 남은 trial 은 실패 처리하고 같은 파라미터로 다시 실행
+    for t in study.get_trials(deepcopy=False, states=(TrialState.RUNNING,)):
+        study.enqueue_trial(t.params, skip_if_exists=True)
+        study.tell(t.number, state=TrialState.FAIL)
+
+    n_done = _n_finished(study)
+    print(f"Optuna 스터디: {study_name} (완료 {n_done}/{n_trials}, 워커 {n_jobs}개, pruner={pruner})")
+
+    t0 = time.perf_counter()
+    dataset_stats = []
+    if n_done < n_trials:
+        if n_jobs <= 1:
+            dataset_stats.append(
+                _study_worker(storage_path, study_name, SEED, n_trials, X_train, y_train, lgbm_threads, pruner,
+                              budget)
+            )
+        else:
+            lgbm_threads = max(1, (os.cpu_count() or 1) // n_jobs)
+            with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+                futures = [
+                    pool.submit(_study_worker, storage_path, study_name, SEED + i,
+                                n_trials, X_train, y_train, lgbm_threads, pruner, budget)
+                    for i in range(n_jobs)
+                ]
+                dataset_stats = [fut.result() for fut in futures]
+
+    study.set_user_attr("last_optimize_seconds", time.perf_counter() - t0)
+
+    study = optuna.load_study(study_name=study_name, storage=storage)
+    trials = [t for t in study.get_trials(deepcopy=False) if _is_current(t)]
+    n_pruned = sum(t.state == TrialState.PRUNED for t in trials)
+    print(f"가지치기 {n_pruned}개 / 추정 절약 시간 {pruning_time_saved(study):.1f}초")
+    if budget is not None:
+        n_cut = sum(t.user_attrs.get("budget_stopped", False) for t in trials)
+        print(f"시간 예산: trial {_n_complete(study)}개 완료 / {_n_finished(study)}개 종료 (마감으로 중단 {n_cut}개), "
+              f"마감까지 {budget['deadline'] - time.time():+.0f}초")
+
+    dataset_stats = [d for d in dataset_stats if d]
+    if dataset_stats:
+        boost = sum(t.user_attrs.get("boost_seconds", 0.0) for t in trials)
+        build = sum(d["construct_seconds"] for d in dataset_stats)
+        mem = max(d["construct_bytes"] for d in dataset_stats)
+        print(f"Dataset 구성 {build:.2f}초 (워커 {len(dataset_stats)}개 합, 워커당 RSS +{mem / 2**20:.1f} MiB)"
+              f" / 부스팅 {boost:.2f}초")
+
+    return study, best_or_fallback(study)
+
+
+def best_or_fallback(study):
+    """
+    이번 데이터로 완료된 trial 중 최선. 완료 trial 이 없으면(모두 가지치기·실패) warm-start 로 가져온
+    이전 스터디의 최선, 그것도 없으면 DEFAULT_TRIAL_PARAMS 로 만든 trial(value=None) 을 돌려준다.
+    """
+    complete = study.get_trials(deepcopy=False, states=(TrialState.COMPLETE,))
+    current = [t for t in complete if _is_current(t)]
+    if current:
+        return min(current, key=lambda t: t.value)
+    if complete:
+        best = min(complete, key=lambda t: t.value)
+        print(f"경고: 이번 스터디에 완료된 trial 이 없어 이전 스터디 최선 trial "
+              f"({best.user_attrs.get('source_study')} #{best.number}) 파라미터를 사용합니다")
+        return best
+    print("경고: 완료된 trial 이 없어 기본 파라미터(DEFAULT_TRIAL_PARAMS) 를 사용합니다")
+    return optuna.trial.create_trial(
+        params=DEFAULT_TRIAL_PARAMS,
+        distributions={k: optuna.distributions.CategoricalDistribution([v]) for k, v in DEFAULT_TRIAL_PARAMS.items()},
+        state=TrialState.FAIL,
+        user_attrs={"default_params": True},
+    )
+
+
+# =====================================================================
+# 5. 피처 행렬 디스크 캐시
+# =====================================================================
+FEATURE_CACHE_VERSION = 3
+
+
+def feature_spec(df, target_col, exog_cols=None, lag_list=[2], roll_windows=[6, 72, 144], keep=None):
+    """
+    make_features_with_diff 결과를 결정하는 설정 전체 (실제로 존재하는 외생변수만).
+    축소 스펙(keep)이면 "keep" 에 남긴 컬럼 목록이 들어간다 (전체 스펙의 해시는 그대로).
+    """
+    spec = {
+        "version": FEATURE_CACHE_VERSION,
+        "target_col": target_col,
+        "exog_cols": [c for c in (exog_cols or []) if c in df.columns],
+        "lag_list": list(lag_list),
+        "roll_windows": list(roll_windows),
+        "diff_lags": DIFF_LAGS,
+        "diff_roll_windows": DIFF_ROLL_WINDOWS,
+        "exog_lags": EXOG_LAGS,
+        "exog_roll_windows": EXOG_ROLL_WINDOWS,
+        "rolling": "numpy",
+        "rolling_block": ROLLING_BLOCK,
+    }
+    if keep is not None:
+        spec["keep"] = feature_columns(target_col, spec["exog_cols"], lag_list, roll_windows, keep)
+    return spec
+
+
+def feature_warmup(spec):
+    """한 행의 피처를 계산하는 데 필요한 과거 행 수 (diff 1행 포함)."""
+    lookbacks = (
+        spec["lag_list"] + [w + 1 for w in spec["roll_windows"]]
+        + [lag + 1 for lag in spec["diff_lags"]] + [w + 2 for w in spec["diff_roll_windows"]]
+    )
+    if spec["exog_cols"]:
+        lookbacks += spec["exog_lags"] + [w + 1 for w in spec["exog_roll_windows"]]
+    return max(lookbacks)
+
+
+def _row_hashes(df, spec):
+    cols = [spec["target_col"]] + spec["exog_cols"]
+    return pd.util.hash_pandas_object(df[cols], index=True).to_numpy()
+
+
+def cached_features(df, target_col, exog_cols=None, lag_list=[2], roll_windows=[6, 72, 144],
+                    cache_dir=None, keep=None):
+    """
+    make_features_with_diff(dropna=True) 와 같은 (X, y) 를 디스크 캐시를 거쳐 반환한다.
+
+    캐시는 피처 스펙 해시별 디렉터리에 dropna 전 전체 행렬을 .npy(mmap 가능)로 둔다.
+    입력 행 해시를 비교해 바뀌지 않은 앞부분은 그대로 쓰고, 새 꼬리 구간만
+    가장 긴 윈도우의 warm-up 행을 붙여 다시 계산한다. warm-up 으로 계산한 rolling 값은
+    전체 재계산과 누산 시작점만 달라 max(1, |값|) 기준 1e-11 이내로 일치한다.
+    """
+    spec = feature_spec(df, target_col, exog_cols, lag_list, roll_windows, keep)
+    spec_hash = hashlib.sha1(json.dumps(spec, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    cdir = Path(cache_dir or FEATURE_CACHE_DIR) / spec_hash
+    row_hashes = _row_hashes(df, spec)
 
-            pred = model.predict(X_val)
-            mae = mean_absolute_error(y_val, pred)
-            maes.append(mae)
+    # 캐시된 입력과 일치하는 가장 긴 앞부분(n_keep 행) 찾기
+    n_keep = 0
+    meta_path = cdir / "meta.json"
+    if meta_path.exists():
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        old_hashes = np.load(cdir / "rowhash.npy", mmap_mode="r")
+        n = min(len(old_hashes), len(row_hashes))
+        diff = np.flatnonzero(old_hashes[:n] != row_hashes[:n])
+        n_keep = int(diff[0]) if len(diff) else n
+        # 새 꼬리에 필요한 warm-up 만큼 캐시 앞부분은 남아 있어야 의미가 있음
+        if n_keep < feature_warmup(spec):
+            n_keep = 0
 
-        return np.mean(maes)
+    if n_keep:
+        X_old = np.load(cdir / "X.npy", mmap_mode="r")[:n_keep]
+        y_old = np.load(cdir / "y.npy", mmap_mode="r")[:n_keep]
+        columns, dtypes = meta["columns"], meta["dtypes"]
+    else:
+        X_old = y_old = None
+
+    n_new = len(df) - n_keep
+    if n_new:
+        start = max(0, n_keep - feature_warmup(spec))
+        feats, target = make_features_with_diff(
+            df.iloc[start:],
+            target_col,
+            exog_cols=spec["exog_cols"],
+            lag_list=lag_list,
+            roll_windows=roll_windows,
+            dropna=False,
+            keep=keep,
+        )
+        columns = list(feats.columns)
+        dtypes = feats.dtypes.astype(str).tolist()
+        X_new = feats.iloc[n_keep - start:].to_numpy(dtype=np.float64)
+        y_new = target.iloc[n_keep - start:].to_numpy(dtype=np.float64)
+        X_full = X_new if X_old is None else np.concatenate([X_old, X_new])
+        y_full = y_new if y_old is None else np.concatenate([y_old, y_new])
+
+        cdir.mkdir(parents=True, exist_ok=True)
+        for name, arr in [("X", X_full), ("y", y_full), ("rowhash", row_hashes)]:
+            tmp = cdir / f"{name}.tmp.npy"
+            np.save(tmp, arr)
+            os.replace(tmp, cdir / f"{name}.npy")
+        (cdir / "meta.json").write_text(
+            json.dumps({"spec": spec, "columns": columns, "dtypes": dtypes, "rows": len(df)}, ensure_ascii=False),
+            encoding="utf-8",
+        )
+    else:
+        X_full, y_full = X_old, y_old
+
+    print(f"피처 캐시 [{spec_hash}]: 재사용 {n_keep:,}행 / 새로 계산 {n_new:,}행")
+
+    feats = pd.DataFrame(np.asarray(X_full), index=df.index, columns=columns)
+    feats = feats.astype(dict(zip(columns, dtypes)))
+    valid = ~feats.isna().any(axis=1).to_numpy() & ~np.isnan(np.asarray(y_full))
+    X = feats.loc[valid]
+    y = pd.Series(np.asarray(y_full)[valid], index=X.index, name=target_col)
+    return X, y
+
+
+class SharedExogFeatures:
+    """
+    외생변수 lag/rolling 피처 블록을 한 번 계산해 .npy 로 두고, 여러 타깃 워커 프로세스가
+    mmap 읽기 전용으로 공유한다 (페이지 캐시를 같이 쓰므로 워커 수만큼 메모리가 늘지 않음).
+    파일 이름은 입력 외생변수 값과 피처 스펙의 해시라서 같은 데이터로 다시 실행하면 재사용한다.
+    피클에는 경로와 컬럼 정보만 들어가므로 프로세스 풀 인자로 그대로 넘길 수 있다.
+    """
+
+    def __init__(self, path, exog_cols, n_rows):
+        self.path = Path(path)
+        self.exog_cols = list(exog_cols)
+        self.n_rows = n_rows
+        self.column_index = {c: j for j, c in enumerate(exog_feature_columns(self.exog_cols))}
+        self._values = None
+
+    @classmethod
+    def build(cls, df, exog_cols, cache_dir=None):
+        exog_cols = [c for c in exog_cols if c in df.columns]
+        spec = {
+            "version": FEATURE_CACHE_VERSION,
+            "exog_cols": exog_cols,
+            "exog_lags": EXOG_LAGS,
+            "exog_roll_windows": EXOG_ROLL_WINDOWS,
+            "rolling_block": ROLLING_BLOCK,
+        }
+        h = hashlib.sha1(json.dumps(spec, sort_keys=True).encode("utf-8"))
+        h.update(pd.util.hash_pandas_object(df[exog_cols], index=True).to_numpy().tobytes())
+        path = Path(cache_dir or FEATURE_CACHE_DIR) / "shared" / f"exog_{h.hexdigest()[:16]}.npy"
+
+        if path.exists():
+            print(f"공유 외생변수 피처 재사용: {path.name}")
+        else:
+            t0 = time.perf_counter()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(path.stem + ".tmp.npy")
+            np.save(tmp, np.ascontiguousarray(exog_feature_block(df, exog_cols)))
+            os.replace(tmp, path)
+            print(f"공유 외생변수 피처 계산: {path.name} ({time.perf_counter() - t0:.2f}초, "
+                  f"{path.stat().st_size / 2**20:.1f} MiB)")
+        return cls(path, exog_cols, len(df))
+
+    def __getstate__(self):
+        return {**self.__dict__, "_values": None}
+
+    def values(self, n_rows):
+        if n_rows != self.n_rows:
+            raise ValueError(f"공유 피처 행 수({self.n_rows})와 입력 행 수({n_rows})가 다릅니다.")
+        if self._values is None:
+            self._values = np.load(self.path, mmap_mode="r")
+        return self._values
+
+# =====================================================================
+# 6. 최종 모델 학습 + 증분 재학습 (--refresh)
+# =====================================================================
+# LightGBM 로그 레벨은 스레드별로 유지되므로 Booster 는 학습할 스레드 안에서 만든다 (생성만 직렬화)
+_BOOSTER_INIT_LOCK = threading.Lock()
+
+
+def _boost(params, train_set, n_rounds):
+    with _BOOSTER_INIT_LOCK:
+        booster = lgb.Booster(params, train_set)
+    for _ in range(n_rounds):
+        if booster.update():      # 더 이상 분할할 수 없으면 True
+            break
+    return booster
+
+
+def _timed_boost(params, train_set, n_rounds):
+    t0 = time.perf_counter()
+    booster = _boost(params, train_set, n_rounds)
+    return booster, time.perf_counter() - t0
+
+
+def _train_concurrently(jobs, n_rounds, n_threads=None, timings=None):
+    """
+    jobs: {이름: (파라미터, lgb.Dataset)} → {이름: Booster}.
+    모델마다 스레드 하나에서 부스팅을 반복한다 (LightGBM 호출 중에는 GIL 이 풀림).
+    공유 Dataset 에 대한 Booster 생성은 잠금으로 하나씩 하고, CPU 스레드는 모델 수로 나눠 쓴다.
+    timings 에 dict 를 주면 모델별 학습 시간(초)을 기록한다 (동시 학습 중 모델당 스레드 기준).
+    """
+    n_threads = n_threads or os.cpu_count() or 1
+    per_model = max(1, n_threads // len(jobs))
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+        futures = {
+            name: pool.submit(_timed_boost, {**params, "num_threads": per_model}, train_set, n_rounds)
+            for name, (params, train_set) in jobs.items()
+        }
+        results = {name: f.result() for name, f in futures.items()}
+    print(f"  {len(results)}개 동시 학습, 모델당 스레드 {per_model}, {time.perf_counter() - t0:.1f}초")
+    if timings is not None:
+        timings.update({name: seconds for name, (_, seconds) in results.items()})
+    return {name: booster for name, (booster, _) in results.items()}
 
-    sampler = optuna.samplers.TPESampler(seed=SEED)
-    study = optuna.create_study(direction="minimize", sampler=sampler)
-    study.optimize(objective, n_trials=N_TRIALS)
 
-    print("\nBest Params:", study.best_params)
-    print("Best CV MAE:", study.best_value)
+def _booster_params(params):
+    return {k: v for k, v in params.items() if k not in ("n_estimators", "n_jobs")}
 
-    best_params = study.best_params
-    best_params.update({
+
+def final_n_estimators(trial):
+    """
+    최종 학습 트리 수: 폴드 early stopping 의 best_iteration 평균 × FINAL_ROUNDS_SCALE (N_ESTIMATORS 이하).
+    best_iteration 을 기록하기 전의 trial(이전 스터디 warm-start 등)이면 N_ESTIMATORS.
+    """
+    iters = trial.user_attrs.get("fold_best_iterations")
+    if not iters:
+        return N_ESTIMATORS
+    return min(N_ESTIMATORS, max(1, math.ceil(np.mean(iters) * FINAL_ROUNDS_SCALE)))
+
+
+def final_params(trial, n_estimators=None):
+    """튜닝된 trial 파라미터 + 최종 학습 고정 파라미터."""
+    return {
+        **trial.params,
         "objective": "regression",
         "metric": "mae",
         "boosting_type": "gbdt",
         "random_state": SEED,
         "verbose": -1,
-        "n_estimators": 1000,
-    })
+        "n_estimators": n_estimators or final_n_estimators(trial),
+    }
+
+
+def model_cost(booster, X_row, fit_seconds=None, repeat=200):
+    """부스터 크기(텍스트 바이트)·트리 수·학습 시간과 1행 predict 평균 지연 (recursive_forecast 스텝당 비용)."""
+    X_row = np.asarray(X_row, dtype=np.float64).reshape(1, -1)
+    booster.predict(X_row)
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        booster.predict(X_row)
+    return {
+        "num_trees": booster.num_trees(),
+        "model_bytes": len(booster.model_to_string().encode("utf-8")),
+        "fit_seconds": fit_seconds,
+        "predict_ms": (time.perf_counter() - t0) / repeat * 1e3,
+    }
+
+
+def format_cost(cost):
+    fit = "-" if cost["fit_seconds"] is None else f"{cost['fit_seconds']:.1f}초"
+    return (f"트리 {cost['num_trees']}개, 모델 {cost['model_bytes'] / 2**10:,.0f} KiB, "
+            f"학습 {fit}, 1행 predict {cost['predict_ms']:.3f} ms")
+
+
+def train_final_models(train_set, params, quantiles=None, n_threads=None, timings=None):
+    """
+    하나의 lgb.Dataset(bin 매퍼 공유)에서 점 예측 모델과 분위수 모델들을 동시에 학습한다.
+    반환: {"point": Booster, **{분위수 이름: Booster}}. timings: 모델별 학습 시간을 받을 dict
+    """
+    base = _booster_params(params)
+    jobs = {"point": (base, train_set)}
+    for name, alpha in (quantiles or {}).items():
+        jobs[name] = ({**base, "objective": "quantile", "alpha": alpha, "metric": "quantile"}, train_set)
+
+    print(f"최종 모델 학습: {', '.join(jobs)}")
+    return _train_concurrently(jobs, params.get("n_estimators", N_ESTIMATORS), n_threads, timings)
+
+
+def train_exog_models(train_set, exog_train, params, n_threads=None):
+    """
+    외생변수별 1스텝 모델 ({열 이름: Booster}). 타깃 모델과 같은 피처 행(train_set)의 subset 으로
+    bin 매퍼를 공유하고 라벨만 해당 외생변수로 바꾼다. 라벨이 결측인 행은 제외.
+    """
+    jobs = {}
+    for col in exog_train.columns:
+        y = exog_train[col].to_numpy(dtype=np.float64)
+        rows = np.flatnonzero(~np.isnan(y))
+        col_set = train_set.subset(rows).construct()
+        col_set.set_label(y[rows])
+        jobs[col] = (_booster_params(params), col_set)
+
+    print(f"외생변수 모델 학습: {', '.join(jobs)}")
+    return _train_concurrently(jobs, EXOG_N_ESTIMATORS, n_threads)
+
+
+def exog_model_file(col):
+    """외생변수 모델 파일 이름 (산출물 디렉터리 안)."""
+    return "exog_" + "".join(c if c.isalnum() else "_" for c in col) + "_model"
+
+
+def refresh_booster(booster, params, X_new, y_new, mode="continue", rounds=REFRESH_ROUNDS, alpha=None):
+    """
+    기존 부스터를 (X_new, y_new) 에 맞춰 갱신한다.
+    - continue: init_model 로 이어서 rounds 개 트리를 추가 (매 갱신마다 모델이 커짐). X_new 는 새로 추가된 구간
+    - refit   : 트리 구조는 그대로 두고 리프값만 다시 맞춤 (REFIT_DECAY 가중). X_new 는 전체 학습 구간
+                (새 구간만으로 리프값을 맞추면 하루치 분포에 끌려가 MAE 가 나빠진다)
+    alpha 를 주면 분위수 모델로 보고 objective 를 quantile 로 바꿔 학습한다.
+    """
+    if mode == "refit":
+        return booster.refit(X_new, y_new, decay_rate=REFIT_DECAY)
+
+    train_params = {k: v for k, v in params.items() if k != "n_estimators"}
+    if alpha is not None:
+        train_params.update({"objective": "quantile", "alpha": alpha, "metric": "quantile"})
+    # 튜닝된 min_child_samples 는 전체 학습셋 기준이라 하루치 새 데이터에서는 분할이 전혀 안 될 수 있음
+    if "min_child_samples" in train_params:
+        train_params["min_child_samples"] = min(train_params["min_child_samples"], max(5, len(X_new) // 4))
+    train_set = lgb.Dataset(X_new, y_new, params={**BIN_PARAMS, "verbose": -1})
+    return lgb.train(
+        train_params,
+        train_set,
+        num_boost_round=rounds,
+        init_model=booster,
+        keep_training_booster=False,
+    )
+
+
+def try_refresh(X_train, y_train, X_test, y_test, mode="continue", rounds=REFRESH_ROUNDS,
+                drift_threshold=DRIFT_THRESHOLD, artifact_dir=None):
+    """
+    --refresh: 현재 산출물(artifacts CURRENT)의 부스터로 최근 TEST_DAYS 구간을 먼저 평가하고, 드리프트가 없으면
+    이전 학습 이후 추가된 학습 구간으로 갱신해 (부스터, 분위수 부스터 dict, 파라미터, 기준 MAE) 를 반환한다.
+    분위수 부스터는 산출물에 있는 것만 같은 방식으로 갱신한다. 갱신 후 최근 TEST_DAYS MAE 가 나빠지면
+    갱신을 버리고 저장된 부스터를 그대로 쓴다.
+    체크포인트가 없거나, 피처 구성이 바뀌었거나, 드리프트가 임계값을 넘으면 None (전체 재튜닝).
+    """
+    run_dir = artifacts.current_run_dir(artifact_dir)
+    if run_dir is None:
+        print("[refresh] 저장된 모델이 없어 전체 튜닝을 진행합니다.")
+        return None
+    booster, meta = artifacts.load_booster(run_dir), artifacts.load_meta(run_dir)
+    print(f"[refresh] 기준 모델: {run_dir.name}")
+    if meta["feature_names"] != list(X_train.columns):
+        print("[refresh] 피처 구성이 바뀌어 전체 튜닝을 진행합니다.")
+        return None
+
+    reference = meta["metrics"]["reference_mae"]
+    mae_now = mean_absolute_error(y_test, booster.predict(X_test))
+    drift = mae_now / reference - 1.0
+    print(f"[refresh] 최근 {TEST_DAYS}일 MAE {mae_now:.4f} (기준 {reference:.4f}, {drift:+.1%})")
+    if drift > drift_threshold:
+        print(f"[refresh] 드리프트 임계값 {drift_threshold:.0%} 초과 → 전체 재튜닝")
+        return None
+
+    bands = {
+        name: lgb.Booster(model_file=str(run_dir / f"{name}_model.txt"))
+        for name in QUANTILES
+        if (run_dir / f"{name}_model.txt").exists()
+    }
+
+    new = X_train.index > pd.Timestamp(meta["trained_until"])
+    if not new.any():
+        print("[refresh] 새 학습 구간이 없어 저장된 모델을 그대로 사용합니다.")
+        return booster, bands, meta["best_params"], reference
+
+    t0 = time.perf_counter()
+    X_fit, y_fit = (X_train[new], y_train[new]) if mode == "continue" else (X_train, y_train)
+    refreshed = refresh_booster(booster, meta["best_params"], X_fit, y_fit, mode, rounds)
+    mae_refreshed = mean_absolute_error(y_test, refreshed.predict(X_test))
+    if mae_refreshed > mae_now:
+        print(f"[refresh] {mode}: 갱신 후 최근 {TEST_DAYS}일 MAE {mae_refreshed:.4f} > 갱신 전 {mae_now:.4f} "
+              f"→ 갱신을 버리고 저장된 모델을 그대로 사용합니다.")
+        return booster, bands, meta["best_params"], reference
+
+    bands = {
+        name: refresh_booster(b, meta["best_params"], X_fit, y_fit, mode, rounds, alpha=QUANTILES[name])
+        for name, b in bands.items()
+    }
+    print(f"[refresh] {mode}: 새 학습 구간 {new.sum():,}행 반영, 트리 {refreshed.num_trees()}개, "
+          f"분위수 모델 {len(bands)}개, 최근 {TEST_DAYS}일 MAE {mae_now:.4f} → {mae_refreshed:.4f} "
+          f"({time.perf_counter() - t0:.2f}초)")
+    return refreshed, bands, meta["best_params"], reference
+
+
+def parse_duration(text):
+    """초 단위 숫자 또는 pandas Timedelta 문자열 (예: 1200, 20min, 1h) → 초."""
+    try:
+        return float(text)
+    except ValueError:
+        return pd.Timedelta(text).total_seconds()
+
+
+def forecast_frame(future_week, target_col):
+    """recursive/direct_forecast 결과 → 산출물 예측 DataFrame (예측·하한·상한 컬럼)."""
+    forecast_col, lower_col, upper_col = artifacts.forecast_columns(target_col)
+    if isinstance(future_week, pd.Series):
+        out = future_week.to_frame(name=forecast_col)
+    else:
+        # 분위수 교차 방지: lower <= 점 예측 <= upper
+        out = pd.DataFrame({
+            forecast_col: future_week["point"],
+            lower_col: np.minimum(future_week["lower"], future_week["point"]),
+            upper_col: np.maximum(future_week["upper"], future_week["point"]),
+        })
+    out.index.name = "Timestamp"
+    return out
+
+
+# =====================================================================
+# 7. 다중 타깃 학습 (--targets)
+# =====================================================================
+def target_exog_cols(target_col, exog_cols=EXOG_COLS):
+    """타깃 자신은 외생변수에서 뺀다 (재귀 예측에서 마지막 값으로 고정되면 타깃 궤적과 어긋남)."""
+    return [c for c in exog_cols if c != target_col]
+
+
+def train_target(target_col, df, shared_exog, data_meta, args, lgbm_threads=None):
+    """
+    워커 프로세스 하나에서 타깃 하나를 튜닝 → 최종 학습 → 1주일 재귀 예측하고
+    타깃별 산출물 디렉터리(artifacts.target_artifact_dir)에 기록한다.
+    외생변수 피처는 shared_exog(memmap)에서 읽고 타깃 lag/rolling 만 새로 계산한다.
+    """
+    t0 = time.perf_counter()
+    exog_cols = target_exog_cols(target_col, shared_exog.exog_cols)
+    report = profiling.RunReport()
+    # dropna 가 타깃 결측 행(센서에 따라 결측 구간이 있음)도 함께 뺀다
+    X_all, y_all = make_features_with_diff(df, target_col, exog_cols=exog_cols, shared_exog=shared_exog)
+    report.lap("features")
+
+    freq_td = df.index.to_series().diff().dropna().mode()[0]
+    cutoff_time = X_all.index.max() - pd.Timedelta(days=TEST_DAYS)
+    train = X_all.index <= cutoff_time
+    X_train, y_train = X_all[train], y_all[train]
+    X_test, y_test = X_all[~train], y_all[~train]
+
+    _, best_trial = run_study(
+        X_train,
+        y_train,
+        storage_path=args.study_path,
+        n_trials=args.n_trials,
+        pruner=args.pruner,
+        lgbm_threads=lgbm_threads,
+    )
+    report.lap("tuning")
+    best_params = final_params(best_trial)
+    band_models = train_final_models(
+        get_fold_datasets(X_train, y_train).full,
+        best_params,
+        quantiles=QUANTILES if args.quantiles else None,
+        n_threads=lgbm_threads,
+    )
+    final_model = band_models.pop("point")
+    report.lap("final_fit")
+
+    y_pred = final_model.predict(X_test)
+    mae_test = mean_absolute_error(y_test, y_pred)
+    feature_means = X_train.mean()
+    future_week = recursive_forecast(
+        df,
+        final_model,
+        target_col,
+        int(pd.Timedelta("7D") / freq_td),
+        freq_td,
+        feature_means,
+        exog_cols,
+        band_models=band_models or None,
+    )
+    report.lap("forecast")
+
+    run_meta = {
+        "target_col": target_col,
+        "strategy": "recursive",
+        "best_params": best_params,
+        "feature_spec": feature_spec(df, target_col, exog_cols=exog_cols),
+        "feature_names": list(X_train.columns),
+        "data_content_hash": data_meta.get("content_hash"),
+        "grid": data_meta.get("grid"),
+        "trained_until": X_train.index.max().isoformat(),
+        "num_trees": final_model.num_trees(),
+        "forecast_band": dict(QUANTILE_BAND) if band_models else None,
+        "exog_forecast": {},
+        "refreshed": False,
+        "metrics": {
+            "reference_mae": mae_test,
+            "test_mae": mae_test,
+            "test_rmse": float(np.sqrt(mean_squared_error(y_test, y_pred))),
+            "test_mape": mean_abs_percentage_error(y_test.values, y_pred),
+        },
+    }
+    run_dir = artifacts.write_run(
+        final_model,
+        run_meta,
+        feature_means,
+        forecast_frame(future_week, target_col),
+        artifact_dir=artifacts.target_artifact_dir(target_col, args.artifact_dir),
+        extra_boosters={f"{name}_model": b for name, b in band_models.items()},
+        arrays={"model": tree_eval.pack(final_model)},
+    )
+    report.lap("write")
+    report.write(
+        run_dir,
+        history_dir=run_dir.parent,
+        run_id=run_dir.name,
+        strategy="recursive",
+        target_col=target_col,
+        data_content_hash=data_meta.get("content_hash"),
+        rows=len(df),
+        n_trials=args.n_trials,
+        time_budget=None,
+        test_mae=mae_test,
+    )
+    return {
+        "target": target_col,
+        "test_mae": mae_test,
+        "best_cv_mae": np.nan if best_trial.value is None else best_trial.value,
+        "seconds": time.perf_counter() - t0,
+        "run_dir": str(run_dir),
+    }
+
+
+def train_targets(df, targets, data_meta, args):
+    """
+    타깃마다 워커 프로세스 하나에서 train_target 을 실행한다.
+    외생변수 피처는 먼저 한 번만 계산해 .npy 로 두고 워커들이 mmap 으로 공유한다.
+    """
+    shared_exog = SharedExogFeatures.build(df, EXOG_COLS)
+    n_workers = max(1, min(args.target_jobs or os.cpu_count() or 1, len(targets)))
+    lgbm_threads = max(1, (os.cpu_count() or 1) // n_workers)
+    print(f"다중 타깃 학습: {', '.join(targets)} (워커 {n_workers}개, 워커당 LightGBM 스레드 {lgbm_threads})")
+
+    t0 = time.perf_counter()
+    rss0 = rss_bytes()
+    if n_workers == 1:
+        results = [train_target(t, df, shared_exog, data_meta, args, lgbm_threads) for t in targets]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            futures = [
+                pool.submit(train_target, t, df, shared_exog, data_meta, args, lgbm_threads)
+                for t in targets
+            ]
+            results = [f.result() for f in futures]
+
+    print(f"\n=== 다중 타깃 학습 결과 ({time.perf_counter() - t0:.1f}초, 메인 RSS +{(rss_bytes() - rss0) / 2**20:.1f} MiB) ===")
+    for r in results:
+        print(f"{r['target']:<26} CV MAE {r['best_cv_mae']:.4f} / Test MAE {r['test_mae']:.4f} "
+              f"({r['seconds']:.1f}초) → {r['run_dir']}")
+    return results
+
+
+
+# =====================================================================
+# 8. 파이프라인 단계 (stage_cache, 내용 주소 캐시)
+# =====================================================================
+PIPELINE_VERSION = 1                 # 단계 코드의 결과가 바뀌면 올려서 기존 캐시를 무효화
+ALWAYS_STAGES = ["load", "evaluate", "write"]
+
+
+def pipeline_stages(args, data_hash, spec, horizon_steps):
+    """
+    main 의 단계 표 [(이름, 설정, 상위 단계, 모드)] (stage_cache.StageCache).
+    설정·상위 출력이 같은 단계는 이전 출력을 재사용한다. --refresh 는 CURRENT 산출물에, --time-budget 은
+    벽시계 시간에 따라 결과가 달라지므로 해당 단계를 매번 실행(volatile)한다.
+    """
+    quantiles = QUANTILES if args.quantiles else None
+    exog_cols = exog_forecast_columns(args)
+    grid = grid_config(args)
+    model_deps = ["features", "final_fit"] + (["exog_fit"] if exog_cols else [])
+
+    stages = []
+    if args.select_features:
+        stages.append(("select", {
+            "data": data_hash,
+            "grid": grid,
+            "spec": spec,
+            "test_days": TEST_DAYS,
+            "cv_splits": CV_SPLITS,
+            "folds": SELECT_FOLDS,
+            "params": SELECT_PARAMS,
+            "min_gain": SELECT_MIN_GAIN,
+            "min_perm": SELECT_MIN_PERM,
+            "max_mae_increase": SELECT_MAX_MAE_INCREASE,
+            "perm_rows": SELECT_PERM_ROWS,
+            "bin_params": BIN_PARAMS,
+        }, [], "cached"))
+    stages += [
+        ("features", {"data": data_hash, "grid": grid, "spec": spec, "test_days": TEST_DAYS},
+         ["select"] if args.select_features else [], "keyed"),
+        ("tune", {
+            "n_trials": args.n_trials,
+            "n_jobs": args.n_jobs,           # 워커마다 sampler seed 가 달라 병렬 수에 따라 trial 이 달라진다
+            "pruner": args.pruner,
+            "study_name": args.study_name,
+            "cv_splits": CV_SPLITS,
+            "n_estimators": N_ESTIMATORS,
+            "final_rounds_scale": FINAL_ROUNDS_SCALE,
+            "bin_params": BIN_PARAMS,
+            "seed": SEED,
+        }, ["features"], "volatile" if args.refresh or args.time_budget else "cached"),
+        ("final_fit", {"quantiles": quantiles, "bin_params": BIN_PARAMS},
+         ["features", "tune"], "volatile" if args.refresh else "cached"),
+    ]
+    if exog_cols:
+        stages.append(("exog_fit", {"cols": exog_cols, "rounds": EXOG_N_ESTIMATORS}, ["features", "tune"], "cached"))
+    if args.backtest or args.conformal:
+        stages.append(("backtest", {"stride": args.backtest_stride, "horizon_steps": horizon_steps},
+                       model_deps, "cached"))
+    if args.strategy == "direct":
+        stages.append(("direct_fit", {
+            "quantiles": quantiles,
+            "horizon_steps": horizon_steps,
+            "horizon_stride": DIRECT_HORIZON_STRIDE,
+            "origin_stride": DIRECT_ORIGIN_STRIDE,
+        }, ["features", "tune", "final_fit"], "cached"))
+    stages.append(("forecast", {"strategy": args.strategy, "horizon_steps": horizon_steps},
+                   model_deps + (["direct_fit"] if args.strategy == "direct" else []), "cached"))
+    return [(name, {"version": PIPELINE_VERSION, **config}, deps, mode) for name, config, deps, mode in stages]
+
+
+def grid_config(args):
+    """격자 전처리 설정 (--no-grid 면 None). 같은 원본이라도 설정이 다르면 피처가 달라지므로 단계 키에 넣는다."""
+    if args.no_grid:
+        return None
+    return {"freq": str(regular_grid.GRID_FREQ), "fill": args.grid_fill, "max_gap": str(args.grid_max_gap)}
+
+
+def exog_forecast_columns(args):
+    """--forecast-exog 로 예측할 외생변수 열 (없으면 빈 목록)."""
+    if args.forecast_exog is None:
+        return []
+    return list(args.forecast_exog or EXOG_COLS)
+
+
+def save_boosters(boosters, directory):
+    for name, booster in boosters.items():
+        booster.save_model(str(Path(directory) / f"{name}.txt"))
+
+
+def load_boosters(directory):
+    return {p.stem: lgb.Booster(model_file=str(p)) for p in sorted(Path(directory).glob("*.txt"))}
+
+
+def boosters_digest(boosters):
+    return stage_cache.digest({name: b.model_to_string() for name, b in boosters.items()})
+
+
+def tune(X_train, y_train, args, seconds_left=None):
+    """
+    tune 단계: (--time-budget 이면 예산 계획 후) Optuna 탐색 → 최종 학습 파라미터.
+    반환은 JSON 으로 저장 가능한 dict (params, trial_params, best_value, study_name, budget).
+    """
+    budget = None
+    if args.time_budget:
+        n_final_models = 1 + (len(QUANTILES) if args.quantiles else 0) + len(exog_forecast_columns(args))
+        budget = plan_budget(X_train, y_train, seconds_left, n_final_models)
+    study, best_trial = run_study(
+        X_train,
+        y_train,
+        storage_path=args.study_path,
+        study_name=args.study_name,
+        n_trials=args.n_trials,
+        n_jobs=args.n_jobs,
+        pruner=args.pruner,
+        budget=budget,
+    )
+
+    if args.compare_unpruned and args.pruner != "none":
+        with tempfile.TemporaryDirectory() as tmp:
+            ref_study, _ = run_study(
+                X_train,
+                y_train,
+                storage_path=Path(tmp) / "unpruned.log",
+                study_name=study.study_name,
+                n_trials=args.n_trials,
+                n_jobs=args.n_jobs,
+                pruner="none",
+            )
+            t_full = ref_study.user_attrs["last_optimize_seconds"]
+        t_pruned = study.user_attrs["last_optimize_seconds"]
+        print(f"탐색 소요시간: pruner={args.pruner} {t_pruned:.1f}초 / 가지치기 없음 {t_full:.1f}초 "
+              f"(절약 {t_full - t_pruned:.1f}초)")
+
+    print(f"최종 트리 수: {final_n_estimators(best_trial)} "
+          f"(폴드 best_iteration {best_trial.user_attrs.get('fold_best_iterations')} × {FINAL_ROUNDS_SCALE})")
+    return {
+        "params": final_params(best_trial),
+        "trial_params": best_trial.params,
+        "best_value": np.nan if best_trial.value is None else float(best_trial.value),
+        "study_name": study.study_name,
+        "budget": None if budget is None else {
+            "folds": budget["folds"],
+            "tuning_seconds": budget["tuning_seconds"],
+            "reserve_seconds": budget["reserve_seconds"],
+        },
+    }
+
+# =====================================================================
+# 9. 중요도 기반 피처 선택 (--select-features)
+# =====================================================================
+def _fit_fold(params, train_set, valid_set):
+    t0 = time.perf_counter()
+    booster = lgb.train(
+        params,
+        train_set,
+        num_boost_round=N_ESTIMATORS,
+        valid_sets=[valid_set],
+        callbacks=[lgb.early_stopping(50, verbose=False), lgb.log_evaluation(period=0)],
+    )
+    return booster, time.perf_counter() - t0
+
+
+def _seconds(fn):
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+def select_features(df, target_col, exog_cols, build_features=make_features_with_diff, n_folds=SELECT_FOLDS,
+                    params=SELECT_PARAMS):
+    """
+    학습 구간의 최근 n_folds 개 CV 폴드에서 고정 파라미터 모델로 피처 순위를 매기고 축소 스펙을 만든다.
+    - gain       : 폴드별 gain 중요도 비중의 평균
+    - permutation: 검증 행에서 그 열만 섞었을 때 MAE 증가율의 평균
+    둘 중 하나라도 기준(SELECT_MIN_GAIN, SELECT_MIN_PERM) 이상인 피처만 남긴다. 같은 폴드에서 남긴 피처로
+    다시 학습해 CV MAE 가 SELECT_MAX_MAE_INCREASE 넘게 나빠지면 전체 스펙을 유지한다 (keep=None).
+    반환(JSON 저장 가능): keep, ranking, cv_mae, 전체/축소 스펙의 피처 계산·증분 재생·폴드 학습 시간.
+    """
+    X_all, y_all = build_features(df, target_col, exog_cols=exog_cols)
+    cutoff_time = X_all.index.max() - pd.Timedelta(days=TEST_DAYS)
+    X_train = X_all[X_all.index <= cutoff_time]
+    y_train = y_all.loc[X_train.index]
+    names = list(X_train.columns)
+    rng = np.random.default_rng(SEED)
+
+    datasets = FoldDatasets(X_train, y_train, CV_SPLITS, BIN_PARAMS)
+    folds = datasets.folds[-n_folds:]
+    gain, perm = np.zeros(len(names)), np.zeros(len(names))
+    full_maes, full_fit = [], 0.0
+    for train_set, valid_set, val_idx in folds:
+        booster, seconds = _fit_fold(params, train_set, valid_set)
+        full_fit += seconds
+        it = booster.best_iteration
+        X_val, y_val = datasets.X_values[val_idx], datasets.y_values[val_idx]
+        full_maes.append(mean_absolute_error(y_val, booster.predict(X_val, num_iteration=it)))
+
+        g = booster.feature_importance("gain", iteration=it)
+        gain += g / max(g.sum(), 1e-12)
+
+        rows = np.sort(rng.choice(len(val_idx), size=min(SELECT_PERM_ROWS, len(val_idx)), replace=False))
+        X_perm, y_perm = X_val[rows], y_val[rows]
+        base = mean_absolute_error(y_perm, booster.predict(X_perm, num_iteration=it))
+        for j in range(len(names)):
+            saved = X_perm[:, j].copy()
+            X_perm[:, j] = rng.permutation(saved)
+            perm[j] += mean_absolute_error(y_perm, booster.predict(X_perm, num_iteration=it)) / base - 1.0
+            X_perm[:, j] = saved
+    del datasets
+    gain /= len(folds)
+    perm /= len(folds)
+
+    kept = (gain >= SELECT_MIN_GAIN) | (perm >= SELECT_MIN_PERM)
+    candidate = [c for c, k in zip(names, kept) if k]
+    ranking = sorted(
+        ({"feature": c, "gain": float(g), "permutation": float(pm), "kept": bool(k)}
+         for c, g, pm, k in zip(names, gain, perm, kept)),
+        key=lambda r: (-r["permutation"], -r["gain"]),
+    )
+
+    result = {
+        "keep": None,
+        "n_features": {"full": len(names), "reduced": len(candidate)},
+        "folds": len(folds),
+        "ranking": ranking,
+        "cv_mae": {"full": float(np.mean(full_maes)), "reduced": float(np.mean(full_maes)), "change": 0.0},
+        "seconds": None,
+    }
+    print(f"\n=== 피처 선택 (최근 {len(folds)}폴드, gain + permutation) ===")
+    print(pd.DataFrame(ranking).set_index("feature").head(15).to_string(float_format=lambda v: f"{v:.4f}"))
+    if len(candidate) == len(names):
+        print(f"피처 {len(names)}개 모두 기준 이상 → 전체 스펙 유지")
+        return result
+
+    reduced = FoldDatasets(X_train[candidate], y_train, CV_SPLITS, BIN_PARAMS)
+    reduced_maes, reduced_fit = [], 0.0
+    for train_set, valid_set, val_idx in reduced.folds[-n_folds:]:
+        booster, seconds = _fit_fold(params, train_set, valid_set)
+        reduced_fit += seconds
+        pred = booster.predict(reduced.X_values[val_idx], num_iteration=booster.best_iteration)
+        reduced_maes.append(mean_absolute_error(reduced.y_values[val_idx], pred))
+    del reduced
+    mae_full, mae_reduced = float(np.mean(full_maes)), float(np.mean(reduced_maes))
+    change = mae_reduced / mae_full - 1.0
 
-    final_model = LGBMRegressor(**best_params)
-    final_model.fit(X_train, y_train)
+    # 축소로 빠지는 계산: 학습용 피처 행렬 생성, 예측 전 이력 재생 (스텝당)
+    hist = df.iloc[-SELECT_TIMING_ROWS:]
+    seconds = {
+        "features": {
+            "full": _seconds(lambda: make_features_with_diff(df, target_col, exog_cols=exog_cols)),
+            "reduced": _seconds(lambda: make_features_with_diff(df, target_col, exog_cols=exog_cols,
+                                                                keep=candidate)),
+        },
+        "replay_step": {
+            "full": _seconds(lambda: IncrementalFeatureState.from_history(hist, target_col, exog_cols))
+                    / len(hist),
+            "reduced": _seconds(lambda: IncrementalFeatureState.from_history(hist, target_col, exog_cols,
+                                                                             keep=candidate)) / len(hist),
+        },
+        "fold_fit": {"full": full_fit, "reduced": reduced_fit},
+    }
+    result.update(cv_mae={"full": mae_full, "reduced": mae_reduced, "change": change}, seconds=seconds)
+
+    dropped = [c for c, k in zip(names, kept) if not k]
+    print(f"피처 {len(names)}개 → {len(candidate)}개 (제거 {len(dropped)}개: {', '.join(dropped)})")
+    print(f"CV MAE: 전체 {mae_full:.4f} / 축소 {mae_reduced:.4f} ({change:+.2%})")
+    f, r, fit = seconds["features"], seconds["replay_step"], seconds["fold_fit"]
+    print(f"피처 계산 {f['full']:.2f}초 → {f['reduced']:.2f}초 ({f['full'] / f['reduced']:.1f}배), "
+          f"증분 재생 스텝당 {r['full'] * 1e6:.0f}µs → {r['reduced'] * 1e6:.0f}µs "
+          f"({r['full'] / r['reduced']:.1f}배), 폴드 학습 {fit['full']:.1f}초 → {fit['reduced']:.1f}초")
+
+    if change > SELECT_MAX_MAE_INCREASE:
+        print(f"CV MAE 가 {SELECT_MAX_MAE_INCREASE:.0%} 넘게 나빠져 전체 스펙을 유지합니다.")
+    else:
+        result["keep"] = candidate
+    return result
+
+
+def build_selected_features(df, target_col, exog_cols, keep, build_features=make_features_with_diff):
+    """
+    keep(축소 스펙) 피처를 만들되 전체 스펙 피처가 남기는 행(시각)만 쓴다.
+    축소 스펙은 결측이 긴 열이 빠져 dropna 후 남는 행이 더 많으므로, 그대로 쓰면 학습·홀드아웃 구간이
+    전체 스펙 실행(과 select_features 의 폴드)과 달라져 두 실행의 MAE 를 비교할 수 없다.
+    """
+    X, y = build_features(df, target_col, exog_cols=exog_cols, keep=keep)
+    if keep is None:
+        return X, y
+    rows = X.index.isin(build_features(df, target_col, exog_cols=exog_cols)[0].index)
+    print(f"축소 스펙 행 {len(X):,}개 중 전체 스펙 행 {rows.sum():,}개 사용")
+    return X[rows], y[rows]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="클로로필 예측 모델 오프라인 학습")
+    parser.add_argument(
+        "--strategy",
+        choices=["recursive", "direct"],
+        default="recursive",
+        help="1주일 예측 방식 (recursive: 1스텝 반복, direct: 호라이즌 피처 모델 1회 예측)",
+    )
+    parser.add_argument("--n-trials", type=int, default=N_TRIALS, help="Optuna trial 수")
+    parser.add_argument("--n-jobs", type=int, default=1, help="Optuna 병렬 워커 프로세스 수")
+    parser.add_argument("--study-path", type=Path, default=STUDY_PATH, help="Optuna 저널 파일 경로")
+    parser.add_argument(
+        "--study-name",
+        default=None,
+        help="스터디 이름 (기본: 타깃명-학습데이터 해시, 같은 데이터면 이어서 실행)",
+    )
+    parser.add_argument(
+        "--pruner",
+        choices=["none", "median", "halving", "hyperband"],
+        default="median",
+        help="Optuna pruner (폴드 누적 MAE + LightGBM 반복별 검증 MAE 기준)",
+    )
+    parser.add_argument(
+        "--compare-unpruned",
+        action="store_true",
+        help="같은 seed 로 가지치기 없는 탐색을 임시 스토리지에서 한 번 더 돌려 소요시간 비교",
+    )
+    parser.add_argument(
+        "--time-budget",
+        type=parse_duration,
+        default=None,
+        metavar="DURATION",
+        help="전체 실행 시간 예산 (예: 20min, 1200). 최종 학습·예측 시간을 남기고 튜닝 trial 수·폴드 수·"
+             "트리 수 상한을 맞춘다 (--n-trials 는 상한)",
+    )
+    parser.add_argument(
+        "--profile",
+        choices=["cprofile", "sample"],
+        default=None,
+        help="실행 전체 프로파일링 (cprofile: 결정적, profile.prof 저장 / sample: SIGPROF 표본 추출, 오버헤드 작음). "
+             "상위 함수 요약은 run_report.json 에 포함",
+    )
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="tracemalloc 으로 단계별 NumPy·파이썬 할당 최대치 기록 (느려짐)",
+    )
+    parser.add_argument(
+        "--compare-full-rounds",
+        action="store_true",
+        help=f"CV best_iteration 기반 트리 수 모델과 고정 {N_ESTIMATORS}트리 모델의 크기·학습 시간·predict 지연 비교",
+    )
+    parser.add_argument(
+        "--select-features",
+        action="store_true",
+        help="최근 CV 폴드의 gain·permutation 중요도로 피처를 골라 축소 스펙으로 학습·예측 "
+             "(제거한 피처는 계산하지 않음, 결과는 단계 캐시에 저장)",
+    )
+    parser.add_argument(
+        "--no-feature-cache",
+        action="store_true",
+        help="피처 행렬 디스크 캐시를 쓰지 않고 매번 새로 계산",
+    )
+    parser.add_argument(
+        "--no-stage-cache",
+        action="store_true",
+        help="파이프라인 단계 캐시(data/pipeline_cache)를 읽지도 쓰지도 않고 모든 단계를 실행",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="데이터만 읽고 단계별 키와 재사용/실행 여부를 출력한 뒤 종료",
+    )
+    parser.add_argument(
+        "--grid-fill",
+        choices=regular_grid.FILL_POLICIES,
+        default=regular_grid.DEFAULT_FILL,
+        help="10분 격자로 맞춘 뒤 짧은 결측을 채우는 방식 (linear: 선형 보간, ffill: 직전 값, none: 채우지 않음)",
+    )
+    parser.add_argument(
+        "--grid-max-gap",
+        type=pd.Timedelta,
+        default=regular_grid.DEFAULT_MAX_GAP,
+        help="채우는 최대 결측 길이 (예: 30min). 더 긴 구간은 NaN 으로 남겨 그 구간의 피처 행은 빠진다",
+    )
+    parser.add_argument(
+        "--no-grid",
+        action="store_true",
+        help="격자 전처리 없이 원본 시각 그대로 사용 (간격은 최빈값으로 추정)",
+    )
+    parser.add_argument(
+        "--horizon",
+        type=pd.Timedelta,
+        default=pd.Timedelta("7D"),
+        help="예측 기간 (예: 7D, 3D, 36h). 백테스트·conformal·direct 호라이즌도 같은 기간",
+    )
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="저장된 부스터·파라미터로 새 구간만 증분 학습 (드리프트 시 전체 재튜닝)",
+    )
+    parser.add_argument(
+        "--refresh-mode",
+        choices=["continue", "refit"],
+        default="continue",
+        help="증분 학습 방식 (continue: init_model 로 새 구간 트리 추가, refit: 전체 학습 구간으로 리프값만 재적합)",
+    )
+    parser.add_argument(
+        "--refresh-rounds", type=int, default=REFRESH_ROUNDS, help="continue 모드에서 추가할 트리 수"
+    )
+    parser.add_argument(
+        "--drift-threshold",
+        type=float,
+        default=DRIFT_THRESHOLD,
+        help="기준 MAE 대비 이 비율 이상 나빠지면 전체 재튜닝",
+    )
+    parser.add_argument(
+        "--quantiles",
+        action="store_true",
+        help="P10/P90 분위수 모델을 점 예측 모델과 같은 Dataset 에서 동시에 학습해 예측 구간(lower/upper) 출력",
+    )
+    parser.add_argument(
+        "--forecast-exog",
+        nargs="*",
+        choices=EXOG_COLS,
+        default=None,
+        metavar="COL",
+        help="외생변수도 1스텝 모델로 함께 예측 (열 이름 없이 주면 EXOG_COLS 전체, 나머지 열은 마지막 값 유지)",
+    )
+    parser.add_argument(
+        "--backtest",
+        action="store_true",
+        help="테스트 구간의 여러 시작점에서 7일 재귀 예측을 돌려 호라이즌별 MAE 계산 (backtest.py)",
+    )
+    parser.add_argument(
+        "--conformal",
+        action="store_true",
+        help="테스트 구간 다중 시작점 잔차로 호라이즌별 split-conformal 구간을 보정해 저장 (recursive 전략)",
+    )
+    parser.add_argument("--backtest-stride", default="6h", help="백테스트·conformal 시작점 간격")
+    parser.add_argument(
+        "--backtest-jobs", type=int, default=None, help="백테스트 워커 프로세스 수 (기본: CPU 수)"
+    )
+    parser.add_argument(
+        "--artifact-dir", type=Path, default=None, help="실행별 산출물 디렉터리 (기본: data/artifacts)"
+    )
+    parser.add_argument(
+        "--targets",
+        nargs="+",
+        default=None,
+        metavar="COL",
+        help="여러 타깃을 프로세스 풀에서 각각 튜닝·학습·예측 (타깃별 산출물, 외생변수 피처 공유). "
+             "recursive 전략만 지원하며 단일 타깃 전용 옵션(--refresh, --backtest 등)과 함께 쓸 수 없음",
+    )
+    parser.add_argument(
+        "--target-jobs", type=int, default=None, help="--targets 워커 프로세스 수 (기본: CPU 수)"
+    )
+    args = parser.parse_args(argv)
+
+    if args.targets:
+        # 다중 타깃 실행은 튜닝 → 최종 학습 → 재귀 예측만 한다. 나머지 단계를 켜는 옵션을 조용히 버리면
+        # 기본 타깃의 CURRENT 가 요청과 다른 산출물을 가리키게 되므로 거부한다.
+        single_target_only = {
+            "--strategy direct": args.strategy != "recursive",
+            "--refresh": args.refresh,
+            "--backtest": args.backtest,
+            "--conformal": args.conformal,
+            "--forecast-exog": args.forecast_exog is not None,
+            "--select-features": args.select_features,
+            "--time-budget": args.time_budget is not None,
+            "--compare-unpruned": args.compare_unpruned,
+            "--compare-full-rounds": args.compare_full_rounds,
+            "--profile": args.profile is not None,
+            "--dry-run": args.dry_run,
+        }
+        used = [flag for flag, on in single_target_only.items() if on]
+        if used:
+            parser.error(f"--targets 와 함께 쓸 수 없는 옵션: {', '.join(used)}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    run_report = profiling.RunReport(trace_memory=args.trace_memory)
+    profiling.activate(run_report)
+    profiler = profiling.Profiler(args.profile) if args.profile else None
+    if profiler is not None:
+        profiler.start()
+
+    print("데이터 로드:", DATA_PATH)
+    df, data_meta = load_sensor_data(DATA_PATH, DATA_STORE_PATH, refresh_store=True)
+    # 저장소는 float32, 피처·학습 계산은 float64 로 수행
+    df = df.astype({c: np.float64 for c in df.select_dtypes("number").columns})
+
+    gap_report = None
+    if args.no_grid:
+        freq_td = df.index.to_series().diff().dropna().mode()[0]
+    else:
+        # 빠진 시각을 NaN 행으로 채워 lag/rolling 의 행 간격 = 시간 간격이 되도록
+        df, data_meta["grid"], gap_report = regular_grid.to_regular_grid(
+            df, fill=args.grid_fill, max_gap=args.grid_max_gap
+        )
+        freq_td = regular_grid.GRID_FREQ
+    horizon_steps = int(args.horizon / freq_td)
+    print("추정 간격:", freq_td, f" / 예측 기간 {args.horizon} 스텝 수:", horizon_steps)
+    run_report.lap("load")
+
+    if args.targets:
+        missing = [t for t in args.targets if t not in df.columns]
+        if missing:
+            raise SystemExit(f"데이터에 없는 타깃: {', '.join(missing)}")
+        train_targets(df, args.targets, data_meta, args)
+        return
+
+    stages = stage_cache.StageCache(
+        pipeline_stages(args, data_meta.get("content_hash"), feature_spec(df, TARGET_COL, exog_cols=EXOG_COLS),
+                        horizon_steps),
+        enabled=not args.no_stage_cache,
+    )
+    if args.dry_run:
+        stages.print_plan(always=ALWAYS_STAGES)
+        if profiler is not None:
+            profiler.stop()
+        profiling.activate(None)
+        return
+
+    build_features = make_features_with_diff if args.no_feature_cache else cached_features
+    keep, selection = None, None
+    if args.select_features:
+        selection = stages.run(
+            "select",
+            lambda: select_features(df, TARGET_COL, EXOG_COLS, build_features),
+            save=lambda result, d: stage_cache.save_json(d / "selection.json", result),
+            load=lambda d: stage_cache.load_json(d / "selection.json"),
+        )
+        keep = selection["keep"]
+        run_report.lap("select")
+    X_all, y_all = stages.run("features", lambda: build_selected_features(df, TARGET_COL, EXOG_COLS, keep,
+                                                                          build_features))
+    print("전체 피처 크기:", X_all.shape)
+
+    cutoff_time = X_all.index.max() - pd.Timedelta(days=TEST_DAYS)
+    X_train = X_all[X_all.index <= cutoff_time]
+    y_train = y_all.loc[X_train.index]
+
+    X_test  = X_all[X_all.index > cutoff_time]
+    y_test  = y_all.loc[X_test.index]
+
+    print("Train:", X_train.shape, "Test:", X_test.shape)
+    run_report.lap("features")
+
+    refreshed, fit_seconds, fixed_cost, tuned = None, None, None, None
+    if args.refresh:
+        refreshed = try_refresh(
+            X_train,
+            y_train,
+            X_test,
+            y_test,
+            mode=args.refresh_mode,
+            rounds=args.refresh_rounds,
+            drift_threshold=args.drift_threshold,
+            artifact_dir=args.artifact_dir,
+        )
+
+    if refreshed is not None:
+        final_model, band_models, best_params, reference_mae = refreshed
+        stages.run("tune", lambda: {"params": best_params})
+        stages.run("final_fit", lambda: {"point": final_model, **band_models}, fingerprint=boosters_digest)
+        run_report.lap("refresh")
+    else:
+        seconds_left = args.time_budget - run_report.elapsed() if args.time_budget else None
+        tuned = stages.run(
+            "tune",
+            lambda: tune(X_train, y_train, args, seconds_left),
+            save=lambda result, d: stage_cache.save_json(d / "tune.json", result),
+            load=lambda d: stage_cache.load_json(d / "tune.json"),
+        )
+        best_params = tuned["params"]
+        print("\nBest Params:", tuned["trial_params"])
+        print("Best CV MAE:", tuned["best_value"])
+        run_report.lap("tuning")
+
+        # 튜닝에 쓴 bin 매퍼 그대로 점 예측 + 분위수 모델을 동시에 학습
+        fit_timings = {}
+        band_models = stages.run(
+            "final_fit",
+            lambda: train_final_models(
+                get_fold_datasets(X_train, y_train).full,
+                best_params,
+                quantiles=QUANTILES if args.quantiles else None,
+                timings=fit_timings,
+            ),
+            save=save_boosters,
+            load=load_boosters,
+            fingerprint=boosters_digest,
+        )
+        # 모델 비용의 학습 시간은 점 예측 모델 하나의 시간 (분위수 모델 시간 제외, 단계를 재사용했으면 None)
+        fit_seconds = fit_timings.get("point")
+        final_model = band_models.pop("point")
+        reference_mae = None
+        run_report.lap("final_fit")
+
+        if args.compare_full_rounds:
+            # 이전 방식(고정 N_ESTIMATORS 트리, early stopping 없음)과 크기·학습 시간·지연 비교
+            # 비교 대상은 점 예측 모델뿐이므로 분위수 모델은 학습하지 않는다. 학습 시간이 같은 조건이 되도록
+            # 최종 학습에서 점 예측 모델이 받은 스레드 수(분위수 모델과 나눠 쓴 몫)로 학습한다
+            fixed_timings = {}
+            fixed_model = train_final_models(
+                get_fold_datasets(X_train, y_train).full,
+                {**best_params, "n_estimators": N_ESTIMATORS},
+                n_threads=max(1, (os.cpu_count() or 1) // (1 + len(QUANTILES) if args.quantiles else 1)),
+                timings=fixed_timings,
+            )["point"]
+            fixed_cost = model_cost(fixed_model, X_test.iloc[0], fixed_timings["point"])
+            fixed_cost["test_mae"] = mean_absolute_error(y_test, fixed_model.predict(X_test))
 
     y_pred = final_model.predict(X_test)
     mae_test  = mean_absolute_error(y_test, y_pred)
@@ -254,25 +2628,253 @@ def main():
     print(f"[모델 vs Kalman 타깃] MAPE : {mape_test:.2f}%")
     print(f"[원본 vs Kalman     ] MAPE : {mape_raw_vs_kalman:.2f}%")
 
+    final_cost = model_cost(final_model, X_test.iloc[0], fit_seconds)
+    print(f"\n최종 모델: {format_cost(final_cost)}")
+    if fixed_cost is not None:
+        print(f"고정 {N_ESTIMATORS}트리: {format_cost(fixed_cost)}, Test MAE {fixed_cost['test_mae']:.4f}")
+        print(f"  → 모델 크기 {final_cost['model_bytes'] / fixed_cost['model_bytes']:.0%}, "
+              f"1행 predict {final_cost['predict_ms'] / fixed_cost['predict_ms']:.0%} "
+              f"(재귀 예측 {horizon_steps}스텝 기준 "
+              f"{(fixed_cost['predict_ms'] - final_cost['predict_ms']) * horizon_steps / 1e3:.2f}초 절약)")
+    run_report.lap("evaluate")
+
+    exog_models, exog_test_mae = {}, None
+    if args.forecast_exog is not None:
+        exog_forecast_cols = [c for c in exog_forecast_columns(args) if c in df.columns]
+        exog_boosters = stages.run(
+            "exog_fit",
+            lambda: {
+                exog_model_file(col): b
+                for col, b in train_exog_models(
+                    get_fold_datasets(X_train, y_train).full,
+                    df.loc[X_train.index, exog_forecast_cols],
+                    best_params,
+                ).items()
+            },
+            save=save_boosters,
+            load=load_boosters,
+        )
+        exog_models = {col: exog_boosters[exog_model_file(col)] for col in exog_forecast_cols}
+        exog_test_mae = {
+            col: forecast_mae(df.loc[X_test.index, col], pd.Series(m.predict(X_test), index=X_test.index))
+            for col, m in exog_models.items()
+        }
+        print("외생변수 1스텝 Test MAE: " + ", ".join(f"{c} {v:.4f}" for c, v in exog_test_mae.items()))
+        held = [c for c in EXOG_COLS if c in df.columns and c not in exog_models]
+        if held:
+            print("마지막 관측값 유지: " + ", ".join(held))
+        run_report.lap("exog_fit")
+
     feature_means = X_train.mean()
-    future_week = recursive_forecast(
-        df=df,
-        model=final_model,
+    forecast_kwargs = dict(
         target_col=TARGET_COL,
-        n_steps=steps_week,
+        n_steps=horizon_steps,
         freq_td=freq_td,
         feature_means=feature_means,
         exog_cols=EXOG_COLS,
+        keep=keep,
+    )
+    frame_stage = dict(
+        save=lambda frame, d: stage_cache.save_frame(d / "frame.npz", frame),
+        load=lambda d: stage_cache.load_frame(d / "frame.npz"),
+    )
+
+    backtest_meta, backtest_tables, conformal_table = None, None, None
+    if args.backtest or args.conformal:
+        # backtest.py 가 이 모듈을 import 하므로 여기서 가져온다
+        from backtest import backtest_origins, horizon_mae, run_backtest, summarize_backtest
+
+        # 테스트 구간(모델이 보지 않은 구간) 시작점들의 잔차 → 백테스트 MAE 와 conformal 보정에 같이 사용
+        origins = backtest_origins(df.index, cutoff_time, stride=args.backtest_stride)
+        residuals = stages.run(
+            "backtest",
+            lambda: run_backtest(
+                df,
+                final_model,
+                feature_means,
+                origins,
+                freq_td,
+                n_steps=horizon_steps,
+                exog_cols=EXOG_COLS,
+                n_jobs=args.backtest_jobs,
+                signed=True,
+                exog_models=exog_models,
+                keep=keep,
+            ),
+            **frame_stage,
+        )
+
+    if args.backtest:
+        errors = residuals.abs()
+        summary = summarize_backtest(errors, freq_td)
+        print(f"\n=== 롤링-오리진 백테스트 (recursive, 시작점 {len(origins)}개, 간격 {args.backtest_stride}) ===")
+        print(summary.to_string(float_format=lambda v: f"{v:.4f}"))
+
+        backtest_tables = {"backtest_horizon_mae": horizon_mae(errors, freq_td)}
+        backtest_meta = {
+            "stride": args.backtest_stride,
+            "n_origins": len(origins),
+            "mae_by_lead": summary["mae"].to_dict(),
+            "mae_upto_lead": summary["mae_upto"].to_dict(),
+        }
+
+    if args.conformal:
+        conformal_table = conformal.calibrate(residuals, freq_td)
+        print(f"conformal 보정: 시작점 {len(origins)}개, 버킷 {len(conformal_table['counts'])}개 "
+              f"(버킷당 잔차 {conformal_table['counts'].min():,}~{conformal_table['counts'].max():,}개)")
+    if args.backtest or args.conformal:
+        run_report.lap("backtest")
+
+    if args.strategy == "direct":
+        def fit_direct():
+            horizons = sorted(set(range(1, horizon_steps + 1, DIRECT_HORIZON_STRIDE)) | {horizon_steps})
+            # 테스트 구간 타깃이 학습에 섞이지 않도록 cutoff 이후 타깃은 제외
+            X_dir, y_dir = make_direct_dataset(
+                X_train,
+                y_all.loc[y_all.index <= cutoff_time],
+                freq_td,
+                horizons,
+                origin_stride=DIRECT_ORIGIN_STRIDE,
+            )
+            print("\nDirect 학습셋:", X_dir.shape)
+            return train_final_models(
+                lgb.Dataset(X_dir, y_dir, params={**BIN_PARAMS, "verbose": -1, "feature_pre_filter": False}),
+                best_params,
+                quantiles=QUANTILES if band_models else None,
+            )
+
+        direct_bands = stages.run("direct_fit", fit_direct, save=save_boosters, load=load_boosters)
+        direct_model = direct_bands.pop("point")
+        run_report.lap("direct_fit")
+
+        def forecast_direct():
+            # 테스트 구간 시작점에서 두 방식의 예측 비교
+            hist = df.loc[df.index <= cutoff_time]
+            actual = df.loc[df.index > cutoff_time, TARGET_COL]
+            bt_rec = recursive_forecast(df=hist, model=final_model, exog_models=exog_models, **forecast_kwargs)
+            bt_dir = direct_forecast(df=hist, model=direct_model, **forecast_kwargs)
+
+            print(f"\n=== {args.horizon} 예측 비교 (테스트 구간 시작점) ===")
+            print(f"[recursive] MAE : {forecast_mae(actual, bt_rec):.4f}")
+            print(f"[direct   ] MAE : {forecast_mae(actual, bt_dir):.4f}")
+
+            return direct_forecast(df=df, model=direct_model, band_models=direct_bands or None, **forecast_kwargs)
+
+        future_week = stages.run("forecast", forecast_direct, **frame_stage)
+    else:
+        future_week = stages.run(
+            "forecast",
+            lambda: recursive_forecast(df=df, model=final_model, band_models=band_models or None,
+                                       exog_models=exog_models, **forecast_kwargs),
+            **frame_stage,
+        )
+
+    forecast_out = forecast_frame(future_week, TARGET_COL)
+    run_report.lap("forecast")
+    if conformal_table is not None and args.strategy == "recursive":
+        # 보정된 conformal 구간이 분위수 모델 구간보다 우선
+        lower, upper = conformal.intervals(forecast_out[artifacts.FORECAST_COL], conformal_table)
+        forecast_out[artifacts.LOWER_COL] = lower
+        forecast_out[artifacts.UPPER_COL] = upper
+
+    forecast_band = None
+    if conformal_table is not None and args.strategy == "recursive":
+        forecast_band = {"method": "conformal", "center": "mean", "conditional": "horizon",
+                         "coverage": conformal.COVERAGE, "bucket": str(conformal.BUCKET)}
+    elif band_models:
+        forecast_band = dict(QUANTILE_BAND)
+
+    run_meta = {
+        "strategy": args.strategy,
+        "best_params": best_params,
+        "feature_spec": feature_spec(df, TARGET_COL, exog_cols=EXOG_COLS, keep=keep),
+        "feature_names": list(X_train.columns),
+        "feature_selection": None if selection is None else {
+            k: v for k, v in selection.items() if k not in ("keep", "ranking")
+        },
+        "data_content_hash": data_meta.get("content_hash"),
+        "grid": data_meta.get("grid"),
+        "trained_until": X_train.index.max().isoformat(),
+        "num_trees": final_model.num_trees(),
+        "model_cost": {"final": final_cost, "fixed_rounds": fixed_cost},
+        "forecast_band": forecast_band,
+        "exog_forecast": {col: exog_model_file(col) + ".txt" for col in exog_models},
+        "refreshed": refreshed is not None,
+        "budget": None if not (tuned and tuned.get("budget")) else {
+            "seconds": args.time_budget,
+            **tuned["budget"],
+            "stage_seconds": run_report.stage_seconds(),
+        },
+        "horizon": str(args.horizon),
+        "stages": stages.info,
+        "metrics": {
+            # 전체 튜닝 직후의 테스트 MAE 를 --refresh 드리프트 판정 기준으로 유지
+            "reference_mae": mae_test if reference_mae is None else reference_mae,
+            "test_mae": mae_test,
+            "test_rmse": rmse_test,
+            "test_mape": mape_test,
+            "raw_vs_kalman_mape": mape_raw_vs_kalman,
+            "backtest": backtest_meta,
+            "exog_test_mae": exog_test_mae,
+        },
+    }
+    extra_boosters = {f"{name}_model": b for name, b in band_models.items()}
+    extra_boosters.update({exog_model_file(col): b for col, b in exog_models.items()})
+    if args.strategy == "direct":
+        extra_boosters["direct_model"] = direct_model
+        extra_boosters.update({f"direct_{name}_model": b for name, b in direct_bands.items()})
+
+    run_dir = artifacts.write_run(
+        final_model,
+        run_meta,
+        feature_means,
+        forecast_out,
+        artifact_dir=args.artifact_dir,
+        extra_boosters=extra_boosters,
+        tables={
+            **(backtest_tables or {}),
+            **({"gap_report": gap_report.set_index("column")} if gap_report is not None else {}),
+            **({"feature_ranking": pd.DataFrame(selection["ranking"]).set_index("feature")} if selection else {}),
+        },
+        arrays={
+            # LightGBM 없이 평가하는 NumPy 트리 배열 (tree_eval.PackedForest)
+            "model": tree_eval.pack(final_model),
+            **({"conformal": conformal_table} if conformal_table is not None else {}),
+        },
     )
+    print(f"\n실행 산출물을 저장했습니다: {run_dir} (CURRENT → {run_dir.name})")
 
-    future_week.index.name = "Timestamp"
-    future_week.to_frame(name="Forecast_Chlorophyll_Kalman").to_csv(
-        OUT_PATH,
+    # 기존 경로 호환용 사본 (임시 파일에 쓴 뒤 교체)
+    tmp_path = OUT_PATH.with_name(OUT_PATH.name + ".tmp")
+    forecast_out.to_csv(
+        tmp_path,
         index=True,
         encoding="utf-8-sig"
     )
+    os.replace(tmp_path, OUT_PATH)
+
+    print(f'일주일 미래 예측값을 "{OUT_PATH}" 파일로 저장했습니다.')
+    run_report.lap("write")
 
-    print(f'\n일주일 미래 예측값을 "{OUT_PATH}" 파일로 저장했습니다.')
+    if profiler is not None:
+        run_report.profile = {"mode": args.profile, "top": profiler.stop()}
+        saved = profiler.save(run_dir / profiling.PROFILE_FILE)
+        if saved:
+            print(f"cProfile 통계: {saved}")
+    report_path = run_report.write(
+        run_dir,
+        history_dir=run_dir.parent,
+        run_id=run_dir.name,
+        strategy=args.strategy,
+        data_content_hash=data_meta.get("content_hash"),
+        rows=len(df),
+        n_trials=args.n_trials,
+        time_budget=args.time_budget,
+        test_mae=mae_test,
+    )
+    run_report.print_summary(args.time_budget)
+    print(f"실행 보고서: {report_path}")
+    profiling.activate(None)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,260 @@
+# tree_eval.py
+"""
+LightGBM 없이 학습된 부스터를 평가하는 NumPy 트리 평가기.
+
+booster.dump_model() 의 트리들을 노드 배열(분할 피처, 임계값, 자식, 결측 방향)과
+리프값 배열로 펼쳐 npz 한 파일로 저장하고, PackedForest.predict 로 배치를 한 번에 평가한다.
+
+- 배치: 모든 (행, 트리) 위치를 깊이 단위로 한 칸씩 내린다. 깊이마다 현재 노드의 분할만 판정하므로
+        작업 배열은 (행 × 트리) 이고, 행은 ELEMENT_BUDGET 위치 단위로 나눠 평가한다 (리프는 자기 자신을 가리켜 멈춤)
+- 1행  : 모든 내부 노드의 판정을 한 번에 만들고 (내부 노드 수) 깊이만큼 gather
+- 속도 : 1행 predict 는 LightGBM 호출보다 빠르지만(호출 오버헤드가 작음), 2행 이상 배치는 LightGBM(C++) 이 빠르다.
+         그래서 학습·백테스트·예측 경로는 부스터를 그대로 쓰고, 이 평가기는 LightGBM 없이 예측해야 하는 곳
+         (artifacts.load_packed_model) 에서만 쓴다.
+
+수치 규칙은 LightGBM 의 수치형 분할(NumericalDecision)과 같다. 결측 유형이 None 이면 NaN 을 0 으로 보고,
+Zero 면 0(과 NaN) 을, NaN 이면 NaN 을 default_left 방향으로 보낸다. 범주형 분할·선형 트리는 지원하지 않는다.
+
+    $ python tree_eval.py                 # CURRENT 모델을 model.npz 로 내보내고 booster.predict 와 비교·벤치마크
+"""
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+
+PACKED_FILE    = "model.npz"
+ZERO_THRESHOLD = 1e-35               # LightGBM kZeroThreshold
+ELEMENT_BUDGET = 1 << 16             # 배치 predict 한 번에 내리는 (행 × 트리) 위치 수 상한
+# 예측값이 변환 없이 리프값 합인 objective
+IDENTITY_OBJECTIVES = ("regression", "regression_l1", "huber", "fair", "quantile", "mape")
+
+_MISSING_TYPES = {"None": 0, "Zero": 1, "NaN": 2}
+
+
+def pack(dump):
+    """
+    booster.dump_model() (또는 Booster) → 배열 dict.
+    노드 번호: 0..n_internal-1 은 내부 노드, n_internal.. 은 리프 (리프는 자기 자신을 자식으로 가짐).
+    """
+    if hasattr(dump, "dump_model"):
+        dump = dump.dump_model()
+    objective = dump["objective"].split()[0]
+    if objective not in IDENTITY_OBJECTIVES or dump["num_tree_per_iteration"] != 1:
+        raise ValueError(f"지원하지 않는 objective 입니다: {dump['objective']}")
+
+    internal, leaves, roots = [], [], []
+
+    def walk(node):
+        """노드를 번호 목록에 넣고 (종류, 목록 번호) 를 반환. 내부 노드의 자식은 나중에 전역 번호로 바꾼다."""
+        if "split_index" not in node:
+            leaves.append(node["leaf_value"])
+            return ("leaf", len(leaves) - 1)
+        if node["decision_type"] != "<=":
+            raise ValueError(f"범주형 분할은 지원하지 않습니다: {node['decision_type']}")
+        pos = len(internal)
+        internal.append(None)
+        left, right = walk(node["left_child"]), walk(node["right_child"])
+        internal[pos] = (
+            node["split_feature"], node["threshold"], node["default_left"],
+            _MISSING_TYPES[node["missing_type"]], left, right,
+        )
+        return ("node", pos)
+
+    depths = []
+
+    def depth(node):
+        if "split_index" not in node:
+            return 0
+        return 1 + max(depth(node["left_child"]), depth(node["right_child"]))
+
+    for tree in dump["tree_info"]:
+        roots.append(walk(tree["tree_structure"]))
+        depths.append(depth(tree["tree_structure"]))
+
+    n_internal = len(internal)
+
+    def gid(ref):
+        kind, i = ref
+        return i if kind == "node" else n_internal + i
+
+    n_nodes = n_internal + len(leaves)
+    feature = np.zeros(n_internal, dtype=np.int32)
+    threshold = np.zeros(n_internal, dtype=np.float64)
+    default_left = np.zeros(n_internal, dtype=bool)
+    missing_type = np.zeros(n_internal, dtype=np.uint8)
+    left = np.empty(n_nodes, dtype=np.int32)
+    right = np.empty(n_nodes, dtype=np.int32)
+    for i, (f, thr, dl, mt, lc, rc) in enumerate(internal):
+        feature[i], threshold[i], default_left[i], missing_type[i] = f, thr, dl, mt
+        left[i], right[i] = gid(lc), gid(rc)
+    left[n_internal:] = right[n_internal:] = np.arange(n_internal, n_nodes, dtype=np.int32)
+
+    return {
+        "feature": feature,
+        "threshold": threshold,
+        "default_left": default_left,
+        "missing_type": missing_type,
+        "left": left,
+        "right": right,
+        "leaf_value": np.asarray(leaves, dtype=np.float64),
+        "roots": np.array([gid(r) for r in roots], dtype=np.intp),
+        "max_depth": np.int64(max(depths, default=0)),
+        "average_output": np.bool_(dump["average_output"]),
+        "feature_names": np.asarray(dump["feature_names"]),
+    }
+
+
+def save(path, packed):
+    np.savez(path, **packed)
+
+
+class PackedForest:
+    """pack() 배열로 만든 예측기. booster.predict 와 같은 (행,) 결과 (float 허용오차 이내)."""
+
+    def __init__(self, packed):
+        self.feature = packed["feature"]
+        self.threshold = packed["threshold"]
+        self.default_left = packed["default_left"]
+        self.missing_type = packed["missing_type"]
+        self.left = packed["left"]
+        self.right = packed["right"]
+        self.leaf_value = packed["leaf_value"]
+        self.roots = packed["roots"]
+        self.max_depth = int(packed["max_depth"])
+        self.average_output = bool(packed["average_output"])
+        self.feature_names = [str(c) for c in packed["feature_names"]]
+
+        self.n_internal = len(self.feature)
+        # NaN 이 가는 방향: None 은 NaN → 0 으로 보고 비교, Zero/NaN 은 default_left
+        self._nan_left = np.where(self.missing_type == _MISSING_TYPES["None"], self.threshold >= 0.0,
+                                  self.default_left)
+        self._zero_nodes = np.flatnonzero(self.missing_type == _MISSING_TYPES["Zero"])
+        self._leaf_self = np.arange(self.n_internal, len(self.left), dtype=np.intp)
+        self._left_internal = self.left[:self.n_internal].astype(np.intp)
+        self._right_internal = self.right[:self.n_internal].astype(np.intp)
+        self._node_value = np.concatenate((np.zeros(self.n_internal), self.leaf_value))   # 노드 번호로 바로 리프값 조회
+
+        # 배치 경로용 "2 × 노드 번호" 표: 칸 2j 는 노드 j 의 오른쪽, 2j+1 은 왼쪽 (판정 결과 bool 을 더해 바로 자식 조회).
+        # 노드별 값은 두 칸에 같은 값을 넣고, 리프는 피처 0·임계값 0 으로 채운다 (자식이 자기 자신이라 판정과 무관)
+        def per_slot(values, fill):
+            padded = np.full(len(self.left), fill, dtype=np.asarray(values).dtype)
+            padded[:self.n_internal] = values
+            return np.repeat(padded, 2)
+
+        self._feature2 = per_slot(self.feature.astype(np.intp), 0)
+        self._threshold2 = per_slot(self.threshold, 0.0)
+        self._nan_left2 = per_slot(self._nan_left, False)
+        self._default_left2 = per_slot(self.default_left, False)
+        self._zero2 = per_slot(self.missing_type == _MISSING_TYPES["Zero"], False)
+        self._child2 = 2 * np.stack((self.right, self.left), axis=1).ravel().astype(np.intp)
+        self._value2 = np.repeat(self._node_value, 2)
+        self._roots2 = 2 * self.roots.astype(np.intp)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as f:
+            return cls({k: f[k] for k in f.files})
+
+    def num_trees(self):
+        return len(self.roots)
+
+    def _predict_chunk(self, X):
+        """깊이마다 (행, 트리) 위치의 분할만 판정해 한 칸 내린다 (작업 배열은 행 × 트리)."""
+        n, n_features = X.shape
+        flat = X.ravel()
+        base = (np.arange(n, dtype=np.intp) * n_features)[:, None]
+        has_nan = np.isnan(flat).any()
+        node = np.broadcast_to(self._roots2, (n, len(self._roots2)))
+        for _ in range(self.max_depth):
+            x = flat.take(base + self._feature2.take(node))
+            go_left = x <= self._threshold2.take(node)
+            if has_nan:
+                nan = np.isnan(x)
+                go_left[nan] = self._nan_left2.take(node[nan])
+            if len(self._zero_nodes):
+                zero = self._zero2.take(node) & ((np.abs(x) <= ZERO_THRESHOLD) | np.isnan(x))
+                go_left[zero] = self._default_left2.take(node[zero])
+            node = self._child2.take(node + go_left)
+        out = self._value2.take(node).sum(axis=1)
+        if self.average_output:
+            out /= len(self.roots)
+        return out
+
+    def _predict_row(self, x_row):
+        """1행 전용 경로: 모든 내부 노드 판정 → 다음 노드 표 → 깊이만큼 gather."""
+        x = x_row.take(self.feature)
+        go_left = x <= self.threshold
+        if np.isnan(x).any():
+            go_left = np.where(np.isnan(x), self._nan_left, go_left)
+        if len(self._zero_nodes):
+            xz = x[self._zero_nodes]
+            zero = (np.abs(xz) <= ZERO_THRESHOLD) | np.isnan(xz)
+            go_left[self._zero_nodes] = np.where(zero, self.default_left[self._zero_nodes], go_left[self._zero_nodes])
+        nxt = np.concatenate((np.where(go_left, self._left_internal, self._right_internal), self._leaf_self))
+        node = self.roots
+        for _ in range(self.max_depth):
+            node = nxt[node]
+        out = self._node_value[node].sum()
+        return out / len(self.roots) if self.average_output else out
+
+    def predict(self, X):
+        """X: (행, 피처) 배열 또는 DataFrame (학습 때와 같은 컬럼 순서)."""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if len(X) == 1:
+            return np.array([self._predict_row(X[0])])
+        rows = max(1, ELEMENT_BUDGET // max(1, len(self.roots)))
+        if len(X) <= rows:
+            return self._predict_chunk(X)
+        return np.concatenate([self._predict_chunk(X[i:i + rows]) for i in range(0, len(X), rows)])
+
+
+def _time_predict(predict, X, repeat):
+    predict(X)
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        predict(X)
+    return (time.perf_counter() - t0) / repeat * 1e3
+
+
+def main(argv=None):
+    import artifacts
+
+    parser = argparse.ArgumentParser(description="부스터를 NumPy 배열로 내보내고 booster.predict 와 비교")
+    parser.add_argument("--run", default=None, help="내보낼 산출물 실행 ID (기본: CURRENT)")
+    parser.add_argument("--rows", type=int, default=2000, help="비교에 쓸 무작위 입력 행 수")
+    args = parser.parse_args(argv)
+
+    run_id = args.run or artifacts.current_run_id()
+    if run_id is None:
+        raise SystemExit("학습 산출물이 없습니다. 먼저 train_offline.py 를 실행하세요.")
+    run_dir = artifacts.ARTIFACT_DIR / run_id
+    booster = artifacts.load_booster(run_dir)
+    save(run_dir / PACKED_FILE, pack(booster))
+    forest = PackedForest.load(run_dir / PACKED_FILE)
+
+    # 학습 구간 평균 주변의 입력. 비교는 NaN 포함, 시간 측정은 recursive_forecast 처럼 NaN 을 채운 행
+    # (평균은 학습 컬럼 순서로 저장된다. dump_model 의 피처 이름은 공백이 _ 로 바뀌어 있어 이름으로 맞추지 않는다)
+    means = artifacts.load_feature_means(run_dir).to_numpy()
+    rng = np.random.default_rng(0)
+    X = means * (1 + 0.3 * rng.standard_normal((args.rows, len(means))))
+    X_nan = X.copy()
+    X_nan[rng.random(X.shape) < 0.02] = np.nan
+
+    diff = max(np.abs(forest.predict(Z) - booster.predict(Z)).max() for Z in (X, X_nan))
+    diff_row = max(abs(forest.predict(Z[i:i + 1])[0] - booster.predict(Z[i:i + 1])[0])
+                   for Z in (X, X_nan) for i in range(min(200, args.rows)))
+    print(f"[{run_id}] 트리 {forest.num_trees()}개, 내부 노드 {forest.n_internal:,}개, 최대 깊이 {forest.max_depth} "
+          f"→ {run_dir / PACKED_FILE}")
+    print(f"booster.predict 와 최대 차이: 배치 {diff:.3g} / 1행 {diff_row:.3g}")
+    for n in [1, 16, 256, args.rows]:
+        repeat = max(3, 2000 // n)
+        t_lgb = _time_predict(booster.predict, X[:n], repeat)
+        t_np = _time_predict(forest.predict, X[:n], repeat)
+        print(f"  {n:>5}행: LightGBM {t_lgb:.3f} ms / NumPy {t_np:.3f} ms ({t_lgb / t_np:.1f}배)")
+
+
+if __name__ == "__main__":
+    main()